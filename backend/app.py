@@ -9,12 +9,24 @@ FlaskというPythonのWebフレームワークを使用しています。
 
 import os
 import sys
-import sqlite3
 import json
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify, send_from_directory
 from flask_cors import CORS
 
+from db_pool import get_pool
+from message_counters import ensure_message_counters, read_message_counters
+from metrics import install_request_metrics, metrics_response, watch_search_cache
+from pagination import ensure_pagination_indexes, parse_count_mode
+from search_cache import SearchResultCache, ensure_data_generation, read_data_generation, search_cache_key
+from search_backend import get_search_backend
+from search_index import RECENCY_WEIGHT, ensure_fts_index, field_highlights, highlight_content, parse_sort_mode
+from search_log import SearchStatsLogger
+from search_response import search_json_response
+from search_stream import ndjson_response, wants_stream
+from single_flight import SingleFlight
+from suggest_index import SUGGEST_LIMIT, SuggestIndex, ensure_suggest_changes
+
 # 設定ファイルを読み込み
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from config.settings import *
@@ -22,12 +34,29 @@ from config.settings import *
 # Flaskアプリケーションを作成
 app = Flask(__name__)
 CORS(app)  # CORSを有効にする（フロントエンドからのアクセスを許可）
+install_request_metrics(app)  # ルートごとの応答時間を /metrics に記録
+
+# 検索統計はバックグラウンドでまとめて書き込む
+search_logger = SearchStatsLogger(get_pool(DATABASE_PATH))
+
+# 同じ条件の検索結果はメモリから返す（同期でデータ世代が進んだら無効になる）
+search_cache = SearchResultCache()
+watch_search_cache(search_cache)
+
+# 同じ条件の検索が同時に来たら1回だけ実行して結果を分け合う
+search_flights = SingleFlight()
+
+# 入力中の検索候補（同期でデータ世代が進んだら差分を取り込む）
+suggest_index = SuggestIndex(get_pool(DATABASE_PATH))
 
 def get_db_connection():
-    """データベース接続を取得する関数"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # 辞書形式で結果を取得
-    return conn
+    """
+    データベース接続を取得する関数
+
+    接続プールから借りるので、使い終わったら conn.close() で返却してください。
+    結果は辞書形式（sqlite3.Row）で取得できます。
+    """
+    return get_pool(DATABASE_PATH).connection()
 
 @app.route('/')
 def index():
@@ -49,6 +78,18 @@ def search_messages():
     - platform: プラットフォーム絞り込み（chatwork, notion, discord）
     - limit: 取得件数制限（デフォルト: 50）
     - offset: 取得開始位置（デフォルト: 0）
+    - cursor: 前回のレスポンスの next_cursor（指定するとoffsetより優先、深いページでも高速）
+    - count: 総件数の数え方 exact / estimate / none（デフォルト: exact）
+    - sort: 並び順 recent（新しい順） / relevance（関連度順）（デフォルト: recent）
+    - recency: 関連度順で新しさを混ぜる割合 0〜1（デフォルト: SEARCH_RECENCY_WEIGHT）
+    - stream: 1 なら結果を1行1件のNDJSONで少しずつ返す（Accept: application/x-ndjson でも可）
+    - full: 1 なら本文全体を返す（既定はキーワード周辺の抜粋。highlights は content の中の一致位置）
+
+    関連度順の結果には、タイトル・チャンネル名の中の一致位置 field_highlights（{'title': [...], 'channel': [...]}）も付きます。
+
+    関連度順はBM25（タイトル・チャンネル名の一致を本文より重視）に新しさを混ぜた順です。
+    本文に加えてタイトル・チャンネル名も検索します。2文字以下のクエリは新しい順になります。
+    同じ条件の検索結果はキャッシュから返します（レスポンスの cached が true）。
     """
 
     # 検索パラメータを取得
@@ -56,6 +97,8 @@ def search_messages():
     platform = request.args.get('platform', '').strip()
     limit = int(request.args.get('limit', 50))
     offset = int(request.args.get('offset', 0))
+    page_cursor = request.args.get('cursor', '').strip()
+    full = request.args.get('full', '').strip().lower() in ('1', 'true', 'yes')
 
     if not query:
         return jsonify({
@@ -65,67 +108,81 @@ def search_messages():
             'total': 0
         })
 
+    try:
+        count_mode = parse_count_mode(request.args.get('count'))
+        sort = parse_sort_mode(request.args.get('sort'))
+        recency = float(request.args.get('recency', RECENCY_WEIGHT))
+        if not 0 <= recency <= 1:
+            raise ValueError('recencyは0〜1の範囲で指定してください')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'results': [],
+            'total': 0
+        })
+
+    # 本文はキーワード周辺の抜粋と一致位置にする（full=1 なら本文全体。関連度順ならタイトル・チャンネル名の一致位置も）
+    def with_highlights(row):
+        message = dict(row, **highlight_content(row['content'], query, full))
+        if sort == 'relevance':
+            message['field_highlights'] = field_highlights(row, query)
+        return message
+
+    # ストリーミング（キャッシュは使わず、読んだそばから返す。総件数は数えない）
+    if wants_stream(request):
+        rows = get_search_backend(get_pool(DATABASE_PATH)).iter_results(
+            query, platform or None, limit, offset, page_cursor or None, sort, recency
+        )
+        return ndjson_response(rows, with_highlights,
+                               lambda count, search_time: log_search_stats(query, count, search_time))
+
     try:
         start_time = datetime.now()
 
         # データベース接続
         conn = get_db_connection()
 
-        # 検索SQL構築
-        sql = '''
-        SELECT 
-            id, platform, platform_id, title, content, 
-            author_name, channel_name, created_at, updated_at
-        FROM messages 
-        WHERE content LIKE ? AND is_deleted = 0
-        '''
-
-        params = [f'%{query}%']
-
-        # プラットフォーム絞り込み
-        if platform:
-            sql += ' AND platform = ?'
-            params.append(platform)
-
-        # 並び順（新しい順）
-        sql += ' ORDER BY created_at DESC LIMIT ? OFFSET ?'
-        params.extend([limit, offset])
-
-        # 検索実行
-        cursor = conn.execute(sql, params)
-        results = [dict(row) for row in cursor.fetchall()]
-
-        # 総件数取得
-        count_sql = '''
-        SELECT COUNT(*) as total 
-        FROM messages 
-        WHERE content LIKE ? AND is_deleted = 0
-        '''
-        count_params = [f'%{query}%']
-
-        if platform:
-            count_sql += ' AND platform = ?'
-            count_params.append(platform)
-
-        total_count = conn.execute(count_sql, count_params).fetchone()['total']
-
+        # キャッシュにあれば検索しない（データ世代は検索より先に読む）
+        generation = read_data_generation(conn)
         conn.close()
+        cache_key = search_cache_key(query, platform, limit, offset, page_cursor, count_mode, sort, recency, full)
+        cached = search_cache.get(cache_key, generation)
+        if cached is not None:
+            search_time = (datetime.now() - start_time).total_seconds() * 1000
+            log_search_stats(query, cached['total'] if cached['total'] is not None else cached['count'], search_time)
+            response = dict(cached, cached=True, search_time_ms=round(search_time, 2))
+            return search_json_response(response, 'results', response.pop('results_json'))
+
+        # 検索はバックエンド（SQLite / MeiliSearch）に任せる（結果の一覧はJSONに組み立て済みで受け取る）
+        # 同じ条件の検索が実行中なら、その結果を待って使う
+        backend = get_search_backend(get_pool(DATABASE_PATH))
+        found = search_flights.run((cache_key, generation), lambda: backend.search_json(
+            query, platform or None, limit, offset, page_cursor or None, count_mode, sort, recency, full
+        ))
+        total_count = found['total']
 
         # 検索時間計算
         search_time = (datetime.now() - start_time).total_seconds() * 1000
 
-        # 検索統計を記録
-        log_search_stats(query, total_count, search_time)
+        # 検索統計を記録（件数を数えていない場合は取得件数）
+        log_search_stats(query, total_count if total_count is not None else found['count'], search_time)
 
-        return jsonify({
+        response = {
             'success': True,
             'query': query,
             'platform': platform,
-            'results': results,
+            'sort': found['sort'],
             'total': total_count,
-            'count': len(results),
-            'search_time_ms': round(search_time, 2)
-        })
+            'total_exact': found['total_exact'],
+            'count': found['count'],
+            'next_cursor': found['next_cursor'],
+            'results_json': found['results_json']
+        }
+        search_cache.put(cache_key, generation, response)
+
+        response = dict(response, cached=False, search_time_ms=round(search_time, 2))
+        return search_json_response(response, 'results', response.pop('results_json'))
 
     except Exception as e:
         return jsonify({
@@ -135,6 +192,40 @@ def search_messages():
             'total': 0
         })
 
+@app.route('/api/suggest')
+def suggest():
+    """
+    💡 入力中の検索候補API
+
+    パラメータ:
+    - prefix: 入力中の文字列
+    - limit: 候補の数（デフォルト: 10、最大: 20）
+
+    候補はメモリ上のインデックスから返すので、本文の検索は行いません。
+    """
+    start_time = datetime.now()
+    prefix = request.args.get('prefix', '').strip()
+
+    try:
+        limit = int(request.args.get('limit', SUGGEST_LIMIT))
+    except ValueError:
+        limit = SUGGEST_LIMIT
+
+    # 同期でデータが増えていればバックグラウンドで取り込む（この応答は待たない）
+    conn = get_db_connection()
+    generation = read_data_generation(conn)
+    conn.close()
+    suggest_index.maybe_refresh(generation)
+
+    suggestions = suggest_index.suggest(prefix, limit)
+    return jsonify({
+        'success': True,
+        'prefix': prefix,
+        'suggestions': suggestions,
+        'ready': suggest_index.ready,
+        'took_ms': round((datetime.now() - start_time).total_seconds() * 1000, 2)
+    })
+
 @app.route('/api/stats')
 def get_stats():
     """
@@ -146,24 +237,8 @@ def get_stats():
     try:
         conn = get_db_connection()
 
-        # 総メッセージ数
-        total_messages = conn.execute(
-            'SELECT COUNT(*) as count FROM messages WHERE is_deleted = 0'
-        ).fetchone()['count']
-
-        # プラットフォーム別統計
-        platform_stats = conn.execute('''
-        SELECT platform, COUNT(*) as count 
-        FROM messages 
-        WHERE is_deleted = 0 
-        GROUP BY platform
-        ''').fetchall()
-
-        # 最新の同期時刻
-        last_sync = conn.execute('''
-        SELECT MAX(synchronized_at) as last_sync 
-        FROM messages
-        ''').fetchone()['last_sync']
+        # メッセージ数・プラットフォーム別統計・最新の同期時刻（集計テーブルから取得）
+        counters = read_message_counters(conn)
 
         # よく検索されるキーワード（上位10件）
         popular_searches = conn.execute('''
@@ -179,10 +254,18 @@ def get_stats():
         return jsonify({
             'success': True,
             'stats': {
-                'total_messages': total_messages,
-                'platform_stats': [dict(row) for row in platform_stats],
-                'last_sync': last_sync,
-                'popular_searches': [dict(row) for row in popular_searches]
+                'total_messages': counters['total_count'],
+                'platform_stats': [
+                    {'platform': platform, 'count': count}
+                    for platform, count in counters['platforms'].items()
+                ],
+                'last_sync': counters['last_sync'],
+                'popular_searches': [dict(row) for row in popular_searches],
+                'search_logging': search_logger.stats(),
+                'search_cache': search_cache.stats(),
+                'search_coalescing': search_flights.stats(),
+                'suggest_index': suggest_index.stats(),
+                'search_backend': get_search_backend(get_pool(DATABASE_PATH)).stats()
             }
         })
 
@@ -229,17 +312,8 @@ def get_sync_status():
         })
 
 def log_search_stats(query, results_count, search_time_ms):
-    """検索統計をログに記録"""
-    try:
-        conn = get_db_connection()
-        conn.execute('''
-        INSERT INTO search_stats (search_query, results_count, search_time_ms)
-        VALUES (?, ?, ?)
-        ''', (query, results_count, search_time_ms))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"検索統計記録エラー: {e}")
+    """検索統計をログに記録（バッファに積むだけなので検索をブロックしない）"""
+    search_logger.log(query, results_count, search_time_ms)
 
 @app.route('/api/test')
 def test_api():
@@ -251,6 +325,15 @@ def test_api():
         'app_name': APP_NAME
     })
 
+@app.route('/metrics')
+def metrics():
+    """
+    📈 Prometheus形式のメトリクス
+
+    ルートごとの応答時間・SQLiteの処理時間・接続待ち・検索結果キャッシュのヒット率などを返す
+    """
+    return metrics_response()
+
 if __name__ == '__main__':
     print("=" * 60)
     print(f"🌐 {APP_NAME} - Webサーバー起動中...")
@@ -266,6 +349,17 @@ if __name__ == '__main__':
         print("先に「python database/init_db.py」を実行してください。")
         sys.exit(1)
 
+    # 全文検索インデックス・件数集計・ページ送り用インデックスを準備（既存DBの移行）
+    with get_pool(DATABASE_PATH).writer() as conn:
+        ensure_fts_index(conn)
+        ensure_message_counters(conn)
+        ensure_pagination_indexes(conn)
+        ensure_data_generation(conn)
+        ensure_suggest_changes(conn)
+
+    # 検索候補のインデックスを先に作っておく（起動は待たない）
+    suggest_index.refresh_async()
+
     # Webサーバーを起動
     app.run(
         host=HOST,
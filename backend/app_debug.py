@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 from flask import Flask, request, jsonify, render_template
-import sqlite3
 import os
+import json
 from dotenv import load_dotenv
 import logging
 
+from db_pool import get_pool
+from pagination import ensure_pagination_indexes, parse_count_mode
+from search_backend import get_search_backend
+
 # 環境変数を読み込み
 load_dotenv()
 
@@ -14,10 +18,14 @@ app = Flask(__name__, template_folder='../frontend')
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 検索APIで返すメッセージの項目
+MESSAGE_FIELDS = ('id', 'platform', 'message_id', 'content', 'author', 'channel', 'timestamp', 'url')
+# 検索する列（本文と発信者名）
+SEARCH_FIELDS = ('content', 'author')
+
 def get_db_connection():
-    conn = sqlite3.connect('data/search.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    # 接続プールから借りる（conn.close()でプールに返却）
+    return get_pool('data/search.db').connection()
 
 @app.route('/')
 def index():
@@ -29,12 +37,15 @@ def search():
         query = request.args.get('q', '').strip()
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
+        # cursor: 前回の next_cursor（指定時はpageより優先）、count: exact / estimate / none
+        page_cursor = request.args.get('cursor', '').strip()
+        count_mode = parse_count_mode(request.args.get('count'))
         
         logger.info(f"=== 検索開始 ===")
         logger.info(f"検索クエリ: '{query}'")
         logger.info(f"クエリの文字数: {len(query)}")
         logger.info(f"クエリのバイト表現: {query.encode('utf-8')}")
-        logger.info(f"ページ: {page}")
+        logger.info(f"ページ: {page}, カーソル: '{page_cursor}'")
         
         if not query:
             return jsonify({
@@ -49,89 +60,55 @@ def search():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # テスト1: 総データ数確認
-        cursor.execute('SELECT COUNT(*) FROM messages')
-        total_messages = cursor.fetchone()[0]
-        logger.info(f"データベース内の総メッセージ数: {total_messages}")
-        
-        # テスト2: 井上さんのデータ確認（直接）
-        cursor.execute("SELECT COUNT(*) FROM messages WHERE author LIKE '%井上%'")
-        inoue_count = cursor.fetchone()[0]
-        logger.info(f"井上さんのデータ数（直接検索）: {inoue_count}")
-        
-        # テスト3: 著者名のサンプル表示
-        cursor.execute("SELECT DISTINCT author FROM messages LIMIT 5")
-        authors = [row[0] for row in cursor.fetchall()]
-        logger.info(f"著者名のサンプル: {authors}")
-        
-        # テスト4: パラメータ化クエリのテスト
         search_pattern = f'%{query}%'
         logger.info(f"作成した検索パターン: '{search_pattern}'")
         
-        # まず著者名だけで検索してみる
-        cursor.execute("SELECT COUNT(*) FROM messages WHERE author LIKE ?", [search_pattern])
-        author_count = cursor.fetchone()[0]
-        logger.info(f"著者名での検索結果数: {author_count}")
-        
-        # 次にコンテンツだけで検索
-        cursor.execute("SELECT COUNT(*) FROM messages WHERE content LIKE ?", [search_pattern])
-        content_count = cursor.fetchone()[0]
-        logger.info(f"コンテンツでの検索結果数: {content_count}")
+        # 診断用の件数（全件・LIKEの走査になるので count=exact のときだけ）
+        if count_mode == 'exact':
+            cursor.execute('SELECT COUNT(*) FROM messages')
+            logger.info(f"データベース内の総メッセージ数: {cursor.fetchone()[0]}")
+            
+            cursor.execute("SELECT COUNT(*) FROM messages WHERE author LIKE '%井上%'")
+            logger.info(f"井上さんのデータ数（直接検索）: {cursor.fetchone()[0]}")
+            
+            cursor.execute("SELECT DISTINCT author FROM messages LIMIT 5")
+            logger.info(f"著者名のサンプル: {[row[0] for row in cursor.fetchall()]}")
+            
+            cursor.execute("SELECT COUNT(*) FROM messages WHERE author LIKE ?", [search_pattern])
+            logger.info(f"著者名での検索結果数: {cursor.fetchone()[0]}")
+            
+            cursor.execute("SELECT COUNT(*) FROM messages WHERE content LIKE ?", [search_pattern])
+            logger.info(f"コンテンツでの検索結果数: {cursor.fetchone()[0]}")
         
-        # 組み合わせ検索
-        cursor.execute("SELECT COUNT(*) FROM messages WHERE (author LIKE ? OR content LIKE ?)", [search_pattern, search_pattern])
-        combined_count = cursor.fetchone()[0]
-        logger.info(f"組み合わせ検索結果数: {combined_count}")
-        
-        # 実際のデータ取得
-        offset = (page - 1) * per_page
-        sql_query = """
-            SELECT 
-                id, platform, message_id, content, 
-                author, channel, timestamp, url
-            FROM messages 
-            WHERE (author LIKE ? OR content LIKE ?)
-            ORDER BY timestamp DESC
-            LIMIT ? OFFSET ?
-        """
+        conn.close()
         
-        params = [search_pattern, search_pattern, per_page, offset]
-        logger.info(f"最終SQL: {sql_query.strip()}")
-        logger.info(f"最終パラメータ: {params}")
+        # 実際のデータ取得は検索バックエンドに任せる（カーソル指定時はその続きから読む）
+        offset = 0 if page_cursor else (page - 1) * per_page
+        found = get_search_backend(get_pool('data/search.db')).search_json(
+            query, None, per_page, offset, page_cursor or None, count_mode, full=True, fields=MESSAGE_FIELDS,
+            search_fields=SEARCH_FIELDS
+        )
+        data = json.loads(found['results_json'])
         
-        cursor.execute(sql_query, params)
-        results = cursor.fetchall()
+        logger.info(f"最終結果件数: {len(data)}")
         
-        logger.info(f"最終結果件数: {len(results)}")
+        # 検索の総数（count=none なら数えない）
+        total_count = found['total']
+        logger.info(f"検索結果数: {total_count}")
         
         # 結果の詳細ログ
-        for i, row in enumerate(results[:3]):  # 最初の3件だけログ出力
-            logger.info(f"結果{i+1}: author='{row['author']}', content_preview='{row['content'][:50]}'")
-        
-        # 結果を辞書に変換
-        data = []
-        for row in results:
-            item = {
-                'id': row['id'],
-                'platform': row['platform'],
-                'message_id': row['message_id'],
-                'content': row['content'],
-                'author': row['author'],
-                'channel': row['channel'],
-                'timestamp': row['timestamp'],
-                'url': row['url']
-            }
-            data.append(item)
-        
-        conn.close()
+        for i, item in enumerate(data[:3]):  # 最初の3件だけログ出力
+            logger.info(f"結果{i+1}: author='{item['author']}', content_preview='{(item['content'] or '')[:50]}'")
         
         response_data = {
             'success': True,
             'data': data,
-            'total': combined_count,
+            'total': total_count,
+            'total_exact': found['total_exact'],
             'page': page,
             'per_page': per_page,
-            'total_pages': (combined_count + per_page - 1) // per_page
+            'total_pages': (total_count + per_page - 1) // per_page if total_count is not None else None,
+            'next_cursor': found['next_cursor']
         }
         
         logger.info(f"=== レスポンス送信: {len(data)}件のデータ ===")
@@ -147,4 +124,8 @@ def search():
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 8000))
     logger.info(f"デバッグ版サーバーをポート{port}で起動します")
+    
+    # カーソル方式のページ送り用インデックス（既存DBの移行）
+    with get_pool('data/search.db').writer() as conn:
+        ensure_pagination_indexes(conn)
     app.run(debug=True, host='0.0.0.0', port=port)
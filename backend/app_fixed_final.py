@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 from flask import Flask, request, jsonify, render_template
-import sqlite3
 import os
 from dotenv import load_dotenv
 import logging
 
+from db_pool import get_pool
+from pagination import ensure_pagination_indexes, parse_count_mode
+from search_backend import get_search_backend
+from search_index import ensure_fts_index
+from search_response import search_json_response
+
 # 環境変数を読み込み
 load_dotenv()
 
@@ -14,12 +19,10 @@ app = Flask(__name__, template_folder='../frontend')
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    conn = sqlite3.connect('data/search.db')
-    conn.row_factory = sqlite3.Row
-    # SQLiteのUnicodeサポートを有効化
-    conn.execute('PRAGMA encoding="UTF-8"')
-    return conn
+# 検索APIで返すメッセージの項目
+MESSAGE_FIELDS = ('id', 'platform', 'message_id', 'content', 'author', 'channel', 'timestamp', 'url')
+# 検索する列（本文と発信者名）
+SEARCH_FIELDS = ('content', 'author')
 
 @app.route('/')
 def index():
@@ -31,6 +34,9 @@ def search():
         query = request.args.get('q', '').strip()
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
+        # cursor: 前回の next_cursor（指定時はpageより優先）、count: exact / estimate / none
+        page_cursor = request.args.get('cursor', '').strip()
+        count_mode = parse_count_mode(request.args.get('count'))
         
         logger.info(f"検索クエリ: '{query}' (長さ: {len(query)}), ページ: {page}")
         
@@ -44,83 +50,34 @@ def search():
                 'total_pages': 0
             })
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # デバッグ: 総データ数を確認
-        cursor.execute('SELECT COUNT(*) as total_messages FROM messages')
-        total_messages = cursor.fetchone()[0]
-        logger.info(f"データベース内の総メッセージ数: {total_messages}")
-        
-        # より柔軟な検索クエリ（大文字小文字を区別しない、部分一致）
-        search_pattern = f'%{query}%'
-        offset = (page - 1) * per_page
-        
-        logger.info(f"検索パターン: '{search_pattern}'")
-        
-        # データ取得（大文字小文字を区別しない検索）
-        sql_query = """
-            SELECT 
-                id, platform, message_id, content, 
-                author, channel, timestamp, url
-            FROM messages 
-            WHERE (content LIKE ? COLLATE NOCASE OR author LIKE ? COLLATE NOCASE)
-            ORDER BY timestamp DESC
-            LIMIT ? OFFSET ?
-        """
+        # 検索はバックエンド（SQLite / MeiliSearch）に任せる（結果の一覧はJSONに組み立て済みで受け取る）
+        # カーソル指定があればその続きから読む（OFFSETで読み飛ばさない）
+        offset = 0 if page_cursor else (page - 1) * per_page
+        found = get_search_backend(get_pool('data/search.db')).search_json(
+            query, None, per_page, offset, page_cursor or None, count_mode, full=True, fields=MESSAGE_FIELDS,
+            search_fields=SEARCH_FIELDS
+        )
         
-        params = [search_pattern, search_pattern, per_page, offset]
-        logger.info(f"実行するSQL: {sql_query.strip()}")
-        logger.info(f"パラメータ: {params}")
+        logger.info(f"検索結果: {found['count']}件")
         
-        cursor.execute(sql_query, params)
-        results = cursor.fetchall()
-        
-        logger.info(f"SQLクエリ結果: {len(results)}件")
-        
-        # 総数取得
-        count_sql = """
-            SELECT COUNT(*) as total 
-            FROM messages 
-            WHERE (content LIKE ? COLLATE NOCASE OR author LIKE ? COLLATE NOCASE)
-        """
-        count_params = [search_pattern, search_pattern]
-        
-        cursor.execute(count_sql, count_params)
-        total_count = cursor.fetchone()[0]
-        total_pages = (total_count + per_page - 1) // per_page
+        # 総数（count=none なら数えない）
+        total_count = found['total']
+        total_pages = (total_count + per_page - 1) // per_page if total_count is not None else None
         
         logger.info(f"総検索結果数: {total_count}件")
         
-        # 結果を辞書に変換
-        data = []
-        for row in results:
-            item = {
-                'id': row['id'],
-                'platform': row['platform'],
-                'message_id': row['message_id'],
-                'content': row['content'],
-                'author': row['author'],
-                'channel': row['channel'],
-                'timestamp': row['timestamp'],
-                'url': row['url']
-            }
-            data.append(item)
-            logger.debug(f"結果項目: author='{row['author']}', content_length={len(row['content'] or '')}")
-        
-        conn.close()
-        
         response_data = {
             'success': True,
-            'data': data,
             'total': total_count,
+            'total_exact': found['total_exact'],
             'page': page,
             'per_page': per_page,
-            'total_pages': total_pages
+            'total_pages': total_pages,
+            'next_cursor': found['next_cursor']
         }
         
-        logger.info(f"APIレスポンス: {len(data)}件のデータを返却")
-        return jsonify(response_data)
+        logger.info(f"APIレスポンス: {found['count']}件のデータを返却")
+        return search_json_response(response_data, 'data', found['results_json'])
         
     except Exception as e:
         logger.error(f"検索エラー: {str(e)}", exc_info=True)
@@ -132,4 +89,10 @@ def search():
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 8000))
     logger.info(f"サーバーをポート{port}で起動します")
+    
+    # 全文検索インデックスを準備（既存DBの移行）
+    with get_pool('data/search.db').writer() as conn:
+        ensure_fts_index(conn)
+        ensure_pagination_indexes(conn)
+    
     app.run(debug=True, host='0.0.0.0', port=port)
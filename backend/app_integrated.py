@@ -1,66 +1,38 @@
 from flask import Flask, request, jsonify, send_from_directory
-import sqlite3
 import os
 from flask_cors import CORS
 import json
 from datetime import datetime
 
+from db_pool import get_pool
+from message_counters import ensure_message_counters, read_message_counters
+from search_backend import get_search_backend
+from search_index import ensure_fts_index
+
 app = Flask(__name__)
 CORS(app)
 
 # データベースパス
 DB_PATH = '../data/search.db'
+db_pool = get_pool(DB_PATH)
+
+# 検索APIで返すメッセージの項目
+MESSAGE_FIELDS = ('id', 'platform', 'message_id', 'content', 'author', 'channel', 'timestamp', 'url')
 
 def search_messages(query, platform=None, limit=50):
-    """統合検索機能：ChatworkとNotionを横断検索"""
+    """統合検索機能：ChatworkとNotionを横断検索（検索はバックエンドに任せる）"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row  # 辞書形式で結果を取得
-        cursor = conn.cursor()
-        
-        # 基本的な検索クエリ
-        base_query = """
-            SELECT id, platform, message_id, content, author, channel, timestamp, url
-            FROM messages 
-            WHERE content LIKE ?
-        """
-        
-        params = [f'%{query}%']
-        
-        # プラットフォーム指定がある場合
-        if platform and platform in ['chatwork', 'notion']:
-            base_query += " AND platform = ?"
-            params.append(platform)
-        
-        # 日付順で並び替え（新しい順）
-        base_query += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
-        
-        cursor.execute(base_query, params)
-        results = cursor.fetchall()
-        
-        # 結果を辞書形式に変換
-        messages = []
-        for row in results:
-            message = {
-                'id': row['id'],
-                'platform': row['platform'],
-                'message_id': row['message_id'],
-                'content': row['content'],
-                'author': row['author'],
-                'channel': row['channel'],
-                'timestamp': row['timestamp'],
-                'url': row['url']
-            }
-            messages.append(message)
-        
-        conn.close()
+        # プラットフォーム指定がある場合だけ絞り込む（新しい順・本文全体と一致位置を返す）
+        platform = platform if platform in ['chatwork', 'notion'] else None
+        found = get_search_backend(db_pool).search_json(
+            query, platform, limit, count_mode='none', full=True, fields=MESSAGE_FIELDS
+        )
         
         return {
             'success': True,
             'query': query,
-            'total_results': len(messages),
-            'messages': messages
+            'total_results': found['count'],
+            'messages': json.loads(found['results_json'])
         }
         
     except Exception as e:
@@ -73,34 +45,15 @@ def search_messages(query, platform=None, limit=50):
 def get_statistics():
     """データベースの統計情報を取得"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # 総件数
-        cursor.execute("SELECT COUNT(*) FROM messages")
-        total_count = cursor.fetchone()[0]
-        
-        # プラットフォーム別件数
-        cursor.execute("""
-            SELECT platform, COUNT(*) as count 
-            FROM messages 
-            GROUP BY platform
-        """)
-        platform_stats = dict(cursor.fetchall())
-        
-        # 最新更新日時
-        cursor.execute("""
-            SELECT MAX(timestamp) as latest_update 
-            FROM messages
-        """)
-        latest_update = cursor.fetchone()[0]
-        
+        # 集計テーブルから読むので、メッセージ数に関係なく一定時間で返せる
+        conn = db_pool.connection()
+        counters = read_message_counters(conn)
         conn.close()
         
         return {
-            'total_count': total_count,
-            'platforms': platform_stats,
-            'latest_update': latest_update
+            'total_count': counters['total_count'],
+            'platforms': counters['platforms'],
+            'latest_update': counters['latest_update']
         }
         
     except Exception as e:
@@ -156,6 +109,12 @@ def api_health():
 
 if __name__ == '__main__':
     print("🚀 統合検索システムを起動中...")
+
+    # 全文検索インデックス・件数集計を準備（既存DBの移行）
+    with db_pool.writer() as conn:
+        ensure_fts_index(conn)
+        ensure_message_counters(conn)
+
     print("📊 データベース統計:")
     
     stats = get_statistics()
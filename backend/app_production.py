@@ -1,279 +1,420 @@
 from flask import Flask, request, jsonify, send_from_directory
-import sqlite3
 import os
+import time
 from flask_cors import CORS
 from datetime import datetime
-import requests
 from notion_client import Client
 
+from bulk_ingest import ensure_upsert_index, upsert_messages
+from chatwork_client import CHATWORK_API_BASE as DEFAULT_CHATWORK_API_BASE, ChatworkClient, room_cursor, room_cursor_changed
+from db_pool import get_pool
+from discord_client import DISCORD_API_BASE as DEFAULT_DISCORD_API_BASE, DiscordClient, backfill_scope, message_author, message_url
+from message_counters import ensure_message_counters, read_message_counters
+from metrics import install_request_metrics, metrics_response, record_sync, watch_search_cache
+from notion_extract import NotionBlockExtractor, changed_pages, save_page_progress
+from search_cache import SearchResultCache, read_data_generation, search_cache_key
+from search_backend import get_search_backend
+from search_index import ensure_fts_index, field_highlights, highlight_content, parse_sort_mode
+from search_response import search_json_response
+from search_stream import ndjson_response, wants_stream
+from single_flight import SingleFlight
+from sync_jobs import SyncJobManager
+from sync_scheduler import SyncScheduler, ensure_sync_logs
+from sync_state import ensure_sync_state, load_sync_states, save_sync_state
+
 app = Flask(__name__)
 CORS(app)
+# ルートごとの応答時間を /metrics に記録
+install_request_metrics(app)
 
 # 本番環境設定
 PORT = int(os.environ.get('PORT', 8000))
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'database', 'integrated_search.db')
+# DATABASE_PATH で別のデータベースを使える（負荷試験など）
+DB_PATH = os.environ.get('DATABASE_PATH') or os.path.join(os.path.dirname(__file__), '..', 'database', 'integrated_search.db')
+db_pool = get_pool(DB_PATH)
 
 # API設定（環境変数から取得）
 CHATWORK_API_TOKEN = os.environ.get('CHATWORK_API_TOKEN')
+CHATWORK_API_BASE = os.environ.get('CHATWORK_API_BASE', DEFAULT_CHATWORK_API_BASE)
 NOTION_API_TOKEN = os.environ.get('NOTION_API_TOKEN')
+DISCORD_BOT_TOKEN = os.environ.get('DISCORD_BOT_TOKEN')
+DISCORD_GUILD_ID = os.environ.get('DISCORD_GUILD_ID')
+DISCORD_API_BASE = os.environ.get('DISCORD_API_BASE', DEFAULT_DISCORD_API_BASE)
+
+# 検索結果のキャッシュ（同期でデータ世代が進んだら無効になる）
+search_cache = SearchResultCache()
+watch_search_cache(search_cache)
+
+# 同じ条件の検索が同時に来たら1回だけ実行して結果を分け合う
+search_flights = SingleFlight()
+
+# 検索バックエンド（SEARCH_BACKEND=meilisearch ならMeiliSearch。同期した行はここへ送る）
+search_backend = get_search_backend(db_pool)
+
+# Notionの1回の差分同期で取り込むページ数（全ページの取り直しもこの件数ずつ書き込む）
+NOTION_SYNC_BATCH = 10
+
+# 定期同期（SYNC_SCHEDULER=off なら別プロセスの backend/sync_scheduler.py に任せる）
+SYNC_SCHEDULER_ENABLED = os.environ.get('SYNC_SCHEDULER', 'on').lower() != 'off'
 
 def init_database():
     """データベース初期化"""
     try:
         os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY,
-                platform TEXT,
-                message_id TEXT,
-                content TEXT,
-                author TEXT,
-                channel TEXT,
-                timestamp DATETIME,
-                url TEXT
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        with db_pool.writer() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY,
+                    platform TEXT,
+                    message_id TEXT,
+                    content TEXT,
+                    author TEXT,
+                    channel TEXT,
+                    timestamp DATETIME,
+                    url TEXT
+                )
+            ''')
+            conn.commit()
+
+            # 全文検索インデックス・件数集計（既存DBの移行も兼ねる）
+            ensure_fts_index(conn)
+            ensure_message_counters(conn)
+            ensure_sync_state(conn)
+            search_backend.index_keys(ensure_upsert_index(conn))
+            ensure_sync_logs(conn)
+
         print("✅ データベースを初期化しました")
         
     except Exception as e:
         print(f"❌ データベース初期化エラー: {e}")
 
-def sync_chatwork_data():
-    """Chatworkデータ同期"""
+def sync_chatwork_data(progress=None):
+    """Chatworkデータ同期（前回の続きだけを全ルーム並列に取得。progress には進捗を記録）"""
     if not CHATWORK_API_TOKEN:
         print("⚠️ CHATWORK_API_TOKENが設定されていません")
         return 0
     
+    client = ChatworkClient(CHATWORK_API_TOKEN, base_url=CHATWORK_API_BASE)
+    started = time.monotonic()
+    totals = {'inserted': 0, 'updated': 0, 'unchanged': 0}
     try:
         # Chatwork Room一覧を取得
-        headers = {'X-ChatWorkToken': CHATWORK_API_TOKEN}
-        response = requests.get('https://api.chatwork.com/v2/rooms', headers=headers)
+        rooms = client.get_rooms()
+        if progress:
+            progress.set_total(len(rooms))
         
-        if response.status_code != 200:
-            print(f"❌ Chatwork API エラー: {response.status_code}")
-            return 0
-            
-        rooms = response.json()
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        # ルームごとの進捗（最後に取り込んだメッセージ）
+        conn = db_pool.connection()
+        try:
+            states = load_sync_states(conn, 'chatwork')
+        finally:
+            conn.close()
         
-        saved_count = 0
-        
-        for room in rooms[:5]:  # 最初の5つのルームのみ処理
+        # 更新のあったルームだけ、レート制限を守りつつ並列に差分を取得し、取れた順に保存する
+        for room, messages in client.iter_room_updates(rooms, states):
             room_id = room['room_id']
-            room_name = room['name']
+            state = states.get(str(room_id))
+            if not messages:
+                # 新しいメッセージが無くても、確認した last_update_time までは進める（次回はAPIを呼ばない）
+                cursor = room_cursor([], room, state)
+                if messages is not None and room_cursor_changed(state, cursor):
+                    with db_pool.writer() as conn:
+                        save_sync_state(conn, 'chatwork', room_id, *cursor)
+                if progress:
+                    progress.advance()
+                continue
+            
+            rows = [{
+                'message_id': str(msg['message_id']),
+                'content': msg['body'],
+                'author': msg['account']['name'],
+                'channel': room['name'],
+                'timestamp': datetime.fromtimestamp(msg['send_time']).isoformat(),
+                'url': f"https://www.chatwork.com/#!rid{room_id}-{msg['message_id']}"
+            } for msg in messages]
             
-            # メッセージを取得
-            msg_response = requests.get(
-                f'https://api.chatwork.com/v2/rooms/{room_id}/messages',
-                headers=headers,
-                params={'force': 1}
-            )
+            # 書き込みはプロセス内で1本の接続に直列化（検索はWALで並行して読める）
+            with db_pool.writer() as conn:
+                result = upsert_messages(conn, 'chatwork', rows)
+                # 取り込んだメッセージと同じトランザクションで進捗を進める
+                save_sync_state(conn, 'chatwork', room_id, *room_cursor(messages, room, state))
+            search_backend.index_ingested('chatwork', rows, result)
             
-            if msg_response.status_code == 200:
-                messages = msg_response.json()
-                
-                for msg in messages[-20:]:  # 最新20件
-                    # 既存チェック
-                    cursor.execute(
-                        "SELECT COUNT(*) FROM messages WHERE platform='chatwork' AND message_id=?",
-                        (str(msg['message_id']),)
-                    )
-                    
-                    if cursor.fetchone()[0] == 0:
-                        cursor.execute('''
-                            INSERT INTO messages (platform, message_id, content, author, channel, timestamp, url)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            'chatwork',
-                            str(msg['message_id']),
-                            msg['body'],
-                            msg['account']['name'],
-                            room_name,
-                            datetime.fromtimestamp(msg['send_time']).isoformat(),
-                            f"https://www.chatwork.com/#!rid{room_id}-{msg['message_id']}"
-                        ))
-                        saved_count += 1
+            for key in totals:
+                totals[key] += result[key]
+            if progress:
+                progress.advance(rows=result['inserted'] + result['updated'])
         
-        conn.commit()
-        conn.close()
-        print(f"✅ Chatwork: {saved_count}件の新しいメッセージを保存")
-        return saved_count
+        print(f"✅ Chatwork: {len(rooms)}ルームから新規{totals['inserted']}件・更新{totals['updated']}件を保存"
+              f"（変更なし: {totals['unchanged']}件 / API呼び出し: {client.api_calls}回）")
+        return totals['inserted']
         
     except Exception as e:
         print(f"❌ Chatwork同期エラー: {e}")
-        return 0
+        raise
+    
+    finally:
+        client.close()
+        record_sync('chatwork', totals['inserted'] + totals['updated'], time.monotonic() - started,
+                    client.api_calls, client.rate_limited)
+
+def sync_notion_batch(extractor, batch, progress=None, failed_before=None):
+    """
+    Notionページの一団の本文を取得して保存する
+
+    failed_before: この同期で前の一団までに失敗したページの一番古い last_edited_time
+    戻り値: (upsert_messages の件数, ここまでに失敗したページの一番古い last_edited_time)
+    """
+    pages = {page['id']: page for page in batch}
+    rows = []
+    failed = []
+    for page_id, content in extractor.extract_pages(list(pages)):
+        page = pages[page_id]
+        if progress:
+            progress.advance()
+        if content is None:
+            # 取得できなかったページは次回の同期でやり直す
+            failed.append(page)
+            continue
+        
+        # タイトル取得
+        title = "無題のページ"
+        if 'properties' in page:
+            for prop_name, prop_value in page['properties'].items():
+                if prop_value.get('type') == 'title':
+                    if prop_value.get('title') and len(prop_value['title']) > 0:
+                        title = prop_value['title'][0]['plain_text']
+                    break
+        
+        rows.append({
+            'message_id': page_id,
+            'content': content or title,
+            'author': 'Notion User',
+            'channel': title,
+            'timestamp': page.get('last_edited_time', datetime.now().isoformat()),
+            'url': page.get('url', f"https://notion.so/{page_id.replace('-', '')}")
+        })
+    
+    # API取得が終わってからまとめて書き込む（書き込み中にAPIを待たない）
+    synced = [pages[row['message_id']] for row in rows]
+    with db_pool.writer() as conn:
+        result = upsert_messages(conn, 'notion', rows)
+        failed_before = save_page_progress(conn, synced, failed, failed_before)
+    search_backend.index_ingested('notion', rows, result)
+    if progress:
+        progress.advance(done=0, rows=result['inserted'] + result['updated'])
+    return result, failed_before
+
+def sync_notion_data(full=False, progress=None):
+    """
+    Notionデータ同期（progress には進捗を記録）
 
-def sync_notion_data():
-    """Notionデータ同期"""
+    full=False なら前回の同期以降に編集されたページを古い順に NOTION_SYNC_BATCH 件まで。
+    full=True なら全ページを NOTION_SYNC_BATCH 件ずつ取り直す。
+    """
     if not NOTION_API_TOKEN:
         print("⚠️ NOTION_API_TOKENが設定されていません")
         return 0
     
+    started = time.monotonic()
+    extractor = None
+    written = 0
     try:
         notion = Client(auth=NOTION_API_TOKEN)
         
-        # ページ検索
-        results = notion.search()
-        pages = results.get('results', [])
+        # 前回の同期時点（ウォーターマーク）とページごとの last_edited_time
+        states = {}
+        if not full:
+            conn = db_pool.connection()
+            try:
+                states = load_sync_states(conn, 'notion')
+            finally:
+                conn.close()
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        # 編集されたページを古い順に（通常は一度に NOTION_SYNC_BATCH 件まで、残りは次回の同期で。full なら全ページ）
+        pages = changed_pages(notion, states, limit=None if full else NOTION_SYNC_BATCH)
+        if progress:
+            progress.set_total(len(pages))
+        if not pages:
+            print("✅ Notion: 前回の同期以降に編集されたページはありません")
+            return 0
         
-        saved_count = 0
+        # ページ本文はブロックツリー全体を並列に取得する
+        extractor = NotionBlockExtractor(notion)
+        totals = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        try:
+            # NOTION_SYNC_BATCH 件ずつ取得して書き込む（全ページでもメモリにためず、途中で止まっても進捗が残る）
+            # 失敗したページより先には、後の一団でもウォーターマークを進めない
+            failed_before = None
+            for start in range(0, len(pages), NOTION_SYNC_BATCH):
+                result, failed_before = sync_notion_batch(
+                    extractor, pages[start:start + NOTION_SYNC_BATCH], progress, failed_before
+                )
+                for key in totals:
+                    totals[key] += result[key]
+                written += result['inserted'] + result['updated']
+        finally:
+            extractor.close()
         
-        for page in pages[:10]:  # 最初の10件
-            page_id = page['id']
-            
-            # タイトル取得
-            title = "無題のページ"
-            if 'properties' in page:
-                for prop_name, prop_value in page['properties'].items():
-                    if prop_value.get('type') == 'title':
-                        if prop_value.get('title') and len(prop_value['title']) > 0:
-                            title = prop_value['title'][0]['plain_text']
-                        break
-            
-            # ページ内容取得
-            try:
-                blocks_response = notion.blocks.children.list(block_id=page_id)
-                blocks = blocks_response.get('results', [])
-                content = extract_text_from_blocks(blocks)
-            except:
-                content = title
-            
-            # 既存チェック
-            cursor.execute(
-                "SELECT COUNT(*) FROM messages WHERE platform='notion' AND message_id=?",
-                (page_id,)
-            )
-            
-            if cursor.fetchone()[0] == 0:
-                cursor.execute('''
-                    INSERT INTO messages (platform, message_id, content, author, channel, timestamp, url)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    'notion',
-                    page_id,
-                    content,
-                    'Notion User',
-                    title,
-                    page.get('last_edited_time', datetime.now().isoformat()),
-                    page.get('url', f"https://notion.so/{page_id.replace('-', '')}")
-                ))
-                saved_count += 1
-        
-        conn.commit()
-        conn.close()
-        print(f"✅ Notion: {saved_count}件の新しいページを保存")
-        return saved_count
+        print(f"✅ Notion: 新規{totals['inserted']}件・更新{totals['updated']}件のページを保存"
+              f"（変更なし: {totals['unchanged']}件）")
+        return totals['inserted']
         
     except Exception as e:
         print(f"❌ Notion同期エラー: {e}")
-        return 0
-
-def extract_text_from_blocks(blocks):
-    """Notionブロックからテキスト抽出"""
-    text_content = []
+        raise
     
-    for block in blocks[:10]:  # 最初の10ブロックのみ
-        block_type = block.get('type')
-        
-        if block_type in ['paragraph', 'heading_1', 'heading_2', 'heading_3']:
-            rich_text = block.get(block_type, {}).get('rich_text', [])
-            text = ''.join([t.get('plain_text', '') for t in rich_text])
-            if text.strip():
-                text_content.append(text.strip())
-    
-    return '\n\n'.join(text_content)
+    finally:
+        # API呼び出しはページ本文（ブロック）の取得分
+        record_sync('notion', written, time.monotonic() - started,
+                    extractor.api_calls if extractor else 0, extractor.rate_limited if extractor else 0)
 
-def search_messages(query, platform=None, limit=50):
-    """検索機能"""
+def sync_discord_data(progress=None):
+    """Discordデータ同期（チャンネルごとに新しいメッセージと過去へのさかのぼりを並列に取得）"""
+    if not DISCORD_BOT_TOKEN or not DISCORD_GUILD_ID:
+        print("⚠️ DISCORD_BOT_TOKEN・DISCORD_GUILD_IDが設定されていません")
+        return 0
+    
+    client = DiscordClient(DISCORD_BOT_TOKEN, base_url=DISCORD_API_BASE)
+    started = time.monotonic()
+    totals = {'inserted': 0, 'updated': 0, 'unchanged': 0}
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        base_query = """
-            SELECT id, platform, message_id, content, author, channel, timestamp, url
-            FROM messages 
-            WHERE content LIKE ?
-        """
+        channels = client.get_text_channels(DISCORD_GUILD_ID)
+        if progress:
+            progress.set_total(len(channels))
         
-        params = [f'%{query}%']
+        # チャンネルごとの進捗（取り込んだ最新・最古のSnowflake ID）
+        conn = db_pool.connection()
+        try:
+            states = load_sync_states(conn, 'discord')
+        finally:
+            conn.close()
         
-        if platform and platform in ['chatwork', 'notion']:
-            base_query += " AND platform = ?"
-            params.append(platform)
-        
-        base_query += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
+        for channel, updates in client.iter_channel_updates(channels, states):
+            if updates is None:
+                if progress:
+                    progress.advance()
+                continue
+            
+            messages, newest, oldest = updates
+            channel_id = channel['id']
+            rows = [{
+                'message_id': message['id'],
+                'content': message['content'],
+                'author': message_author(message),
+                'channel': f"#{channel['name']}",
+                'timestamp': message.get('timestamp'),
+                'url': message_url(DISCORD_GUILD_ID, channel_id, message['id'])
+            } for message in messages if message.get('content')]
+            
+            # 取り込んだメッセージと同じトランザクションで進捗を進める
+            with db_pool.writer() as conn:
+                result = upsert_messages(conn, 'discord', rows)
+                if newest:
+                    save_sync_state(conn, 'discord', channel_id, newest)
+                if oldest:
+                    save_sync_state(conn, 'discord', backfill_scope(channel_id), oldest)
+            search_backend.index_ingested('discord', rows, result)
+            
+            for key in totals:
+                totals[key] += result[key]
+            if progress:
+                progress.advance(rows=result['inserted'] + result['updated'])
         
-        cursor.execute(base_query, params)
-        results = cursor.fetchall()
+        print(f"✅ Discord: {len(channels)}チャンネルから新規{totals['inserted']}件・更新{totals['updated']}件を保存"
+              f"（変更なし: {totals['unchanged']}件 / API呼び出し: {client.api_calls}回）")
+        return totals['inserted']
         
-        messages = []
-        for row in results:
-            message = {
-                'id': row['id'],
-                'platform': row['platform'],
-                'message_id': row['message_id'],
-                'content': row['content'],
-                'author': row['author'],
-                'channel': row['channel'],
-                'timestamp': row['timestamp'],
-                'url': row['url']
-            }
-            messages.append(message)
+    except Exception as e:
+        print(f"❌ Discord同期エラー: {e}")
+        raise
+    
+    finally:
+        client.close()
+        record_sync('discord', totals['inserted'] + totals['updated'], time.monotonic() - started,
+                    client.api_calls, client.rate_limited)
+
+def create_sync_scheduler():
+    """Chatwork・Notion・Discordの同期ジョブを登録したスケジューラー"""
+    scheduler = SyncScheduler(db_pool)
+    scheduler.add_job('chatwork', sync_chatwork_data)
+    scheduler.add_job('notion', sync_notion_data)
+    scheduler.add_job('discord', sync_discord_data)
+    return scheduler
+
+sync_scheduler = create_sync_scheduler()
+
+# POST /api/sync で受け付ける同期ジョブ（プラットフォームと進捗の単位）
+sync_jobs = SyncJobManager(sync_scheduler, [('chatwork', 'rooms'), ('notion', 'pages'), ('discord', 'channels')])
+
+# 検索APIで返すメッセージの項目
+MESSAGE_FIELDS = ('id', 'platform', 'message_id', 'content', 'author', 'channel', 'timestamp', 'url')
+
+def message_dict(row, query, full=False, sort='recent'):
+    """
+    検索結果の行をAPIのメッセージ形式にする（本文は抜粋と一致位置。full=True なら本文全体）
+
+    関連度順ならチャンネル名などの一致位置も field_highlights に付けます。
+    """
+    message = {key: row[key] for key in MESSAGE_FIELDS}
+    message.update(highlight_content(row['content'], query, full))
+    if sort == 'relevance':
+        message['field_highlights'] = field_highlights(row, query)
+    return message
+
+def search_messages(query, platform=None, limit=50, sort='recent', full=False):
+    """
+    検索機能（sort='relevance' なら関連度順、それ以外は新しい順）
+
+    メッセージの一覧は組み立て済みのJSON文字列（messages_json）で返します。
+    """
+    try:
+        conn = db_pool.connection()
         
+        # 同じ条件の検索はキャッシュから返す（データ世代は検索より先に読む）
+        generation = read_data_generation(conn)
         conn.close()
+        cache_key = search_cache_key(query, platform, limit, sort=sort, full=full)
+        cached = search_cache.get(cache_key, generation)
+        if cached is not None:
+            return dict(cached, cached=True)
         
-        return {
+        # 検索はバックエンド（SQLite / MeiliSearch）に任せる（SQLiteならJSONまでSQLiteで作る）
+        platform = platform if platform in ['chatwork', 'notion', 'discord'] else None
+        # 同じ条件の検索が実行中なら、その結果を待って使う
+        found = search_flights.run((cache_key, generation), lambda: search_backend.search_json(
+            query, platform, limit, count_mode='none', sort=sort, full=full, fields=MESSAGE_FIELDS
+        ))
+        
+        result = {
             'success': True,
             'query': query,
-            'total_results': len(messages),
-            'messages': messages
+            'sort': found['sort'],
+            'total_results': found['count'],
+            'messages_json': found['results_json']
         }
+        search_cache.put(cache_key, generation, result)
+        return dict(result, cached=False)
         
     except Exception as e:
         return {
             'success': False,
             'error': str(e),
-            'messages': []
+            'messages_json': '[]'
         }
 
 def get_statistics():
     """統計情報取得"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM messages")
-        total_count = cursor.fetchone()[0]
-        
-        cursor.execute("""
-            SELECT platform, COUNT(*) as count 
-            FROM messages 
-            GROUP BY platform
-        """)
-        platform_stats = dict(cursor.fetchall())
-        
-        cursor.execute("SELECT MAX(timestamp) as latest_update FROM messages")
-        latest_update = cursor.fetchone()[0]
-        
+        # 集計テーブルから読むので、メッセージ数に関係なく一定時間で返せる
+        conn = db_pool.connection()
+        counters = read_message_counters(conn)
         conn.close()
         
         return {
-            'total_count': total_count,
-            'platforms': platform_stats,
-            'latest_update': latest_update
+            'total_count': counters['total_count'],
+            'platforms': counters['platforms'],
+            'latest_update': counters['latest_update']
         }
         
     except Exception as e:
@@ -292,23 +433,60 @@ def index():
 
 @app.route('/api/sync', methods=['POST'])
 def api_sync():
-    """データ同期API"""
-    chatwork_count = sync_chatwork_data()
-    notion_count = sync_notion_data()
+    """
+    データ同期API（?full=1 でNotionを全ページ取り直す）
+
+    同期はバックグラウンドのジョブとして実行し、ジョブIDをすぐに返します。
+    実行中のジョブがあれば、新しく始めずにそのジョブIDを返します。
+    通常の同期の実行中に full=1 を受けたときは、終わったあとに続けて全ページを取り直すジョブのIDを返します。
+    進捗は GET /api/sync/jobs/<job_id> で確認できます。
+    """
+    full = request.args.get('full') == '1'
+    job, coalesced = sync_jobs.submit(full=full)
     
     return jsonify({
         'success': True,
-        'chatwork_synced': chatwork_count,
-        'notion_synced': notion_count,
-        'total_synced': chatwork_count + notion_count
+        'job_id': job.id,
+        'status': job.status,
+        'coalesced': coalesced,
+        'status_url': f'/api/sync/jobs/{job.id}'
+    }), 202
+
+@app.route('/api/sync/jobs', methods=['GET'])
+def api_sync_jobs():
+    """最近の同期ジョブ一覧"""
+    return jsonify({
+        'success': True,
+        'jobs': [job.to_dict() for job in sync_jobs.recent()]
+    })
+
+@app.route('/api/sync/jobs/<job_id>', methods=['GET'])
+def api_sync_job(job_id):
+    """同期ジョブの進捗"""
+    job = sync_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': '同期ジョブが見つかりません'
+        }), 404
+    
+    return jsonify(dict(job.to_dict(), success=True))
+
+@app.route('/api/sync/status', methods=['GET'])
+def api_sync_status():
+    """定期同期の実行状況"""
+    return jsonify({
+        'scheduler_enabled': SYNC_SCHEDULER_ENABLED,
+        'jobs': sync_scheduler.status()
     })
 
 @app.route('/api/search', methods=['GET'])
 def api_search():
-    """検索API"""
+    """検索API（?sort=relevance で関連度順、?stream=1 でNDJSONのストリーミング、?full=1 で本文全体）"""
     query = request.args.get('q', '').strip()
     platform = request.args.get('platform', None)
     limit = int(request.args.get('limit', 50))
+    full = request.args.get('full', '').strip().lower() in ('1', 'true', 'yes')
     
     if not query:
         return jsonify({
@@ -317,18 +495,41 @@ def api_search():
             'messages': []
         })
     
-    result = search_messages(query, platform, limit)
+    try:
+        sort = parse_sort_mode(request.args.get('sort'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'messages': []
+        })
+    
+    # ストリーミング（キャッシュ・統計情報は付けず、読んだそばから1件ずつ返す）
+    if wants_stream(request):
+        platform = platform if platform in ['chatwork', 'notion', 'discord'] else None
+        return ndjson_response(search_backend.iter_results(query, platform, limit, sort=sort),
+                               lambda row: message_dict(row, query, full, sort))
+    
+    result = search_messages(query, platform, limit, sort, full)
     stats = get_statistics()
     result['stats'] = stats
     
-    return jsonify(result)
+    return search_json_response(result, 'messages', result.pop('messages_json'))
 
 @app.route('/api/stats', methods=['GET'])
 def api_stats():
     """統計情報API"""
     stats = get_statistics()
+    stats['search_cache'] = search_cache.stats()
+    stats['search_coalescing'] = search_flights.stats()
+    stats['search_backend'] = search_backend.stats()
     return jsonify(stats)
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus形式のメトリクス"""
+    return metrics_response()
+
 @app.route('/api/health', methods=['GET'])
 def api_health():
     """ヘルスチェック"""
@@ -337,7 +538,8 @@ def api_health():
         'timestamp': datetime.now().isoformat(),
         'database_accessible': os.path.exists(DB_PATH),
         'chatwork_token_set': bool(CHATWORK_API_TOKEN),
-        'notion_token_set': bool(NOTION_API_TOKEN)
+        'notion_token_set': bool(NOTION_API_TOKEN),
+        'discord_token_set': bool(DISCORD_BOT_TOKEN)
     })
 
 if __name__ == '__main__':
@@ -346,10 +548,10 @@ if __name__ == '__main__':
     # データベース初期化
     init_database()
     
-    # 初回データ同期
-    print("🔄 初回データ同期を実行中...")
-    chatwork_count = sync_chatwork_data()
-    notion_count = sync_notion_data()
+    # 初回データ同期と定期同期はバックグラウンドで実行（起動・検索を待たせない）
+    if SYNC_SCHEDULER_ENABLED:
+        print("🔄 初回データ同期をバックグラウンドで開始します...")
+        sync_scheduler.start(run_now=True)
     
     # 統計表示
     stats = get_statistics()
@@ -1,9 +1,13 @@
 from flask import Flask, request, jsonify, render_template
-import sqlite3
 import os
 from dotenv import load_dotenv
 import logging
 
+from db_pool import get_pool
+from search_backend import get_search_backend
+from search_index import ensure_fts_index
+from search_response import search_json_response
+
 # 環境変数を読み込み
 load_dotenv()
 
@@ -13,10 +17,10 @@ app = Flask(__name__, template_folder='../frontend')
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    conn = sqlite3.connect('data/search.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+# 検索APIで返すメッセージの項目
+MESSAGE_FIELDS = ('id', 'platform', 'message_id', 'content', 'author', 'channel', 'timestamp', 'url')
+# 検索する列（本文と発信者名）
+SEARCH_FIELDS = ('content', 'author')
 
 @app.route('/')
 def index():
@@ -41,63 +45,25 @@ def search():
                 'total_pages': 0
             })
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 正しいカラム名を使用したSQL文
+        # 検索はバックエンド（SQLite / MeiliSearch）に任せる（結果の一覧はJSONに組み立て済みで受け取る）
         offset = (page - 1) * per_page
-        params = [f'%{query}%', f'%{query}%']
-        
-        # データ取得
-        cursor.execute("""
-            SELECT 
-                id, platform, message_id, content, 
-                author, channel, timestamp, url
-            FROM messages 
-            WHERE (content LIKE ? OR author LIKE ?)
-            ORDER BY timestamp DESC
-            LIMIT ? OFFSET ?
-        """, params + [per_page, offset])
-        
-        results = cursor.fetchall()
-        
-        # 総数取得
-        count_params = [f'%{query}%', f'%{query}%']
-        cursor.execute("""
-            SELECT COUNT(*) as total 
-            FROM messages 
-            WHERE (content LIKE ? OR author LIKE ?)
-        """, count_params)
+        found = get_search_backend(get_pool('data/search.db')).search_json(
+            query, None, per_page, offset, full=True, fields=MESSAGE_FIELDS,
+            search_fields=SEARCH_FIELDS
+        )
         
-        total_count = cursor.fetchone()[0]
+        total_count = found['total']
         total_pages = (total_count + per_page - 1) // per_page
         
-        # 結果を辞書に変換
-        data = []
-        for row in results:
-            data.append({
-                'id': row['id'],
-                'platform': row['platform'],
-                'message_id': row['message_id'],
-                'content': row['content'],
-                'author': row['author'],
-                'channel': row['channel'],
-                'timestamp': row['timestamp'],
-                'url': row['url']
-            })
-        
-        conn.close()
+        logger.info(f"検索結果: {found['count']}件, 総数: {total_count}件")
         
-        logger.info(f"検索結果: {len(data)}件, 総数: {total_count}件")
-        
-        return jsonify({
+        return search_json_response({
             'success': True,
-            'data': data,
             'total': total_count,
             'page': page,
             'per_page': per_page,
             'total_pages': total_pages
-        })
+        }, 'data', found['results_json'])
         
     except Exception as e:
         logger.error(f"検索エラー: {str(e)}")
@@ -108,4 +74,9 @@ def search():
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 8000))
+    
+    # 全文検索インデックスを準備（既存DBの移行）
+    with get_pool('data/search.db').writer() as conn:
+        ensure_fts_index(conn)
+    
     app.run(debug=True, host='0.0.0.0', port=port)
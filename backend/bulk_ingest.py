@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+📥 メッセージの一括取り込み（UPSERT）
+
+同期処理で1件ずつ「SELECT COUNT(*) で存在確認 → INSERT」すると、
+1メッセージあたり2往復のクエリがPythonのループの中で走ります。
+ここでは正規化済みの行をまとめて受け取り、
+INSERT ... ON CONFLICT(platform, message_id) DO UPDATE を executemany で書き込みます。
+
+- 内容が変わっていない行は更新しない（FTSや集計のトリガーも動かない）
+- 新規・更新・変更なしの件数を返す
+- 書き込んだ行があればデータ世代を進める（検索結果キャッシュの無効化）
+- commitは呼び出し側で（1回の同期を1トランザクションにまとめられるように）
+
+使い方:
+    with pool.writer() as conn:
+        result = upsert_messages(conn, 'chatwork', rows)
+        # => {'inserted': 120, 'updated': 3, 'unchanged': 877}
+"""
+
+from metrics import SQLITE_QUERY_SECONDS
+from search_cache import bump_data_generation, ensure_data_generation
+from search_index import message_columns
+
+# 📐 1回の executemany で書き込む件数（IN句のパラメータ上限999に収まるように）
+BATCH_SIZE = 500
+
+# 取り込む列（論理名）。テーブルに無い列は無視されます
+INGEST_FIELDS = ('content', 'title', 'author', 'channel', 'timestamp', 'url')
+
+
+def _ingest_columns(conn):
+    """論理名→実際の列名（message_id と、テーブルに存在する取り込み列）"""
+    columns = message_columns(conn)
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(messages)')}
+    columns['url'] = 'url' if 'url' in existing else None
+    return columns
+
+
+def has_upsert_index(conn):
+    """(platform, message_id) にUNIQUE制約（インデックス）があるかどうか"""
+    message_id = message_columns(conn)['message_id']
+    for index in conn.execute('PRAGMA index_list(messages)').fetchall():
+        # index_list: (seq, name, unique, origin, partial)
+        if not index[2]:
+            continue
+        indexed = [row[2] for row in conn.execute(f"PRAGMA index_info('{index[1]}')")]
+        if indexed == ['platform', message_id]:
+            return True
+    return False
+
+
+def ensure_upsert_index(conn):
+    """
+    UPSERTに必要な (platform, message_id) のUNIQUEインデックスを作成する
+
+    init_db.py版のテーブルは UNIQUE(platform, platform_id) があるので何もしません。
+    本番版のテーブルには無いため、重複している行を（新しい方を残して）削除してから作成します。
+    取り込みのたびに進めるデータ世代のテーブルもここで作成します。
+
+    戻り値: 重複を削除したメッセージの (platform, message_id) の一覧
+            （検索バックエンドの index_keys() に渡すと、削除した古い行が検索から消えます）
+    """
+    ensure_data_generation(conn)
+
+    if has_upsert_index(conn):
+        return []
+
+    message_id = message_columns(conn)['message_id']
+    if not message_id:
+        # messagesテーブルがまだ無い
+        return []
+
+    duplicated = [
+        (row[0], str(row[1])) for row in conn.execute(f'''
+            SELECT platform, {message_id} FROM messages
+            WHERE {message_id} IS NOT NULL
+            GROUP BY platform, {message_id}
+            HAVING COUNT(*) > 1
+        ''')
+    ]
+    deleted = conn.execute(f'''
+        DELETE FROM messages
+        WHERE {message_id} IS NOT NULL
+          AND id NOT IN (
+              SELECT MAX(id) FROM messages
+              WHERE {message_id} IS NOT NULL
+              GROUP BY platform, {message_id}
+          )
+    ''').rowcount
+    if deleted:
+        bump_data_generation(conn)
+        print(f"🧹 重複していたメッセージを{deleted}件削除しました")
+
+    conn.execute(f'''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_platform_message_id
+        ON messages(platform, {message_id})
+    ''')
+    conn.commit()
+    return duplicated
+
+
+def upsert_messages(conn, platform, rows, batch_size=BATCH_SIZE):
+    """
+    メッセージをまとめて取り込む
+
+    rows: 論理名の辞書のリスト
+          {'message_id', 'content', 'title', 'author', 'channel', 'timestamp', 'url'}
+    戻り値: {'inserted': 新規件数, 'updated': 更新件数, 'unchanged': 変更なし件数}
+    """
+    columns = _ingest_columns(conn)
+    message_id = columns['message_id']
+    fields = [field for field in INGEST_FIELDS if columns.get(field)]
+    targets = [columns[field] for field in fields]
+
+    # 変更があった列だけ更新する（IS NOT はNULL同士を等しいとみなす）
+    sql = f'''
+        INSERT INTO messages (platform, {message_id}, {', '.join(targets)})
+        VALUES ({', '.join('?' * (len(targets) + 2))})
+        ON CONFLICT(platform, {message_id}) DO UPDATE SET
+            {', '.join(f'{c} = excluded.{c}' for c in targets)}
+        WHERE {' OR '.join(f'{c} IS NOT excluded.{c}' for c in targets)}
+    '''
+
+    # 同じメッセージが複数回来た場合は最後のものを使う
+    latest = {}
+    for row in rows:
+        latest[str(row['message_id'])] = row
+    keys = list(latest)
+
+    result = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+
+        placeholders = ', '.join('?' * len(batch))
+        existing = {
+            row[0] for row in conn.execute(
+                f'SELECT {message_id} FROM messages '
+                f'WHERE platform = ? AND {message_id} IN ({placeholders})',
+                [platform, *batch]
+            )
+        }
+
+        params = [
+            (platform, key, *(_value(latest[key], field) for field in fields))
+            for key in batch
+        ]
+        # rowcount はトリガー（FTS・集計）による変更を含まないので、実際に書き込んだ行数になる
+        with SQLITE_QUERY_SECONDS.time('upsert'):
+            changed = conn.executemany(sql, params).rowcount
+
+        inserted = len(batch) - len(existing)
+        result['inserted'] += inserted
+        result['updated'] += changed - inserted
+        result['unchanged'] += len(batch) - changed
+
+    if result['inserted'] or result['updated']:
+        # 書き込みと同じトランザクションで進めるので、commitと同時にキャッシュが無効になる
+        bump_data_generation(conn)
+    return result
+
+
+def _value(row, field):
+    value = row.get(field)
+    if field == 'content' and value is None:
+        # init_db.py版のテーブルは content が NOT NULL
+        return ''
+    return value
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+💬 Chatwork APIクライアント（並列取得・レート制限対応）
+
+ルームごとのメッセージ取得をスレッドプールで並列に行います。
+Chatwork APIには「5分間に300回」のレート制限があるため、
+トークンバケットで送信ペースを調整し、レスポンスの X-RateLimit-* ヘッダーで
+残り回数を補正します。429が返ってきた場合はリセット時刻まで待ってから再試行します。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import requests
+
+CHATWORK_API_BASE = 'https://api.chatwork.com/v2'
+
+# 📐 取得設定
+RATE_LIMIT = 300          # Chatworkのレート制限（回数）
+RATE_WINDOW = 300         # Chatworkのレート制限（秒）
+MAX_WORKERS = 8           # 同時に取得するルーム数
+MAX_RETRIES = 3           # 429やネットワークエラー時の再試行回数
+REQUEST_TIMEOUT = 30      # 1リクエストのタイムアウト（秒）
+
+# 📐 差分同期の設定
+MESSAGES_PAGE_SIZE = 100  # messages API が一度に返す最大件数
+MAX_DELTA_PAGES = 10      # 差分取得で追いかける最大回数（それ以上は次回の同期へ）
+STALE_AFTER = timedelta(days=7)  # これより古い進捗は信用せず、最新100件から取り直す
+
+
+class TokenBucket:
+    """
+    レート制限用のトークンバケット
+
+    rate: 1秒あたりに補充されるトークン数
+    capacity: 貯められるトークンの上限（一度に送れるリクエスト数）
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1つ取る（無ければ補充されるまで待つ）。待った秒数を返す"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def observe(self, remaining, reset_at):
+        """
+        サーバーが返した残り回数で補正する
+
+        remaining: 残りリクエスト数、reset_at: 回数がリセットされる時刻（UNIX時間）
+        """
+        with self.lock:
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0:
+                self.block_until(reset_at)
+
+    def block_until(self, reset_at):
+        """reset_at（UNIX時間）まで送信を止める（呼び出し側でロック済みでも可）"""
+        wait = max(0.0, reset_at - time.time())
+        self.blocked_until = max(self.blocked_until, time.monotonic() + wait)
+
+
+class ChatworkClient:
+    """Chatwork APIクライアント"""
+
+    def __init__(self, token, base_url=CHATWORK_API_BASE, max_workers=MAX_WORKERS,
+                 rate_limit=RATE_LIMIT, rate_window=RATE_WINDOW):
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate_limit / rate_window, rate_limit)
+
+        self.session = requests.Session()
+        self.session.headers['X-ChatWorkToken'] = token
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # 取得状況（同期ログやメトリクス用）
+        self.api_calls = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _get(self, path, params=None):
+        """GETリクエスト（レート制限を守り、429は待ってから再試行）"""
+        for attempt in range(MAX_RETRIES + 1):
+            waited = self.bucket.acquire()
+            try:
+                response = self.session.get(
+                    f'{self.base_url}{path}', params=params, timeout=REQUEST_TIMEOUT
+                )
+            except requests.RequestException:
+                if attempt == MAX_RETRIES:
+                    raise
+                time.sleep(2 ** attempt)
+                continue
+
+            with self._stats_lock:
+                self.api_calls += 1
+                self.wait_seconds += waited
+
+            remaining = response.headers.get('X-RateLimit-Remaining')
+            reset_at = response.headers.get('X-RateLimit-Reset')
+            if remaining is not None and reset_at is not None:
+                self.bucket.observe(int(remaining), float(reset_at))
+
+            if response.status_code == 429:
+                with self._stats_lock:
+                    self.rate_limited += 1
+                with self.bucket.lock:
+                    self.bucket.block_until(float(reset_at) if reset_at else time.time() + 2 ** attempt)
+                continue
+
+            response.raise_for_status()
+            if response.status_code == 204 or not response.content:
+                # 204: 新しいメッセージが無い
+                return []
+            return response.json()
+
+        raise requests.HTTPError(f'Chatwork APIのレート制限により取得できませんでした: {path}')
+
+    def get_rooms(self):
+        """参加しているルーム一覧"""
+        return self._get('/rooms')
+
+    def get_messages(self, room_id, force=True):
+        """
+        ルームのメッセージ一覧
+
+        force=True: 最新100件を取得 / force=False: 前回取得以降の未取得分のみ
+        """
+        return self._get(f'/rooms/{room_id}/messages', params={'force': 1 if force else 0})
+
+    def get_room_updates(self, room, state):
+        """
+        前回の同期以降の新しいメッセージだけを取得する
+
+        state: sync_state の進捗（初回はNone）。cursor に最後のmessage_id、
+               cursor_time に最後のsend_time が入っている。
+
+        - ルーム一覧の last_update_time が前回から変わっていなければAPIを呼ばない
+        - 通常は force=0（未取得分のみ）で差分を取る
+        - 初回や進捗が古すぎる場合は force=1 で最新100件を取り直す（上限付きの取り直し）
+        - 更新があるのに未取得分が無い場合（編集・既読など）は、force=1 の最新100件をそのまま返す
+          （編集されたメッセージも取り込み直せるように。変わっていない行は upsert で書き込まれない）
+        """
+        last_id = int(state['cursor']) if state and state.get('cursor') else 0
+        last_time = int(state['cursor_time']) if state and state.get('cursor_time') else 0
+
+        if state and last_time and room.get('last_update_time', 0) <= last_time:
+            return []
+
+        if state is None or is_stale(state):
+            return self._newer_than(self.get_messages(room['room_id'], force=True), last_id)
+
+        messages = []
+        for _ in range(MAX_DELTA_PAGES):
+            page = self.get_messages(room['room_id'], force=False)
+            messages.extend(page)
+            if len(page) < MESSAGES_PAGE_SIZE:
+                break
+
+        if not messages and last_time and room.get('last_update_time', 0) > last_time:
+            # 更新があるのに未取得分が空 = メッセージの編集か、別のクライアントが既読にした。
+            # 最新100件を取り直し、前回までのメッセージも含めて返す（編集を取り込み直す）
+            return self.get_messages(room['room_id'], force=True)
+
+        return self._newer_than(messages, last_id)
+
+    @staticmethod
+    def _newer_than(messages, last_id):
+        return [m for m in messages if int(m['message_id']) > last_id]
+
+    def iter_room_messages(self, rooms, force=True):
+        """
+        複数ルームのメッセージを並列に取得し、取得できた順に (room, messages) を返す
+
+        取得に失敗したルームは messages が None になります。
+        """
+        return self._iter_rooms(rooms, lambda room: self.get_messages(room['room_id'], force))
+
+    def iter_room_updates(self, rooms, states):
+        """
+        複数ルームの差分を並列に取得し、取得できた順に (room, messages) を返す
+
+        states: {str(room_id): 進捗}（sync_state.load_sync_states の戻り値）
+        """
+        return self._iter_rooms(
+            rooms, lambda room: self.get_room_updates(room, states.get(str(room['room_id'])))
+        )
+
+    def _iter_rooms(self, rooms, fetch):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(fetch, room): room for room in rooms}
+            for future in as_completed(futures):
+                room = futures[future]
+                try:
+                    yield room, future.result()
+                except Exception as e:
+                    print(f"⚠️ Chatworkルーム取得エラー ({room.get('name', room['room_id'])}): {e}")
+                    yield room, None
+
+    def close(self):
+        self.session.close()
+
+
+def is_stale(state):
+    """進捗が古すぎるかどうか（長期間同期していないと未取得分の追跡が当てにならない）"""
+    try:
+        updated_at = datetime.fromisoformat(state['updated_at'])
+    except (KeyError, TypeError, ValueError):
+        return True
+    return datetime.now() - updated_at > STALE_AFTER
+
+
+def room_cursor(messages, room=None, state=None):
+    """
+    次回の進捗 (message_id, 日時) を作る
+
+    日時は取り込んだメッセージの send_time・ルーム一覧の last_update_time・前回の日時のうち最も新しいもの。
+    編集やメンバー・ルーム情報の変更で last_update_time だけが進んだルームも、
+    ここまで確認済みとして記録するので、次回はAPIを呼ばずに済む。
+    取り込むメッセージが無いか、前回より古いメッセージだけ（編集の取り直し）なら message_id は前回のまま。
+    """
+    cursor = state.get('cursor') if state else None
+    times = [int(room.get('last_update_time') or 0) if room else 0]
+    if state and state.get('cursor_time'):
+        times.append(int(state['cursor_time']))
+    if messages:
+        latest = max(messages, key=lambda m: int(m['message_id']))
+        if cursor is None or int(latest['message_id']) > int(cursor):
+            cursor = latest['message_id']
+        times.append(int(latest['send_time']))
+    return cursor, str(max(times))
+
+
+def room_cursor_changed(state, cursor):
+    """保存済みの進捗から変わったか（変わっていなければ書き込まない）"""
+    return state is None or (state.get('cursor'), state.get('cursor_time')) != cursor
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+🗄️ SQLite接続プール
+
+リクエストのたびに sqlite3.connect() するのをやめ、プロセス内で接続を使い回します。
+
+- 読み取り用接続: 使い終わったら close() でプールに戻る（本当には閉じない）
+- 書き込み用接続: プロセスに1本だけ。ロックで直列化して使う
+- WALモードなので、同期処理の書き込み中でも検索（読み取り）はブロックされない
+
+使い方:
+    pool = get_pool(DB_PATH)
+
+    conn = pool.connection()      # 読み取り
+    rows = conn.execute(...).fetchall()
+    conn.close()                  # プールに返却
+
+    with pool.writer() as conn:   # 書き込み（成功時commit / 例外時rollback）
+        conn.execute('INSERT ...')
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import SQLITE_CONNECTION_WAIT_SECONDS
+
+# 📐 PRAGMA設定
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 256 * 1024 * 1024        # 256MB（OSのページキャッシュを全接続で共有）
+READER_CACHE_KB = 8 * 1024           # 読み取り接続ごとのページキャッシュ 8MB
+WRITER_CACHE_KB = 32 * 1024          # 書き込み接続のページキャッシュ 32MB（一括登録用）
+MAX_IDLE_READERS = 16                # プールに保持する読み取り接続の上限
+
+
+class PooledConnection(sqlite3.Connection):
+    """close() するとプールに戻る接続"""
+
+    _pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
+
+    def close_for_real(self):
+        super().close()
+
+
+class ConnectionPool:
+    """1つのデータベースファイルに対する接続プール"""
+
+    def __init__(self, db_path, max_idle_readers=MAX_IDLE_READERS):
+        self.db_path = db_path
+        self.max_idle_readers = max_idle_readers
+        self._idle = []
+        self._idle_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._wal_ready = False
+
+    def _connect(self, cache_kb):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # 別スレッドのリクエストでも使い回す
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+
+        if not self._wal_ready:
+            # journal_modeはDBファイルに保存されるので一度だけでよい
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._wal_ready = True
+
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+        conn.execute(f'PRAGMA cache_size=-{cache_kb}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        return conn
+
+    def connection(self):
+        """読み取り用の接続を借りる（使い終わったら close() で返却）"""
+        started = time.perf_counter()
+        with self._idle_lock:
+            conn = self._idle.pop() if self._idle else None
+
+        if conn is None:
+            conn = self._connect(READER_CACHE_KB)
+        conn._pool = self
+        SQLITE_CONNECTION_WAIT_SECONDS.observe(time.perf_counter() - started, 'reader')
+        return conn
+
+    def release(self, conn):
+        """接続をプールに戻す"""
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._idle_lock:
+            if len(self._idle) < self.max_idle_readers:
+                self._idle.append(conn)
+                return
+
+        conn._pool = None
+        conn.close_for_real()
+
+    @contextmanager
+    def writer(self):
+        """書き込み用の接続（プロセス内で直列化）"""
+        started = time.perf_counter()
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect(WRITER_CACHE_KB)
+                # INSERT OR REPLACE による削除でもFTSの削除トリガーを動かす
+                self._writer.execute('PRAGMA recursive_triggers=ON')
+            # 他のスレッドの書き込みが終わるのを待った時間も含む
+            SQLITE_CONNECTION_WAIT_SECONDS.observe(time.perf_counter() - started, 'writer')
+
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close_all(self):
+        """プール内の接続をすべて閉じる"""
+        with self._idle_lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn._pool = None
+            conn.close_for_real()
+
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close_for_real()
+                self._writer = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """データベースファイルごとの接続プールを取得（プロセス内で共有）"""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(key)
+        return pool
+
+
+@atexit.register
+def close_all_pools():
+    """終了時にすべての接続を閉じる（WALのチェックポイントも行われる）"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
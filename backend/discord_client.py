@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+💬 Discord APIクライアント（チャンネル並列取得・レート制限対応）
+
+サーバー（ギルド）のテキストチャンネル一覧を取得し、チャンネルごとのメッセージを
+スレッドプールで並列に取得します。
+
+Discordのレート制限はルームごとではなく「ルート（エンドポイント）＋主要パラメーター
+（チャンネルIDなど）」ごとのバケットで管理されています。
+レスポンスの X-RateLimit-Bucket / Remaining / Reset-After でバケットごとに送信を調整し、
+全体の上限（1秒50回）はトークンバケットで守ります。429が返ってきた場合は retry_after だけ待って再試行します。
+
+メッセージIDはSnowflake（時刻順に増える整数）なので、before / after でページ送りができます。
+- 初回: 最新から before で過去へさかのぼる（1回の同期でさかのぼるページ数には上限あり）
+- 2回目以降: 前回の最新ID以降を after で取得し、さかのぼりが途中ならその続きも取得
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from chatwork_client import TokenBucket
+
+DISCORD_API_BASE = 'https://discord.com/api/v10'
+
+# 📐 取得設定
+GLOBAL_RATE_LIMIT = 50    # Discord全体のレート制限（1秒あたりの回数）
+MAX_WORKERS = 8           # 同時に取得するチャンネル数
+MAX_RETRIES = 3           # 429やネットワークエラー時の再試行回数
+REQUEST_TIMEOUT = 30      # 1リクエストのタイムアウト（秒）
+MESSAGES_PAGE_SIZE = 100  # messages API が一度に返す最大件数
+MAX_BACKFILL_PAGES = 20   # 1回の同期で過去にさかのぼる最大ページ数（続きは次回）
+MAX_FORWARD_PAGES = 50    # 1回の同期で新しいメッセージを追いかける最大ページ数
+
+# メッセージを取得するチャンネルの種類（0: テキスト, 5: アナウンス）
+TEXT_CHANNEL_TYPES = (0, 5)
+
+# さかのぼりが最後まで終わったことを表す進捗
+BACKFILL_DONE = 'done'
+
+
+class RouteBucket:
+    """ルートごとのレート制限の状態"""
+
+    def __init__(self):
+        self.remaining = 1
+        self.reset_at = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """1回分の送信枠を取る（残りが無ければリセットまで待つ）。待った秒数を返す"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if self.remaining <= 0 and now >= self.reset_at:
+                    # リセット時刻を過ぎた。正確な残り回数は次の応答ヘッダーで分かる
+                    self.remaining = 1
+                if self.remaining > 0:
+                    # 応答が返るまでに他のスレッドが送りすぎないよう、先に1回分減らしておく
+                    self.remaining -= 1
+                    return waited
+                wait = self.reset_at - now
+            time.sleep(wait)
+            waited += wait
+
+
+class DiscordClient:
+    """Discord APIクライアント（Botトークン）"""
+
+    def __init__(self, token, base_url=DISCORD_API_BASE, max_workers=MAX_WORKERS,
+                 global_rate_limit=GLOBAL_RATE_LIMIT):
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.global_bucket = TokenBucket(global_rate_limit, global_rate_limit)
+
+        # ルート → Discordのバケットハッシュ、(バケット, 主要パラメーター) → 状態
+        self.route_hashes = {}
+        self.buckets = {}
+        self._buckets_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Bot {token}'
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # 取得状況（同期ログやメトリクス用）
+        self.api_calls = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _bucket(self, route, major):
+        with self._buckets_lock:
+            key = (self.route_hashes.get(route, route), major)
+            if key not in self.buckets:
+                self.buckets[key] = RouteBucket()
+            return self.buckets[key]
+
+    def _update_bucket(self, route, major, headers):
+        """レスポンスヘッダーでバケットの状態を更新する"""
+        bucket_hash = headers.get('X-RateLimit-Bucket')
+        if bucket_hash:
+            with self._buckets_lock:
+                old_key = (self.route_hashes.get(route, route), major)
+                self.route_hashes[route] = bucket_hash
+                # ルート名で作っていた状態をバケットハッシュの方へ引き継ぐ
+                if old_key in self.buckets and (bucket_hash, major) not in self.buckets:
+                    self.buckets[(bucket_hash, major)] = self.buckets[old_key]
+
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_after = headers.get('X-RateLimit-Reset-After')
+        if remaining is None or reset_after is None:
+            return
+        bucket = self._bucket(route, major)
+        with bucket.lock:
+            bucket.remaining = int(remaining)
+            bucket.reset_at = time.monotonic() + float(reset_after)
+
+    def _get(self, route, major, path, params=None):
+        """
+        GETリクエスト（ルートごとのバケットと全体の上限を守り、429は待ってから再試行）
+
+        route: レート制限の単位になるルート名（例: 'GET /channels/{id}/messages'）
+        major: 主要パラメーター（チャンネルID・ギルドID）
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            bucket = self._bucket(route, major)
+            waited = bucket.acquire()
+            waited += self.global_bucket.acquire()
+
+            try:
+                response = self.session.get(
+                    f'{self.base_url}{path}', params=params, timeout=REQUEST_TIMEOUT
+                )
+            except requests.RequestException:
+                with bucket.lock:
+                    bucket.remaining = max(bucket.remaining, 1)
+                if attempt == MAX_RETRIES:
+                    raise
+                time.sleep(2 ** attempt)
+                continue
+
+            with self._stats_lock:
+                self.api_calls += 1
+                self.wait_seconds += waited
+
+            self._update_bucket(route, major, response.headers)
+
+            if response.status_code == 429:
+                with self._stats_lock:
+                    self.rate_limited += 1
+                body = response.json() if response.content else {}
+                retry_after = float(body.get('retry_after', 2 ** attempt))
+                if body.get('global'):
+                    with self.global_bucket.lock:
+                        self.global_bucket.block_until(time.time() + retry_after)
+                else:
+                    with bucket.lock:
+                        bucket.remaining = 0
+                        bucket.reset_at = time.monotonic() + retry_after
+                continue
+
+            response.raise_for_status()
+            return response.json()
+
+        raise requests.HTTPError(f'Discord APIのレート制限により取得できませんでした: {path}')
+
+    def get_text_channels(self, guild_id):
+        """サーバーのテキストチャンネル一覧"""
+        channels = self._get(
+            'GET /guilds/{id}/channels', guild_id, f'/guilds/{guild_id}/channels'
+        )
+        return [c for c in channels if c.get('type') in TEXT_CHANNEL_TYPES]
+
+    def get_messages(self, channel_id, before=None, after=None, limit=MESSAGES_PAGE_SIZE):
+        """
+        チャンネルのメッセージ（新しい順）
+
+        before: このIDより古いメッセージ / after: このIDより新しいメッセージ
+        """
+        params = {'limit': limit}
+        if before is not None:
+            params['before'] = before
+        if after is not None:
+            params['after'] = after
+        return self._get(
+            'GET /channels/{id}/messages', channel_id, f'/channels/{channel_id}/messages', params
+        )
+
+    def get_channel_updates(self, channel, state, backfill):
+        """
+        前回の同期以降の新しいメッセージと、さかのぼりの続きを取得する
+
+        state: 最新側の進捗（cursor に取り込んだ最新のメッセージID。初回はNone）
+        backfill: さかのぼりの進捗（cursor に取り込んだ最古のメッセージID、終わっていれば 'done'）
+        戻り値: (messages, 最新ID, 最古ID または 'done')
+        """
+        channel_id = channel['id']
+        newest = int(state['cursor']) if state and state.get('cursor') else 0
+        oldest = backfill.get('cursor') if backfill else None
+        messages = []
+
+        # 新しいメッセージ（after で古い方から順に追いかける）
+        # さかのぼりが終わっていれば、メッセージが無かったチャンネルも先頭から追いかける
+        last_message_id = int(channel.get('last_message_id') or 0)
+        if (newest or oldest == BACKFILL_DONE) and last_message_id > newest:
+            after = newest
+            for _ in range(MAX_FORWARD_PAGES):
+                page = self.get_messages(channel_id, after=after)
+                messages.extend(page)
+                if len(page) < MESSAGES_PAGE_SIZE:
+                    break
+                after = max(int(m['id']) for m in page)
+
+        # 過去のメッセージ（before でさかのぼる。初回は最新から）
+        if oldest != BACKFILL_DONE and (newest == 0 or oldest):
+            before = oldest
+            for _ in range(MAX_BACKFILL_PAGES):
+                page = self.get_messages(channel_id, before=before)
+                messages.extend(page)
+                if len(page) < MESSAGES_PAGE_SIZE:
+                    before = BACKFILL_DONE
+                    break
+                before = str(min(int(m['id']) for m in page))
+            oldest = before
+
+        if messages:
+            newest = max(newest, max(int(m['id']) for m in messages))
+        return messages, (str(newest) if newest else None), oldest
+
+    def iter_channel_updates(self, channels, states):
+        """
+        複数チャンネルの差分を並列に取得し、取得できた順に (channel, 結果) を返す
+
+        states: {scope: 進捗}（sync_state.load_sync_states(conn, 'discord') の戻り値）
+        取得に失敗したチャンネルは結果が None になります。
+        """
+        def fetch(channel):
+            return self.get_channel_updates(
+                channel, states.get(channel['id']), states.get(backfill_scope(channel['id']))
+            )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(fetch, channel): channel for channel in channels}
+            for future in as_completed(futures):
+                channel = futures[future]
+                try:
+                    yield channel, future.result()
+                except Exception as e:
+                    print(f"⚠️ Discordチャンネル取得エラー (#{channel.get('name', channel['id'])}): {e}")
+                    yield channel, None
+
+    def close(self):
+        self.session.close()
+
+
+def backfill_scope(channel_id):
+    """さかのぼりの進捗を保存する sync_state のスコープ"""
+    return f'{channel_id}:backfill'
+
+
+def message_author(message):
+    author = message.get('author') or {}
+    return author.get('global_name') or author.get('username') or 'Unknown'
+
+
+def message_url(guild_id, channel_id, message_id):
+    return f'https://discord.com/channels/{guild_id}/{channel_id}/{message_id}'
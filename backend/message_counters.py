@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📊 メッセージ件数の集計テーブル
+
+message_counters テーブルにプラットフォームごとの件数・最新日時を保持し、
+messagesテーブルのトリガーで差分更新します。
+統計API（/api/stats や検索結果の stats）は全件集計の代わりにこのテーブルを読みます。
+
+使い方（集計をゼロから作り直す）:
+    python backend/message_counters.py database/integrated_search.db
+"""
+
+import os
+import sqlite3
+import sys
+
+from metrics import SQLITE_QUERY_SECONDS
+from search_index import message_columns
+
+
+def _has_counters_table(conn):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_counters'"
+    ).fetchone()
+    return row is not None
+
+
+def _aggregate_sql(columns):
+    """messagesテーブルから集計を作るSELECT文"""
+    synced = f"MAX({columns['synced_at']})" if columns['synced_at'] else 'NULL'
+    where = f"WHERE {columns['is_deleted']} = 0" if columns['is_deleted'] else ''
+    return f'''
+        SELECT IFNULL(platform, '') AS platform,
+               COUNT(*) AS message_count,
+               MAX({columns['timestamp']}) AS latest_timestamp,
+               {synced} AS last_synchronized_at
+        FROM messages
+        {where}
+        GROUP BY IFNULL(platform, '')
+    '''
+
+
+def _counter_columns(conn):
+    columns = message_columns(conn)
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(messages)')}
+    columns['synced_at'] = 'synchronized_at' if 'synchronized_at' in existing else None
+    return columns
+
+
+def ensure_message_counters(conn):
+    """
+    集計テーブルとトリガーを作成する（既存DBの移行を兼ねる）
+
+    新規作成した場合は、既存データから集計を作り直します。
+    """
+    if _has_counters_table(conn):
+        return True
+
+    columns = _counter_columns(conn)
+    if not columns['timestamp']:
+        # messagesテーブルがまだ無い
+        return False
+
+    ts = columns['timestamp']
+    synced = columns['synced_at']
+    deleted = columns['is_deleted']
+
+    def add_row(ref):
+        """ref（new/old）の行を集計に加えるSQL"""
+        synced_value = f'{ref}.{synced}' if synced else 'NULL'
+        return f'''
+            INSERT INTO message_counters (platform, message_count, latest_timestamp, last_synchronized_at)
+            SELECT IFNULL({ref}.platform, ''), 1, {ref}.{ts}, {synced_value}
+            WHERE {f'{ref}.{deleted} = 0' if deleted else '1'}
+            ON CONFLICT(platform) DO UPDATE SET
+                message_count = message_count + 1,
+                latest_timestamp = CASE
+                    WHEN latest_timestamp IS NULL OR excluded.latest_timestamp > latest_timestamp
+                    THEN excluded.latest_timestamp ELSE latest_timestamp END,
+                last_synchronized_at = CASE
+                    WHEN last_synchronized_at IS NULL OR excluded.last_synchronized_at > last_synchronized_at
+                    THEN excluded.last_synchronized_at ELSE last_synchronized_at END;
+        '''
+
+    def remove_row(ref):
+        """ref（new/old）の行を集計から外すSQL（最新日時だった場合だけ再計算）"""
+        active = f'AND {deleted} = 0' if deleted else ''
+        return f'''
+            UPDATE message_counters SET
+                message_count = message_count - 1,
+                latest_timestamp = CASE
+                    WHEN {ref}.{ts} >= latest_timestamp
+                    THEN (SELECT MAX({ts}) FROM messages
+                          WHERE IFNULL(platform, '') = IFNULL({ref}.platform, '') {active})
+                    ELSE latest_timestamp END
+            WHERE platform = IFNULL({ref}.platform, '')
+              AND {f'{ref}.{deleted} = 0' if deleted else '1'};
+        '''
+
+    watched = ', '.join(c for c in ('platform', ts, synced, deleted) if c)
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS message_counters (
+            platform TEXT PRIMARY KEY,        -- プラットフォーム名
+            message_count INTEGER NOT NULL DEFAULT 0,
+            latest_timestamp TEXT,            -- 最新メッセージの日時
+            last_synchronized_at TEXT         -- 最新の同期日時（列がある場合のみ）
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS message_counters_ai AFTER INSERT ON messages BEGIN
+            {add_row('new')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS message_counters_ad AFTER DELETE ON messages BEGIN
+            {remove_row('old')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS message_counters_au AFTER UPDATE OF {watched} ON messages BEGIN
+            {remove_row('old')}
+            {add_row('new')}
+        END
+    ''')
+
+    rebuild_message_counters(conn)
+    return True
+
+
+def rebuild_message_counters(conn):
+    """集計テーブルをmessagesテーブルからゼロから作り直す（ずれた場合の修復用）"""
+    columns = _counter_columns(conn)
+    conn.execute('DELETE FROM message_counters')
+    conn.execute(f'''
+        INSERT INTO message_counters (platform, message_count, latest_timestamp, last_synchronized_at)
+        {_aggregate_sql(columns)}
+    ''')
+    conn.commit()
+
+
+def read_message_counters(conn):
+    """
+    統計情報を集計テーブルから取得
+
+    戻り値: {'total_count', 'platforms': {platform: 件数}, 'latest_update', 'last_sync'}
+    集計テーブルが無いDBでは、従来どおりmessagesテーブルを集計します。
+    """
+    with SQLITE_QUERY_SECONDS.time('stats'):
+        if _has_counters_table(conn):
+            rows = conn.execute('''
+                SELECT platform, message_count, latest_timestamp, last_synchronized_at
+                FROM message_counters
+                WHERE message_count > 0
+            ''').fetchall()
+        else:
+            rows = conn.execute(_aggregate_sql(_counter_columns(conn))).fetchall()
+
+    latest = [row[2] for row in rows if row[2] is not None]
+    synced = [row[3] for row in rows if row[3] is not None]
+    return {
+        'total_count': sum(row[1] for row in rows),
+        'platforms': {row[0]: row[1] for row in rows},
+        'latest_update': max(latest) if latest else None,
+        'last_sync': max(synced) if synced else None
+    }
+
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/integrated_search.db'
+
+    if not os.path.exists(db_path):
+        print(f"❌ データベースが見つかりません: {db_path}")
+        sys.exit(1)
+
+    conn = sqlite3.connect(db_path)
+    print(f"📊 メッセージ件数の集計を作り直しています: {db_path}")
+    if ensure_message_counters(conn):
+        rebuild_message_counters(conn)
+        stats = read_message_counters(conn)
+        print(f"✅ 集計が完了しました（総数: {stats['total_count']}件）")
+        for platform, count in stats['platforms'].items():
+            print(f"  - {platform}: {count}件")
+    conn.close()
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+📈 Prometheus形式のメトリクス（GET /metrics）
+
+これまでの手がかりは print() と search_stats テーブルだけでした。
+ここではプロセス内でカウンターとヒストグラムを集計し、/metrics でPrometheusのテキスト形式で返します。
+
+- ルートごとの応答時間（http_request_duration_seconds）
+- SQLiteの処理時間をクエリの種類ごとに（sqlite_query_duration_seconds）
+- 接続プールの接続待ち時間（sqlite_connection_wait_seconds）
+- 検索でSQLiteが読んだ行数と返した行数（search_rows_scanned_total / search_rows_returned_total）
+- 検索結果キャッシュのヒット率（search_cache_*）
+- プラットフォームごとの同期の件数・時間・API呼び出し・429（sync_*）
+
+記録は検索のたびに何度も通るので、軽く済むようにしています。
+- 値はスレッドごとに割り当てた区画（STRIPES 個）に足し込み、/metrics で読むときに合計する。
+  区画ごとにロックがあるので、同時に記録しても同じロックを取り合うことはほとんどない
+- ヒストグラムの区切りは bisect で探す（ロックの中は足し算だけ）
+- 検索結果キャッシュの件数などは記録せず、/metrics を読んだときに stats() から取る
+
+使い方:
+    from metrics import SQLITE_QUERY_SECONDS, install_request_metrics, metrics_response
+
+    install_request_metrics(app)            # ルートごとの応答時間を記録
+    with SQLITE_QUERY_SECONDS.time('count'):
+        conn.execute('SELECT COUNT(*) ...')
+
+    @app.route('/metrics')
+    def metrics():
+        return metrics_response()
+"""
+
+import itertools
+import threading
+import time
+from bisect import bisect_left
+
+# 📐 設定
+STRIPES = 8
+# 応答時間・処理時間の区切り（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_local = threading.local()
+_next_stripe = itertools.count()
+
+
+def _stripe():
+    """このスレッドの区画の番号（初めて記録したときに順番に割り当てる）"""
+    try:
+        return _local.stripe
+    except AttributeError:
+        _local.stripe = next(_next_stripe) % STRIPES
+        return _local.stripe
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """ラベルの値ごとに値を持つメトリクス（区画に分けて記録する）"""
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._stripes = [({}, threading.Lock()) for _ in range(STRIPES)]
+        REGISTRY.append(self)
+
+    def _merged(self, merge):
+        """区画を合計した {ラベルの値: 値}"""
+        merged = {}
+        for values, lock in self._stripes:
+            with lock:
+                items = list(values.items())
+            for labels, value in items:
+                merged[labels] = merge(merged.get(labels), value)
+        return merged
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    """増えるだけの値"""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        values, lock = self._stripes[_stripe()]
+        with lock:
+            values[labels] = values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        for labels, value in sorted(self._merged(lambda total, value: (total or 0) + value).items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}')
+        return lines
+
+
+class Histogram(_Metric):
+    """区切りごとの件数と合計（Prometheusの histogram）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help_text, labelnames)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        values, lock = self._stripes[_stripe()]
+        with lock:
+            series = values.get(labels)
+            if series is None:
+                # 区切りごとの件数（最後は上限なし）と合計
+                series = values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labels):
+        """with の中にかかった秒数を記録する"""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = self.header()
+        merged = self._merged(lambda total, series: [a + b for a, b in zip(total, series)] if total else list(series))
+        for labels, series in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class _Timer:
+    """Histogram.time() の with 文（contextmanager より呼び出しが軽い）"""
+
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class Gauge(_Metric):
+    """最後に設定した値"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+                                for labels, value in items]
+
+
+class Collected:
+    """/metrics を読んだときに関数から取る値（記録のコストが無い）"""
+
+    def __init__(self, name, help_text, kind, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._sources = []
+        REGISTRY.append(self)
+
+    def add_source(self, fn):
+        """fn() は {ラベルの値のタプル: 値}（値が None の行は出さない）"""
+        self._sources.append(fn)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for fn in self._sources:
+            for labels, value in sorted(fn().items()):
+                if value is not None:
+                    lines.append(f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}')
+        return lines
+
+
+REGISTRY = []
+
+# 🌐 HTTP
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'ルートごとの応答時間（ストリーミングは応答を返し始めるまで）',
+    ('route', 'method', 'status')
+)
+
+# 🗄️ SQLite
+SQLITE_QUERY_SECONDS = Histogram(
+    'sqlite_query_duration_seconds', 'SQLiteの処理時間（クエリの種類ごと）', ('query',)
+)
+SQLITE_CONNECTION_WAIT_SECONDS = Histogram(
+    'sqlite_connection_wait_seconds', '接続プールから接続を借りるまでの時間（reader / writer）', ('kind',)
+)
+
+# 🔎 検索
+SEARCH_ROWS_SCANNED = Counter(
+    'search_rows_scanned_total', '検索でSQLiteが読んだ行数（OFFSETで読み飛ばした行・件数を数えた行を含む）', ('sort',)
+)
+SEARCH_ROWS_RETURNED = Counter(
+    'search_rows_returned_total', '検索結果として返した行数', ('sort',)
+)
+SEARCH_CACHE_LOOKUPS = Collected(
+    'search_cache_lookups_total', '検索結果キャッシュを引いた回数（hit / miss）', 'counter', ('result',)
+)
+SEARCH_CACHE_HIT_RATIO = Collected(
+    'search_cache_hit_ratio', '検索結果キャッシュのヒット率（起動してから）', 'gauge'
+)
+
+# 🔄 同期
+SYNC_ROWS = Counter('sync_rows_total', '同期で書き込んだ行数（新規・更新）', ('platform',))
+SYNC_SECONDS = Counter('sync_duration_seconds_total', '同期にかかった時間の合計', ('platform',))
+SYNC_API_CALLS = Counter('sync_api_calls_total', '同期で呼んだAPIの回数', ('platform',))
+SYNC_RATE_LIMITED = Counter('sync_rate_limited_total', '同期でAPIが429を返した回数', ('platform',))
+SYNC_ROWS_PER_SECOND = Gauge('sync_last_rows_per_second', '最後の同期の書き込み速度（行/秒）', ('platform',))
+
+
+def record_sync(platform, rows, seconds, api_calls=0, rate_limited=0):
+    """1回の同期の結果を記録する"""
+    SYNC_ROWS.inc(platform, amount=rows)
+    SYNC_SECONDS.inc(platform, amount=seconds)
+    SYNC_API_CALLS.inc(platform, amount=api_calls)
+    SYNC_RATE_LIMITED.inc(platform, amount=rate_limited)
+    if seconds > 0:
+        SYNC_ROWS_PER_SECOND.set(round(rows / seconds, 3), platform)
+
+
+def watch_search_cache(cache):
+    """検索結果キャッシュの利用状況を /metrics に出す"""
+    def lookups():
+        stats = cache.stats()
+        return {('hit',): stats['hits'], ('miss',): stats['misses']}
+
+    SEARCH_CACHE_LOOKUPS.add_source(lookups)
+    SEARCH_CACHE_HIT_RATIO.add_source(lambda: {(): cache.stats()['hit_ratio']})
+
+
+def render_metrics():
+    """Prometheusのテキスト形式"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_response():
+    """GET /metrics の応答"""
+    from flask import Response
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+
+def install_request_metrics(app):
+    """Flaskアプリのリクエストごとに、ルート（URLの型）単位で応答時間を記録する"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # 実際のURLではなくルールで集計する（/api/sync/jobs/<job_id> など。ラベルが増え続けないように）
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method, str(response.status_code))
+        return response
@@ -0,0 +1,883 @@
+# -*- coding: utf-8 -*-
+"""
+🗂️ プロセス内の検索エンジン（mmapで共有する転置インデックス）
+
+SEARCH_BACKEND=mmap にすると、/api/search（新しい順）はSQLiteに問い合わせず、
+1つのインデックスファイルを mmap で読み取り専用に開いて検索します。
+ファイルはOSのページキャッシュに載るので、複数のワーカープロセスが同じページを共有し、
+プロセスごとにコピーを持ちません。
+
+インデックスの中身（セグメントごと）:
+- 文書表: messages.id / 並べ替えキー（日時） / プラットフォーム / 削除フラグ（array）
+- 本文: 小文字にそろえた本文を \\0 区切りで並べたもの（一致の確認と2文字以下の検索に使う）
+- 保存列: 検索結果として返す行（JSON）
+- 用語辞書: 本文の3文字（trigram）を整数にしたソート済み配列
+- メッセージ表: (platform, message_id) のハッシュ → 文書番号（SQLiteから消えた行を探すのに使う）
+- ポスティング: 用語ごとの文書番号を差分 + 可変長整数（varint）で詰めたもの
+
+文書は新しい順に並べて番号を付けるので、ポスティングを先頭から読めばそのまま新しい順になり、
+必要な件数がそろった時点で打ち切れます。3文字以上のクエリは一番出現の少ない用語のポスティングだけを読み、
+本文で一致を確かめます（SQLiteのtrigram検索と同じ部分一致）。
+
+ファイルの更新:
+- 同期で書き込まれたメッセージは index_ingested() で受け取り、バックグラウンドで
+  新しいセグメントとしてファイルの末尾に追記する（同じ行の古い版は新しいセグメントで隠れる）
+- SQLiteから消えていたメッセージ（削除・重複の整理）は、削除フラグだけの文書（tombstone）を追記して隠す
+- セグメントが SEARCH_INDEX_MERGE_SEGMENTS 個を超えたら、バックグラウンドで1つにまとめ直す
+  （別ファイルに書いてから置き換える。開いている側は次の検索で新しいファイルを開き直す）
+- ファイルが無ければ起動時にSQLiteから作る。作り直す場合:
+      SEARCH_BACKEND=mmap python backend/search_backend.py reindex database/integrated_search.db
+
+関連度順（sort=relevance）はSQLiteのBM25で検索します。
+"""
+
+import array
+import atexit
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from itertools import accumulate, islice
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: 書き込みのロックはプロセス内だけ
+    fcntl = None
+
+from pagination import ESTIMATE_COUNT_CAP, decode_cursor, next_cursor
+from search_backend import SearchBackend, SQLiteSearchBackend, load_message_rows, result_columns
+from search_cache import bump_data_generation
+from search_index import RECENCY_WEIGHT, TRIGRAM_MIN_LENGTH, message_columns
+
+# 📐 インデックスの設定
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH')  # 省略するとDBファイルと同じ場所に .msgidx
+MERGE_SEGMENTS = int(os.getenv('SEARCH_INDEX_MERGE_SEGMENTS', '8'))
+APPEND_INTERVAL = 1.0   # 追記待ちがこの秒数たまったらセグメントにする
+BUILD_BATCH = 5000      # SQLiteから1回に読む行数
+SCAN_RATIO = 8          # 候補が文書数の 1/SCAN_RATIO を超えたら、件数は本文全体を走査して数える
+
+# ファイルの形式
+FILE_MAGIC = b'MSGIDX02'
+SEGMENT_MAGIC = b'SEGM'
+# ファイルヘッダー: 形式, 確定した長さ, 置き換え済みフラグ
+FILE_HEADER = struct.Struct('<8sQQ8x')
+# セグメントヘッダー: 形式, セグメントの長さ, メタ情報（JSON）の長さ
+SEGMENT_HEADER = struct.Struct('<4s4xQQ')
+
+# 日時が無い行の並べ替えキー（新しい順で最後）
+NULL_KEY = -(1 << 63)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class OutdatedIndexError(ValueError):
+    """インデックスファイルが古い形式（作り直しが必要）"""
+
+
+def default_index_path(db_path):
+    return SEARCH_INDEX_PATH or os.path.splitext(db_path)[0] + '.msgidx'
+
+
+def sort_key(value):
+    """日時を並べ替えキー（UNIX時間のマイクロ秒。タイムゾーンが無ければUTC）にする"""
+    if value is None or value == '':
+        return NULL_KEY
+    try:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return NULL_KEY
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    delta = moment - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def normalize_text(text):
+    """検索用の本文（大文字・小文字をそろえ、区切りの \\0 を含まないように）"""
+    return (text or '').casefold().replace('\x00', ' ')
+
+
+def trigrams(text):
+    """文字列に含まれる3文字の組を整数にしたもの（1文字21ビット）"""
+    return {
+        (ord(text[i]) << 42) | (ord(text[i + 1]) << 21) | ord(text[i + 2])
+        for i in range(len(text) - 2)
+    }
+
+
+def message_hash(platform, message_id):
+    """(platform, message_id) を64bitの整数にする（メッセージ表のキー）"""
+    digest = hashlib.blake2b(f'{platform or ""}\0{message_id}'.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+def encode_postings(numbers):
+    """昇順の文書番号を差分 + varint で詰める"""
+    out = bytearray()
+    previous = 0
+    for number in numbers:
+        delta = number - previous
+        previous = number
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return out
+
+
+def decode_postings(buffer):
+    """encode_postings の逆（文書番号を順に返す。途中で読むのをやめられる）"""
+    current = value = shift = 0
+    for byte in buffer:
+        if byte & 0x80:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        else:
+            current += value | (byte << shift)
+            yield current
+            value = shift = 0
+
+
+def decode_all_postings(buffer):
+    """最後まで読むとき用の decode_postings（差分がすべて1バイトなら足し合わせるだけ。C実装）"""
+    data = bytes(buffer)
+    if not data or max(data) < 0x80:
+        return accumulate(data)
+    return decode_postings(data)
+
+
+def _padded(data):
+    return bytes(data) + b'\x00' * (-len(data) % 8)
+
+
+def encode_segment(docs, timestamp_column):
+    """
+    文書の一覧から1つのセグメント（bytes）を作る
+
+    docs の要素: {'row_id', 'key', 'platform', 'message_hash', 'deleted', 'text', 'stored'（JSONのbytes）}
+    """
+    docs = sorted(docs, key=lambda doc: (doc['key'], doc['row_id']), reverse=True)
+    platforms = sorted({doc['platform'] or '' for doc in docs})
+    platform_codes = {name: code for code, name in enumerate(platforms)}
+    by_row = sorted(range(len(docs)), key=lambda number: docs[number]['row_id'])
+    # 削除フラグの文書はメッセージ表に入れない（探すのは検索に出る版だけ）
+    by_message = sorted(
+        (doc['message_hash'], number) for number, doc in enumerate(docs) if not doc['deleted']
+    )
+
+    texts = [doc['text'].encode('utf-8') for doc in docs]
+    text_offsets = array.array('Q', [0])
+    for text in texts:
+        text_offsets.append(text_offsets[-1] + len(text) + 1)
+    stored_offsets = array.array('Q', [0])
+    for doc in docs:
+        stored_offsets.append(stored_offsets[-1] + len(doc['stored']))
+
+    # 転置インデックス（削除フラグの文書は古い版を隠すためだけにあるので含めない）
+    postings = defaultdict(list)
+    for number, doc in enumerate(docs):
+        if not doc['deleted']:
+            for term in trigrams(doc['text']):
+                postings[term].append(number)
+    terms = sorted(postings)
+    postings_offsets = array.array('Q', [0])
+    postings_data = bytearray()
+    for term in terms:
+        postings_data += encode_postings(postings[term])
+        postings_offsets.append(len(postings_data))
+
+    sections = [
+        ('row_ids', array.array('q', [doc['row_id'] for doc in docs]).tobytes()),
+        # id順の並び（新しいセグメントにある行を古いセグメントから二分探索で探す）
+        ('sorted_row_ids', array.array('q', [docs[number]['row_id'] for number in by_row]).tobytes()),
+        ('sorted_numbers', array.array('I', by_row).tobytes()),
+        ('message_hashes', array.array('q', [pair[0] for pair in by_message]).tobytes()),
+        ('message_numbers', array.array('I', [pair[1] for pair in by_message]).tobytes()),
+        ('doc_message_hashes', array.array('q', [doc['message_hash'] for doc in docs]).tobytes()),
+        ('keys', array.array('q', [doc['key'] for doc in docs]).tobytes()),
+        ('platform_codes', bytes(platform_codes[doc['platform'] or ''] for doc in docs)),
+        ('flags', bytes(1 if doc['deleted'] else 0 for doc in docs)),
+        ('text_offsets', text_offsets.tobytes()),
+        ('text', b''.join(text + b'\x00' for text in texts)),
+        ('stored_offsets', stored_offsets.tobytes()),
+        ('stored', b''.join(doc['stored'] for doc in docs)),
+        ('terms', array.array('q', terms).tobytes()),
+        ('doc_freqs', array.array('I', [len(postings[term]) for term in terms]).tobytes()),
+        ('postings_offsets', postings_offsets.tobytes()),
+        ('postings', bytes(postings_data)),
+    ]
+    layout = {}
+    body = bytearray()
+    for name, data in sections:
+        layout[name] = [len(body), len(data)]
+        body += _padded(data)
+
+    meta = _padded(json.dumps({
+        'docs': len(docs),
+        'terms': len(terms),
+        'platforms': platforms,
+        'timestamp_column': timestamp_column,
+        'max_row_id': max((doc['row_id'] for doc in docs), default=0),
+        'sections': layout,
+    }).encode('utf-8'))
+    header = SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_HEADER.size + len(meta) + len(body), len(meta))
+    return header + meta + bytes(body)
+
+
+def row_document(row, columns, stored_columns):
+    """SQLiteの行をセグメントの文書にする"""
+    deleted = columns['is_deleted']
+    return {
+        'row_id': row['id'],
+        'key': sort_key(row[columns['timestamp']]) if columns['timestamp'] else NULL_KEY,
+        'platform': row['platform'],
+        'message_hash': message_hash(row['platform'], row[columns['message_id']]),
+        'deleted': bool(deleted and row[deleted]),
+        'text': normalize_text(row['content']),
+        'stored': json.dumps(
+            {column: row[column] for column in stored_columns}, ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8'),
+    }
+
+
+class _Segment:
+    """mmap上のセグメント（配列は mmap を直接見る memoryview）"""
+
+    def __init__(self, mm, view, start):
+        magic, length, meta_length = SEGMENT_HEADER.unpack_from(mm, start)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f'インデックスファイルが壊れています（位置 {start}）')
+        meta_start = start + SEGMENT_HEADER.size
+        self.meta = json.loads(bytes(view[meta_start:meta_start + meta_length]).rstrip(b'\x00'))
+        self.length = length
+        self.mm = mm
+        self.count = self.meta['docs']
+        self.platforms = self.meta['platforms']
+        self.max_row_id = self.meta['max_row_id']
+
+        data_start = meta_start + meta_length
+        self.starts = {}
+        for name, (offset, size) in self.meta['sections'].items():
+            self.starts[name] = data_start + offset
+            setattr(self, name, view[data_start + offset:data_start + offset + size])
+        for name, typecode in (('row_ids', 'q'), ('sorted_row_ids', 'q'), ('sorted_numbers', 'I'),
+                               ('message_hashes', 'q'), ('message_numbers', 'I'), ('doc_message_hashes', 'q'),
+                               ('keys', 'q'), ('text_offsets', 'Q'),
+                               ('stored_offsets', 'Q'), ('terms', 'q'), ('doc_freqs', 'I'),
+                               ('postings_offsets', 'Q')):
+            setattr(self, name, getattr(self, name).cast(typecode))
+        # 削除フラグの文書が無ければ、検索のたびに確かめなくてよい
+        self.has_deleted = 1 in self.flags
+
+    def seek(self, key, row_id):
+        """(key, row_id) より後ろ（新しい順で続き）の最初の文書番号"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if (self.keys[middle], self.row_ids[middle]) < (key, row_id):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def find_row(self, row_id):
+        """messages.id の文書番号（無ければNone）"""
+        index = bisect_left(self.sorted_row_ids, row_id)
+        if index == len(self.sorted_row_ids) or self.sorted_row_ids[index] != row_id:
+            return None
+        return self.sorted_numbers[index]
+
+    def find_message(self, hash_value):
+        """メッセージ表でハッシュが一致した文書番号"""
+        index = bisect_left(self.message_hashes, hash_value)
+        while index < len(self.message_hashes) and self.message_hashes[index] == hash_value:
+            yield self.message_numbers[index]
+            index += 1
+
+    def term_index(self, term):
+        """用語辞書での位置（無ければNone）"""
+        index = bisect_left(self.terms, term)
+        if index == len(self.terms) or self.terms[index] != term:
+            return None
+        return index
+
+    def candidates(self, query, start, read_all=False):
+        """クエリを含む可能性のある文書番号（新しい順。read_all は最後まで読むとき）"""
+        if len(query) >= TRIGRAM_MIN_LENGTH:
+            # 一番出現の少ない用語のポスティングだけを読む
+            best = None
+            for term in trigrams(query):
+                index = self.term_index(term)
+                if index is None:
+                    return
+                if best is None or self.doc_freqs[index] < self.doc_freqs[best]:
+                    best = index
+            postings = self.postings[self.postings_offsets[best]:self.postings_offsets[best + 1]]
+            for number in (decode_all_postings if read_all else decode_postings)(postings):
+                if number >= start:
+                    yield number
+            return
+
+        # 2文字以下は本文をそのまま探す（mmap.find はC実装なので速い）
+        encoded = query.encode('utf-8')
+        text_start = self.starts['text']
+        text_end = text_start + self.text_offsets[self.count]
+        position = text_start + self.text_offsets[start]
+        while True:
+            position = self.mm.find(encoded, position, text_end)
+            if position < 0:
+                return
+            number = bisect_right(self.text_offsets, position - text_start) - 1
+            yield number
+            position = text_start + self.text_offsets[number + 1]
+
+    def contains(self, number, encoded):
+        text_start = self.starts['text']
+        return self.mm.find(
+            encoded, text_start + self.text_offsets[number], text_start + self.text_offsets[number + 1]
+        ) >= 0
+
+    def document_text(self, number):
+        start = self.starts['text']
+        return bytes(self.mm[start + self.text_offsets[number]:start + self.text_offsets[number + 1] - 1])
+
+    def load_row(self, number):
+        start = self.starts['stored']
+        return bytes(self.mm[start + self.stored_offsets[number]:start + self.stored_offsets[number + 1]])
+
+
+class _Snapshot:
+    """ある時点のインデックスファイル（検索中に更新されても、この内容のまま読める）"""
+
+    def __init__(self, path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            self.mm = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        magic, self.committed, _ = FILE_HEADER.unpack_from(self.mm, 0)
+        if magic != FILE_MAGIC:
+            if magic.startswith(FILE_MAGIC[:6]):
+                raise OutdatedIndexError(f'インデックスファイルが古い形式です: {path}')
+            raise ValueError(f'インデックスファイルの形式が違います: {path}')
+        if self.committed > size:
+            # 開いている間に追記が確定した（もう一度開き直す）
+            raise BlockingIOError
+
+        view = memoryview(self.mm)
+        self.segments = []
+        position = FILE_HEADER.size
+        while position < self.committed:
+            segment = _Segment(self.mm, view, position)
+            self.segments.append(segment)
+            position += segment.length
+
+        # 同じ行が複数のセグメントにあれば、一番新しいセグメントの版だけを使う
+        # （新しいセグメントの行を古いセグメントから探すので、手間は追記した行数に比例する）
+        self.hidden = [set() for _ in self.segments]
+        newer = set()
+        for index in range(len(self.segments) - 1, -1, -1):
+            segment = self.segments[index]
+            for row_id in newer:
+                number = segment.find_row(row_id)
+                if number is not None:
+                    self.hidden[index].add(number)
+            if index:
+                newer.update(segment.row_ids)
+
+        self.docs = sum(segment.count for segment in self.segments)
+        self.max_row_id = max((segment.max_row_id for segment in self.segments), default=0)
+        self.timestamp_column = next(
+            (segment.meta['timestamp_column'] for segment in self.segments), None
+        )
+
+    def changed(self):
+        """ファイルが追記・置き換えされたか（mmapのヘッダーを見るだけでシステムコールは無い）"""
+        _, committed, replaced = FILE_HEADER.unpack_from(self.mm, 0)
+        return replaced or committed != self.committed
+
+    def live(self, index, number):
+        return not self.segments[index].flags[number] and number not in self.hidden[index]
+
+    def numbers(self, index, query, platform, seek, read_all=False):
+        """1つのセグメントで一致した文書番号（新しい順）"""
+        segment = self.segments[index]
+        code = None
+        if platform:
+            if platform not in segment.platforms:
+                return
+            code = segment.platforms.index(platform)
+
+        encoded = query.encode('utf-8')
+        # 3文字ちょうどならポスティングが完全一致（本文で確かめなくてよい）
+        verify = len(query) > TRIGRAM_MIN_LENGTH
+        check_live = segment.has_deleted or bool(self.hidden[index])
+        start = segment.seek(*seek) if seek else 0
+        for number in segment.candidates(query, start, read_all):
+            if code is not None and segment.platform_codes[number] != code:
+                continue
+            if check_live and not self.live(index, number):
+                continue
+            if verify and not segment.contains(number, encoded):
+                continue
+            yield number
+
+    def matches(self, index, query, platform, seek):
+        """1つのセグメントで一致した文書（新しい順に並べるための (キー, id, セグメント, 文書番号)）"""
+        segment = self.segments[index]
+        for number in self.numbers(index, query, platform, seek):
+            yield (-segment.keys[number], -segment.row_ids[number], index, number)
+
+    def count(self, index, query, platform, cap=None):
+        """1つのセグメントで一致した件数（cap 件に達したらそこまで）"""
+        segment = self.segments[index]
+        if not platform and not segment.has_deleted and not self.hidden[index]:
+            # 隠れた文書も絞り込みも無ければ、文書番号を取り出さずに数えられる
+            if len(query) >= TRIGRAM_MIN_LENGTH:
+                terms = [segment.term_index(term) for term in trigrams(query)]
+                if None in terms:
+                    return 0
+                rarest = min(segment.doc_freqs[term] for term in terms)
+                if len(query) == TRIGRAM_MIN_LENGTH:
+                    # 3文字なら用語の出現文書数がそのまま件数
+                    return min(rarest, cap) if cap else rarest
+                scan = rarest * SCAN_RATIO > segment.count
+            else:
+                scan = True
+            if scan:
+                # よく出る語・2文字以下は「一致してから文書の終わりまで」を1件として
+                # 本文全体を正規表現で数える（C実装なので、候補を1件ずつ確かめるより速い）
+                pattern = re.compile(re.escape(query.encode('utf-8')) + rb'[^\x00]*\x00()')
+                text_start = segment.starts['text']
+                total = len(pattern.findall(self.mm, text_start, text_start + segment.text_offsets[segment.count]))
+                return min(total, cap) if cap else total
+
+        total = 0
+        for _ in self.numbers(index, query, platform, None, read_all=True):
+            total += 1
+            if cap and total >= cap:
+                break
+        return total
+
+    def indexed_messages(self, platform, message_id):
+        """(platform, message_id) の検索に出ている版（セグメントの番号, 文書番号）"""
+        hash_value = message_hash(platform, message_id)
+        for index, segment in enumerate(self.segments):
+            for number in segment.find_message(hash_value):
+                if self.live(index, number):
+                    yield index, number
+
+    def live_documents(self):
+        """まとめ直し用に、隠れていない文書をすべて返す"""
+        for index, segment in enumerate(self.segments):
+            for number in range(segment.count):
+                if self.live(index, number):
+                    yield {
+                        'row_id': segment.row_ids[number],
+                        'key': segment.keys[number],
+                        'platform': segment.platforms[segment.platform_codes[number]],
+                        'message_hash': segment.doc_message_hashes[number],
+                        'deleted': False,
+                        'text': segment.document_text(number).decode('utf-8'),
+                        'stored': segment.load_row(number),
+                    }
+
+
+@contextmanager
+def _file_lock(path):
+    """インデックスファイルの書き込みロック（別プロセスの同期とも直列化する）"""
+    with open(path + '.lock', 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_index_file(path, segments):
+    """セグメントから新しいインデックスファイルを作り、今のファイルと置き換える"""
+    body = b''.join(segments)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(FILE_HEADER.pack(FILE_MAGIC, FILE_HEADER.size + len(body), 0))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+
+    old = open(path, 'r+b') if os.path.exists(path) else None
+    try:
+        os.replace(temp_path, path)
+        if old:
+            # 古いファイルを開いている側に、開き直すよう知らせる
+            old.seek(0)
+            magic, committed, _ = FILE_HEADER.unpack(old.read(FILE_HEADER.size))
+            old.seek(0)
+            old.write(FILE_HEADER.pack(magic, committed, 1))
+            old.flush()
+    finally:
+        if old:
+            old.close()
+
+
+def append_segment(path, segment):
+    """インデックスファイルの末尾にセグメントを追記する（書き終えてから確定した長さを進める）"""
+    with open(path, 'r+b') as f:
+        magic, committed, replaced = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != FILE_MAGIC or replaced:
+            raise ValueError(f'インデックスファイルに追記できません: {path}')
+        f.seek(committed)
+        f.write(segment)
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(FILE_HEADER.pack(magic, committed + len(segment), 0))
+        f.flush()
+
+
+class MmapIndexBackend(SearchBackend):
+    """mmapで開いた転置インデックスで検索するバックエンド"""
+
+    name = 'mmap'
+
+    def __init__(self, pool, path=None, merge_segments=MERGE_SEGMENTS, append_interval=APPEND_INTERVAL):
+        self.pool = pool
+        self.path = path or default_index_path(pool.db_path)
+        self.merge_segments = merge_segments
+        self.append_interval = append_interval
+        self.fallback = SQLiteSearchBackend(pool)
+
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._pending = OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+        self.searches = 0
+        self.fallbacks = 0
+        self.appends = 0
+        self.merges = 0
+        self.builds = 0
+        self.reloads = 0
+        self.errors = 0
+
+        # ファイルが無ければ作り、SQLiteにだけある行を取り込んでから、追記待ちを処理し続ける
+        self._thread = threading.Thread(target=self._run, name='mmap-index', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- 読み取り ---
+
+    def snapshot(self):
+        """今のインデックス（無ければNone）。追記・置き換えがあれば開き直す"""
+        snapshot = self._snapshot
+        if snapshot is not None and not snapshot.changed():
+            return snapshot
+
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and not snapshot.changed():
+                return snapshot
+            for _ in range(10):
+                try:
+                    snapshot = _Snapshot(self.path)
+                    break
+                except (FileNotFoundError, OutdatedIndexError):
+                    # 無い・古い形式なら catch_up() で作り直すまでSQLiteで検索する
+                    return None
+                except BlockingIOError:
+                    continue
+            self._snapshot = snapshot
+            self.reloads += 1
+            return snapshot
+
+    @staticmethod
+    def _indexed(sort, search_fields):
+        """インデックスで検索できるか（新しい順で、本文だけを検索するとき）"""
+        return sort != 'relevance' and tuple(search_fields or ('content',)) == ('content',)
+
+    def search(self, query, platform=None, limit=50, offset=0, cursor=None,
+               count_mode='exact', sort='recent', recency=RECENCY_WEIGHT, search_fields=None):
+        snapshot = self.snapshot() if self._indexed(sort, search_fields) else None
+        if snapshot is None:
+            # 関連度順・本文以外の列も検索するとき、またはインデックスがまだ無いとき
+            self.fallbacks += 1
+            return self.fallback.search(query, platform, limit, offset, cursor, count_mode, sort, recency,
+                                        search_fields)
+
+        self.searches += 1
+        seek = None
+        if cursor:
+            timestamp, row_id = decode_cursor(cursor)
+            seek = (sort_key(timestamp), row_id)
+            offset = 0
+
+        text = normalize_text(query)
+        segments = range(len(snapshot.segments))
+        streams = [snapshot.matches(index, text, platform, seek) for index in segments]
+        merged = heapq.merge(*streams) if len(streams) > 1 else (streams[0] if streams else iter(()))
+        # 表示する分だけ新しい順に取り出す（そろったら読むのをやめる）
+        page = list(islice(merged, offset, offset + limit))
+
+        # 件数はセグメントごとに数えて足す（並べ替えが要らないので軽い。SQLiteと同じくカーソルに関係なく全件）
+        if count_mode == 'none':
+            total, total_exact = None, False
+        elif count_mode == 'estimate':
+            total = 0
+            for index in segments:
+                total += snapshot.count(index, text, platform, ESTIMATE_COUNT_CAP + 1 - total)
+                if total > ESTIMATE_COUNT_CAP:
+                    break
+            total, total_exact = (ESTIMATE_COUNT_CAP, False) if total > ESTIMATE_COUNT_CAP else (total, True)
+        else:
+            total = sum(snapshot.count(index, text, platform) for index in segments)
+            total_exact = True
+
+        results = [
+            json.loads(snapshot.segments[index].load_row(number))
+            for _, _, index, number in page
+        ]
+
+        return {
+            'results': results,
+            'total': total,
+            'total_exact': total_exact,
+            'next_cursor': next_cursor(results, limit, snapshot.timestamp_column) if snapshot.timestamp_column else None,
+            'sort': 'recent',
+        }
+
+    def iter_results(self, query, platform=None, limit=50, offset=0, cursor=None,
+                     sort='recent', recency=RECENCY_WEIGHT, search_fields=None):
+        """新しい順に1件ずつ読み出して返す（ページ全体をメモリに作らない）"""
+        snapshot = self.snapshot() if self._indexed(sort, search_fields) else None
+        if snapshot is None:
+            self.fallbacks += 1
+            yield from self.fallback.iter_results(query, platform, limit, offset, cursor, sort, recency, search_fields)
+            return
+
+        self.searches += 1
+        seek = None
+        if cursor:
+            timestamp, row_id = decode_cursor(cursor)
+            seek = (sort_key(timestamp), row_id)
+            offset = 0
+
+        text = normalize_text(query)
+        streams = [snapshot.matches(index, text, platform, seek) for index in range(len(snapshot.segments))]
+        merged = heapq.merge(*streams) if len(streams) > 1 else (streams[0] if streams else iter(()))
+        for _, _, index, number in islice(merged, offset, offset + limit):
+            yield json.loads(snapshot.segments[index].load_row(number))
+
+    # --- 書き込み ---
+
+    def _selected_columns(self, conn):
+        columns = message_columns(conn)
+        selected = result_columns(conn)
+        if columns['is_deleted']:
+            selected.append(columns['is_deleted'])
+        return columns, selected
+
+    def _documents_since(self, conn, last_id):
+        """messages.id が last_id より大きい行を文書にする"""
+        columns, selected = self._selected_columns(conn)
+        stored_columns = result_columns(conn)
+        documents = []
+        while True:
+            rows = conn.execute(
+                f'SELECT {", ".join(selected)} FROM messages WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, BUILD_BATCH)
+            ).fetchall()
+            documents.extend(row_document(row, columns, stored_columns) for row in rows)
+            if len(rows) < BUILD_BATCH:
+                return documents, columns['timestamp']
+            last_id = rows[-1]['id']
+
+    def _changed(self):
+        # 追記・置き換えで検索結果が変わったので、検索結果キャッシュを無効にする
+        with self.pool.writer() as conn:
+            bump_data_generation(conn)
+
+    def reindex(self, clear=False):
+        """SQLiteの全メッセージからインデックスファイルを作り直す（入れた件数を返す）"""
+        with self._write_lock, _file_lock(self.path):
+            conn = self.pool.connection()
+            try:
+                documents, timestamp_column = self._documents_since(conn, 0)
+            finally:
+                conn.close()
+            documents = [doc for doc in documents if not doc['deleted']]
+            write_index_file(self.path, [encode_segment(documents, timestamp_column)])
+            self.builds += 1
+        self._changed()
+        return len(documents)
+
+    def _append(self, documents, timestamp_column):
+        if not documents:
+            return False
+        with self._write_lock, _file_lock(self.path):
+            append_segment(self.path, encode_segment(documents, timestamp_column))
+            self.appends += 1
+        self._changed()
+        return True
+
+    def catch_up(self):
+        """インデックスに無い行（SQLiteに直接書き込まれた分）を追記する。ファイルが無ければ作る"""
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return self.reindex()
+        conn = self.pool.connection()
+        try:
+            documents, timestamp_column = self._documents_since(conn, snapshot.max_row_id)
+        finally:
+            conn.close()
+        self._append(documents, timestamp_column)
+        return len(documents)
+
+    def merge(self):
+        """セグメントを1つにまとめ直す（隠れた古い版・削除された行を捨てる）"""
+        with self._write_lock, _file_lock(self.path):
+            snapshot = self.snapshot()
+            if snapshot is None or len(snapshot.segments) <= 1:
+                return False
+            documents = list(snapshot.live_documents())
+            write_index_file(self.path, [encode_segment(documents, snapshot.timestamp_column)])
+            self.merges += 1
+        self._changed()
+        return True
+
+    def _tombstones(self, snapshot, keys, rows, message_id_column):
+        """
+        SQLiteの今の行と違う版がインデックスに残っているメッセージを隠す、削除フラグだけの文書
+
+        SQLiteから消えたメッセージ（削除・重複の整理）は、messages.id の新しい行が来ないので
+        そのままでは古い版が検索に出続けます。(platform, message_id) からインデックスの版を探し、
+        SQLiteの行（無ければ無し）と messages.id が違うものを同じ id の削除フラグで隠します。
+        """
+        current = {(row['platform'], str(row[message_id_column])): row['id'] for row in rows}
+        documents = []
+        for platform, message_id in keys:
+            for index, number in snapshot.indexed_messages(platform, message_id):
+                segment = snapshot.segments[index]
+                row_id = segment.row_ids[number]
+                if row_id == current.get((platform, message_id)):
+                    continue
+                # ハッシュが偶然一致した別のメッセージでないことを保存列で確かめる
+                stored = json.loads(segment.load_row(number))
+                if stored.get('platform') != platform or str(stored.get(message_id_column)) != message_id:
+                    continue
+                documents.append({
+                    'row_id': row_id,
+                    'key': segment.keys[number],
+                    'platform': platform,
+                    'message_hash': segment.doc_message_hashes[number],
+                    'deleted': True,
+                    'text': '',
+                    'stored': b'',
+                })
+        return documents
+
+    def index_messages(self, platform, message_ids):
+        """
+        変更のあったメッセージを追記待ちに積む（すぐに戻る）
+
+        SQLiteから消えたメッセージの id を渡すと、インデックスからも消えます。
+        """
+        with self._pending_lock:
+            for message_id in message_ids:
+                self._pending[(platform, str(message_id))] = True
+
+    def flush(self, timeout=None):
+        """追記待ちを今すぐセグメントにする"""
+        with self._pending_lock:
+            keys, self._pending = list(self._pending), OrderedDict()
+        if not keys:
+            return True
+
+        try:
+            conn = self.pool.connection()
+            try:
+                columns, selected = self._selected_columns(conn)
+                stored_columns = result_columns(conn)
+                rows = load_message_rows(conn, keys, selected)
+            finally:
+                conn.close()
+            documents = [row_document(row, columns, stored_columns) for row in rows]
+            snapshot = self.snapshot()
+            if snapshot is not None:
+                documents.extend(self._tombstones(snapshot, keys, rows, columns['message_id']))
+            self._append(documents, columns['timestamp'])
+        except Exception:
+            # 次回やり直す
+            with self._pending_lock:
+                for key in keys:
+                    self._pending.setdefault(key, True)
+            raise
+
+        snapshot = self.snapshot()
+        if snapshot is not None and len(snapshot.segments) > self.merge_segments:
+            self.merge()
+        return True
+
+    def _run(self):
+        ready = False
+        while not self._stopped.is_set():
+            try:
+                if not ready:
+                    self.catch_up()
+                    ready = True
+                self.flush()
+            except Exception as e:
+                self.errors += 1
+                if ready:
+                    print(f"⚠️ 検索インデックスへの追記エラー（次回やり直します）: {e}")
+                elif self.errors == 1:
+                    print(f"⚠️ 検索インデックスを準備できませんでした（準備できるまでSQLiteで検索します）: {e}")
+            self._wakeup.wait(self.append_interval)
+            self._wakeup.clear()
+
+    def close(self):
+        """追記スレッドを止めて、追記待ちを書き込む"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ 検索インデックスに追記できなかったメッセージがあります（reindexで作り直してください）: {e}")
+
+    def stats(self):
+        snapshot = self.snapshot()
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            'name': self.name,
+            'path': self.path,
+            'ready': snapshot is not None,
+            'bytes': snapshot.committed if snapshot else 0,
+            'segments': len(snapshot.segments) if snapshot else 0,
+            'documents': snapshot.docs if snapshot else 0,
+            'pending_documents': pending,
+            'searches': self.searches,
+            'fallbacks': self.fallbacks,
+            'appends': self.appends,
+            'merges': self.merges,
+            'builds': self.builds,
+            'reloads': self.reloads,
+            'errors': self.errors,
+        }
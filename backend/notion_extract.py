@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+📝 Notionページ本文の抽出（ページ送り・子ブロック・並列取得対応）
+
+blocks.children.list は1回で最大100ブロックしか返さず、トグル・入れ子のリスト・
+カラムなどの中身は子ブロックとして別に取得する必要があります。
+ここではページ送り（has_more / next_cursor）をたどり、子ブロックにも潜って
+ページ全体のテキストを取り出します。
+
+- APIの呼び出しはスレッドプールで並列に行う（同時実行数は max_workers まで）
+- 次のページ・子ブロックの1ページ目を先読みしておき、文書の順番どおりに返す
+- テキストはジェネレーターで少しずつ返すので、巨大なページも全体をメモリに持たない
+
+差分同期では、検索結果を last_edited_time の新しい順に並べて、前回の同期時点
+（ウォーターマーク）より古いページが出てきたところでページ送りをやめます。
+変更の無いワークスペースなら search の1回だけで終わります。
+
+使い方:
+    extractor = NotionBlockExtractor(Client(auth=token))
+    for line in extractor.iter_page_text(page_id):
+        ...
+    for page_id, text in extractor.extract_pages(page_ids):
+        ...
+
+    pages = changed_pages(notion, load_sync_states(conn, 'notion'))
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sync_state import load_sync_state, save_sync_state
+
+# 📐 取得設定
+PAGE_SIZE = 100       # blocks.children.list の1回あたりの最大件数
+MAX_WORKERS = 8       # 同時に実行するAPI呼び出しの数
+PAGE_WORKERS = 4      # 同時に抽出するページ数
+MAX_DEPTH = 8         # 子ブロックをたどる深さの上限
+MAX_RETRIES = 3       # レート制限（429）時の再試行回数
+
+# sync_state でワークスペース全体の進捗を表すスコープ
+WORKSPACE_SCOPE = '*'
+
+# 子ブロックとして中身を取りに行かないブロック（別ページとして同期される）
+SKIP_CHILDREN = ('child_page', 'child_database')
+
+# ブロックの種類ごとの書式（テキストの前に付ける記号）
+BLOCK_PREFIXES = {
+    'heading_1': '# ',
+    'heading_2': '## ',
+    'heading_3': '### ',
+    'bulleted_list_item': '• ',
+    'numbered_list_item': '1. ',
+    'quote': '> ',
+}
+
+
+def rich_text_to_plain(rich_text):
+    """rich_text 配列をプレーンテキストにする"""
+    return ''.join(t.get('plain_text', '') for t in rich_text or [])
+
+
+def block_text(block):
+    """1ブロック分のテキスト（テキストを持たないブロックは空文字）"""
+    block_type = block.get('type')
+    data = block.get(block_type) or {}
+
+    if block_type == 'table_row':
+        return ' | '.join(rich_text_to_plain(cell).strip() for cell in data.get('cells', []))
+
+    text = rich_text_to_plain(data.get('rich_text')).strip()
+    if not text:
+        return ''
+
+    if block_type == 'to_do':
+        checkbox = "☑️" if data.get('checked') else "☐"
+        return f"{checkbox} {text}"
+    if block_type == 'code':
+        return f"```{data.get('language', 'plain')}\n{text}\n```"
+    if block_type == 'callout':
+        icon = (data.get('icon') or {}).get('emoji', '')
+        return f"{icon} {text}".strip()
+    return BLOCK_PREFIXES.get(block_type, '') + text
+
+
+class NotionBlockExtractor:
+    """Notionページの本文を、ブロックツリー全体からストリーミングで取り出す"""
+
+    def __init__(self, notion, max_workers=MAX_WORKERS, page_size=PAGE_SIZE, max_depth=MAX_DEPTH):
+        self.notion = notion
+        self.page_size = page_size
+        self.max_depth = max_depth
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='notion-blocks')
+
+        # 取得状況（同期ログやベンチマーク用）
+        self.api_calls = 0
+        self.rate_limited = 0
+        self.blocks = 0
+        self._stats_lock = threading.Lock()
+
+    def _list_children(self, block_id, start_cursor=None):
+        """blocks.children.list を1回呼ぶ（429は待ってから再試行）"""
+        params = {'block_id': block_id, 'page_size': self.page_size}
+        if start_cursor:
+            params['start_cursor'] = start_cursor
+
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = self.notion.blocks.children.list(**params)
+            except Exception as e:
+                # notion_client の APIResponseError は status にHTTPステータスを持つ
+                if getattr(e, 'status', None) != 429:
+                    raise
+                with self._stats_lock:
+                    self.rate_limited += 1
+                if attempt == MAX_RETRIES:
+                    raise
+                time.sleep(2 ** attempt)
+                continue
+
+            with self._stats_lock:
+                self.api_calls += 1
+                self.blocks += len(response.get('results', []))
+            return response
+
+    def _fetch(self, block_id, start_cursor=None):
+        return self.executor.submit(self._list_children, block_id, start_cursor)
+
+    def _has_children(self, block, depth):
+        return (
+            block.get('has_children')
+            and block.get('type') not in SKIP_CHILDREN
+            and depth < self.max_depth
+        )
+
+    def iter_blocks(self, block_id, depth=0, first=None):
+        """
+        ブロックを文書の順番どおりに (深さ, ブロック) で返す
+
+        1ページ分（最大100件）を受け取ったら、次のページと
+        その中の子ブロックの1ページ目をまとめて先読みします。
+        """
+        future = first or self._fetch(block_id)
+        while future is not None:
+            response = future.result()
+            next_future = (
+                self._fetch(block_id, response.get('next_cursor'))
+                if response.get('has_more') else None
+            )
+
+            blocks = response.get('results', [])
+            children = {
+                block['id']: self._fetch(block['id'])
+                for block in blocks if self._has_children(block, depth)
+            }
+
+            for block in blocks:
+                yield depth, block
+                if block['id'] in children:
+                    yield from self.iter_blocks(block['id'], depth + 1, children[block['id']])
+
+            future = next_future
+
+    def iter_page_text(self, page_id):
+        """ページ本文を1ブロックずつテキストで返す（入れ子は字下げ）"""
+        for depth, block in self.iter_blocks(page_id):
+            text = block_text(block)
+            if text:
+                yield '  ' * depth + text
+
+    def extract_page_text(self, page_id, max_chars=None):
+        """ページ本文をまとめて返す（max_chars を超えたらそこで取得をやめる）"""
+        parts = []
+        length = 0
+        for text in self.iter_page_text(page_id):
+            parts.append(text)
+            length += len(text) + 2
+            if max_chars and length >= max_chars:
+                break
+        content = '\n\n'.join(parts)
+        return content[:max_chars] if max_chars else content
+
+    def extract_pages(self, page_ids, max_pages=PAGE_WORKERS, max_chars=None):
+        """
+        複数ページの本文を並列に抽出し、取得できた順に (page_id, text) を返す
+
+        取得に失敗したページは text が None になります。
+        """
+        with ThreadPoolExecutor(max_workers=max_pages, thread_name_prefix='notion-pages') as pages:
+            futures = {
+                pages.submit(self.extract_page_text, page_id, max_chars): page_id
+                for page_id in page_ids
+            }
+            for future in as_completed(futures):
+                page_id = futures[future]
+                try:
+                    yield page_id, future.result()
+                except Exception as e:
+                    print(f"⚠️ ページ内容取得エラー (ID: {page_id}): {e}")
+                    yield page_id, None
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_changed_pages(notion, watermark=None, page_size=PAGE_SIZE):
+    """
+    last_edited_time が watermark 以降のページを新しい順に返す
+
+    Notionの last_edited_time は分単位なので、watermark と同じ時刻のページも返します
+    （同期済みかどうかは呼び出し側でページごとの進捗と比べる）。
+    """
+    params = {
+        'filter': {'property': 'object', 'value': 'page'},
+        'sort': {'direction': 'descending', 'timestamp': 'last_edited_time'},
+        'page_size': page_size,
+    }
+    while True:
+        response = notion.search(**params)
+        for page in response.get('results', []):
+            if watermark and page['last_edited_time'] < watermark:
+                return
+            yield page
+
+        if not response.get('has_more'):
+            return
+        params['start_cursor'] = response['next_cursor']
+
+
+def changed_pages(notion, states, limit=None):
+    """
+    前回の同期以降に編集されたページを古い順に返す
+
+    states: load_sync_states(conn, 'notion') の戻り値
+    limit: 一度に同期するページ数。古い方から取るので、残りは次回の同期で続きから取り込めます
+    """
+    watermark = (states.get(WORKSPACE_SCOPE) or {}).get('cursor_time')
+    pages = [
+        page for page in iter_changed_pages(notion, watermark)
+        if (states.get(page['id']) or {}).get('cursor_time') != page['last_edited_time']
+    ]
+    pages.reverse()
+    return pages[:limit] if limit else pages
+
+
+def save_page_progress(conn, synced, failed=(), failed_before=None):
+    """
+    同期したページの last_edited_time と、ワークスペースのウォーターマークを保存する
+
+    失敗したページがあれば、ウォーターマークをその時刻より先に進めない（次回やり直す）。
+    1回の同期を何回かに分けて保存するときは、前回までの戻り値を failed_before に渡してください
+    （前の回で失敗したページより先に、後の回でウォーターマークを進めないように）。
+    成功したページだけなら保存済みのウォーターマークより戻すことはない（全ページの取り直しで古いページから
+    同期しても、次の差分同期がワークスペース全体を読み直さないように）。
+    失敗したページがあるときは、その時刻まで戻します。
+    commitは呼び出し側で。
+
+    戻り値: ここまでに失敗したページの一番古い last_edited_time（失敗が無ければ None）
+    """
+    for page in synced:
+        save_sync_state(conn, 'notion', page['id'], page['id'], page['last_edited_time'])
+
+    if failed:
+        earliest = min(page['last_edited_time'] for page in failed)
+        failed_before = min(failed_before, earliest) if failed_before else earliest
+    if not synced and not failed_before:
+        return failed_before
+
+    stored = (load_sync_state(conn, 'notion', WORKSPACE_SCOPE) or {}).get('cursor_time')
+    watermark = max([page['last_edited_time'] for page in synced] + ([stored] if stored else []))
+    if failed_before:
+        watermark = min(watermark, failed_before) if watermark else failed_before
+    if watermark != stored:
+        save_sync_state(conn, 'notion', WORKSPACE_SCOPE, None, watermark)
+    return failed_before
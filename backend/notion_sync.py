@@ -5,6 +5,12 @@ from notion_client import Client
 from dotenv import load_dotenv
 import json
 
+from bulk_ingest import ensure_upsert_index, upsert_messages
+from db_pool import get_pool
+from notion_extract import NotionBlockExtractor, block_text, changed_pages, save_page_progress
+from search_backend import get_search_backend
+from sync_state import ensure_sync_state, load_sync_states
+
 # .envファイルから設定を読み込み
 load_dotenv()
 
@@ -13,72 +19,11 @@ class NotionSync:
         self.notion_token = os.getenv('NOTION_API_TOKEN')
         self.db_path = '../data/search.db'
         self.notion = Client(auth=self.notion_token)
+        self.extractor = NotionBlockExtractor(self.notion)
     
     def extract_text_from_blocks(self, blocks):
         """Notionブロックからテキストを抽出"""
-        text_content = []
-        
-        for block in blocks:
-            block_type = block.get('type')
-            
-            if block_type == 'paragraph':
-                rich_text = block['paragraph'].get('rich_text', [])
-                text = ''.join([t.get('plain_text', '') for t in rich_text])
-                if text.strip():
-                    text_content.append(text.strip())
-            
-            elif block_type == 'heading_1':
-                rich_text = block['heading_1'].get('rich_text', [])
-                text = ''.join([t.get('plain_text', '') for t in rich_text])
-                if text.strip():
-                    text_content.append(f"# {text.strip()}")
-            
-            elif block_type == 'heading_2':
-                rich_text = block['heading_2'].get('rich_text', [])
-                text = ''.join([t.get('plain_text', '') for t in rich_text])
-                if text.strip():
-                    text_content.append(f"## {text.strip()}")
-            
-            elif block_type == 'heading_3':
-                rich_text = block['heading_3'].get('rich_text', [])
-                text = ''.join([t.get('plain_text', '') for t in rich_text])
-                if text.strip():
-                    text_content.append(f"### {text.strip()}")
-            
-            elif block_type == 'bulleted_list_item':
-                rich_text = block['bulleted_list_item'].get('rich_text', [])
-                text = ''.join([t.get('plain_text', '') for t in rich_text])
-                if text.strip():
-                    text_content.append(f"• {text.strip()}")
-            
-            elif block_type == 'numbered_list_item':
-                rich_text = block['numbered_list_item'].get('rich_text', [])
-                text = ''.join([t.get('plain_text', '') for t in rich_text])
-                if text.strip():
-                    text_content.append(f"1. {text.strip()}")
-            
-            elif block_type == 'to_do':
-                rich_text = block['to_do'].get('rich_text', [])
-                text = ''.join([t.get('plain_text', '') for t in rich_text])
-                checked = block['to_do'].get('checked', False)
-                checkbox = "☑️" if checked else "☐"
-                if text.strip():
-                    text_content.append(f"{checkbox} {text.strip()}")
-            
-            elif block_type == 'code':
-                rich_text = block['code'].get('rich_text', [])
-                text = ''.join([t.get('plain_text', '') for t in rich_text])
-                language = block['code'].get('language', 'plain')
-                if text.strip():
-                    text_content.append(f"```{language}\n{text.strip()}\n```")
-            
-            elif block_type == 'quote':
-                rich_text = block['quote'].get('rich_text', [])
-                text = ''.join([t.get('plain_text', '') for t in rich_text])
-                if text.strip():
-                    text_content.append(f"> {text.strip()}")
-        
-        return '\n\n'.join(text_content)
+        return '\n\n'.join(text for text in map(block_text, blocks) if text)
     
     def get_page_title(self, page):
         """ページのタイトルを取得"""
@@ -100,84 +45,87 @@ class NotionSync:
     def get_page_content(self, page_id):
         """ページの内容を取得"""
         try:
-            # ページの子ブロックを取得
-            blocks_response = self.notion.blocks.children.list(block_id=page_id)
-            blocks = blocks_response.get('results', [])
-            
-            # テキスト内容を抽出
-            content = self.extract_text_from_blocks(blocks)
-            return content
+            # ページ送り・子ブロックもたどって本文全体を取得
+            return self.extractor.extract_page_text(page_id)
             
         except Exception as e:
             print(f"⚠️ ページ内容取得エラー (ID: {page_id}): {e}")
             return ""
     
-    def save_to_database(self, pages_data):
-        """取得したページデータをデータベースに保存"""
+    def load_progress(self):
+        """前回の同期時点（ウォーターマーク）とページごとの last_edited_time"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return load_sync_states(conn, 'notion')
+        finally:
+            conn.close()
+    
+    def save_to_database(self, pages_data, synced_pages=(), failed_pages=()):
+        """取得したページデータと同期の進捗をデータベースに保存"""
         try:
             conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            saved_count = 0
-            
-            for page_data in pages_data:
-                # 既存データのチェック
-                cursor.execute("""
-                    SELECT COUNT(*) FROM messages 
-                    WHERE platform = 'notion' AND message_id = ?
-                """, (page_data['id'],))
-                
-                if cursor.fetchone()[0] == 0:
-                    # 新規データを挿入
-                    cursor.execute("""
-                        INSERT INTO messages (platform, message_id, content, author, channel, timestamp, url)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        'notion',
-                        page_data['id'],
-                        page_data['content'],
-                        page_data['author'],
-                        page_data['title'],
-                        page_data['timestamp'],
-                        page_data['url']
-                    ))
-                    saved_count += 1
-                else:
-                    print(f"📋 既存データをスキップ: {page_data['title']}")
+            get_search_backend(get_pool(self.db_path)).index_keys(ensure_upsert_index(conn))
+            ensure_sync_state(conn)
+            
+            rows = [{
+                'message_id': page_data['id'],
+                'content': page_data['content'],
+                'author': page_data['author'],
+                'channel': page_data['title'],
+                'title': page_data['title'],
+                'timestamp': page_data['timestamp'],
+                'url': page_data['url']
+            } for page_data in pages_data]
+            
+            # 新規・更新をまとめて1トランザクションで書き込む
+            result = upsert_messages(conn, 'notion', rows)
+            save_page_progress(conn, synced_pages, failed_pages)
             
             conn.commit()
             conn.close()
             
-            print(f"💾 {saved_count}件の新しいNotionページをデータベースに保存しました")
-            return saved_count
+            # 検索バックエンドにも送る（MeiliSearchならバックグラウンドで送信）
+            get_search_backend(get_pool(self.db_path)).index_ingested('notion', rows, result)
+            
+            print(f"💾 Notionページを保存しました（新規: {result['inserted']}件 / "
+                  f"更新: {result['updated']}件 / 変更なし: {result['unchanged']}件）")
+            return result['inserted']
             
         except Exception as e:
             print(f"❌ データベース保存エラー: {e}")
             return 0
     
-    def sync_notion_data(self, limit=10):
-        """Notionデータを同期"""
+    def sync_notion_data(self, limit=10, full=False):
+        """Notionデータを同期（full=False なら前回の同期以降に編集されたページだけ）"""
         print("🔄 Notionデータの取得を開始...")
         
         try:
-            # ページ一覧を取得
-            results = self.notion.search()
-            pages = results.get('results', [])
+            # 編集されたページを古い順に取得（full=True なら全ページ）
+            states = {} if full else self.load_progress()
+            pages = changed_pages(self.notion, states)
             
-            print(f"📊 {len(pages)}件のページが見つかりました")
+            print(f"📊 {len(pages)}件の編集されたページが見つかりました")
             
-            # 処理するページ数を制限
+            # 処理するページ数を制限（古い方から。残りは次回の同期で）
             pages_to_process = pages[:limit]
-            print(f"🎯 最初の{len(pages_to_process)}件を処理します...")
+            print(f"🎯 {len(pages_to_process)}件を処理します...")
             
             pages_data = []
+            failed_pages = []
+            pages_by_id = {page['id']: page for page in pages_to_process}
             
-            for i, page in enumerate(pages_to_process, 1):
+            # 本文は複数ページを並列に取得し、取得できた順に処理する
+            contents = self.extractor.extract_pages(list(pages_by_id))
+            for i, (page_id, content) in enumerate(contents, 1):
+                page = pages_by_id[page_id]
                 print(f"📖 {i}/{len(pages_to_process)}: 処理中...")
+                if content is None:
+                    # 取得できなかったページは次回の同期でやり直す
+                    failed_pages.append(page)
+                    continue
                 
                 # ページ情報を取得
                 title = self.get_page_title(page)
-                content = self.get_page_content(page['id'])
                 
                 # メタデータを取得
                 created_time = page.get('created_time', datetime.now().isoformat())
@@ -202,7 +150,8 @@ class NotionSync:
                 print(f"✅ 「{title}」を取得完了")
             
             # データベースに保存
-            saved_count = self.save_to_database(pages_data)
+            synced_pages = [pages_by_id[page_info['id']] for page_info in pages_data]
+            saved_count = self.save_to_database(pages_data, synced_pages, failed_pages)
             
             print(f"\n🎉 同期完了！")
             print(f"📥 取得したページ: {len(pages_data)}件")
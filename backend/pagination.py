@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+📄 検索結果のページ送り（カーソル方式）
+
+LIMIT/OFFSET は深いページほど前のページ分を読み飛ばすので遅くなります。
+ここでは最後に表示した行の (日時, id) を「カーソル」としてクライアントに渡し、
+次のページはその続きから読み始めます（キーセットページネーション）。
+
+カーソルは中身を意識させないよう、URLに使えるbase64文字列にしています。
+関連度順（sort=relevance）では (関連度, id, 基準時刻) をカーソルにします。
+"""
+
+import base64
+import json
+
+from search_index import message_columns
+
+# count=estimate のとき数える上限（これを超えたら「○件以上」とする）
+ESTIMATE_COUNT_CAP = 1000
+
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+
+def encode_cursor(timestamp, row_id):
+    """(日時, id) をカーソル文字列にする"""
+    raw = json.dumps([timestamp, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """カーソル文字列を (日時, id) に戻す（不正な値は ValueError）"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('カーソルの形式が正しくありません')
+
+    if not isinstance(row_id, int) or not (timestamp is None or isinstance(timestamp, (str, int, float))):
+        raise ValueError('カーソルの形式が正しくありません')
+    return timestamp, row_id
+
+
+def next_cursor(rows, limit, timestamp_column):
+    """取得した行から次ページ用のカーソルを作る（最後のページならNone）"""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(last[timestamp_column], last['id'])
+
+
+def seek_condition(cursor, timestamp_column):
+    """
+    カーソルより後ろ（ORDER BY 日時 DESC, id DESC で続き）の行を選ぶ条件
+
+    戻り値は WHERE 句に AND でつなぐSQL断片とパラメータです。
+    日時がNULLの行は DESC の並びで最後に来るので、その扱いも含めています。
+    """
+    timestamp, row_id = decode_cursor(cursor)
+    if timestamp is None:
+        return f'({timestamp_column} IS NULL AND id < ?)', [row_id]
+    return (
+        f'({timestamp_column} < ? OR {timestamp_column} IS NULL'
+        f' OR ({timestamp_column} = ? AND id < ?))',
+        [timestamp, timestamp, row_id]
+    )
+
+
+def encode_relevance_cursor(score, row_id, reference_time):
+    """関連度順の (関連度, id, 基準時刻) をカーソル文字列にする"""
+    raw = json.dumps([score, row_id, reference_time], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_relevance_cursor(cursor):
+    """関連度順のカーソル文字列を (関連度, id, 基準時刻) に戻す（不正な値は ValueError）"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, row_id, reference_time = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('カーソルの形式が正しくありません')
+
+    if not isinstance(row_id, int) or not isinstance(score, (int, float)) or not isinstance(reference_time, str):
+        raise ValueError('カーソルの形式が正しくありません')
+    return score, row_id, reference_time
+
+
+def next_relevance_cursor(rows, limit, reference_time):
+    """関連度順で取得した行から次ページ用のカーソルを作る（最後のページならNone）"""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_relevance_cursor(last['score'], last['id'], reference_time)
+
+
+def relevance_seek_condition(score, row_id):
+    """
+    カーソルより後ろ（ORDER BY score DESC, id DESC で続き）の行を選ぶ条件
+
+    関連度は基準時刻が同じなら毎回同じ値になるので、日時と同じようにキーセットで続きを読めます。
+    """
+    return '(score < ? OR (score = ? AND id < ?))', [score, score, row_id]
+
+
+def parse_count_mode(value):
+    """count パラメータ（exact / estimate / none）を解釈する"""
+    value = (value or 'exact').strip().lower()
+    if value not in COUNT_MODES:
+        raise ValueError(f'countは {" / ".join(COUNT_MODES)} のいずれかを指定してください')
+    return value
+
+
+def count_matches(conn, where_sql, params, mode):
+    """
+    検索条件に一致する件数を数える
+
+    - exact: 正確な件数
+    - estimate: ESTIMATE_COUNT_CAP件まで数える（超えたら上限値）
+    - none: 数えない
+
+    戻り値: (件数 or None, 正確な件数かどうか)
+    """
+    if mode == 'none':
+        return None, False
+
+    if mode == 'estimate':
+        total = conn.execute(
+            f'SELECT COUNT(*) FROM (SELECT 1 FROM messages WHERE {where_sql} LIMIT ?)',
+            list(params) + [ESTIMATE_COUNT_CAP + 1]
+        ).fetchone()[0]
+        if total > ESTIMATE_COUNT_CAP:
+            return ESTIMATE_COUNT_CAP, False
+        return total, True
+
+    total = conn.execute(
+        f'SELECT COUNT(*) FROM messages WHERE {where_sql}', list(params)
+    ).fetchone()[0]
+    return total, True
+
+
+def ensure_pagination_indexes(conn):
+    """カーソル方式のページ送りに使う複合インデックスを作成"""
+    timestamp_column = message_columns(conn)['timestamp']
+    if not timestamp_column:
+        # messagesテーブルがまだ無い
+        return False
+
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS idx_messages_{timestamp_column}_id '
+        f'ON messages({timestamp_column}, id)'
+    )
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS idx_messages_platform_{timestamp_column}_id '
+        f'ON messages(platform, {timestamp_column}, id)'
+    )
+    conn.commit()
+    return True
@@ -0,0 +1,897 @@
+# -*- coding: utf-8 -*-
+"""
+🔌 検索バックエンド（SQLite / MeiliSearch / mmapインデックス の切り替え）
+
+/api/search はどのアプリ（app.py / app_production.py）からも、ここのバックエンドを通して検索します。
+使うバックエンドは環境変数 SEARCH_BACKEND で選びます。
+
+- sqlite      : SQLiteのFTSインデックス（既定）
+- meilisearch : MeiliSearchサーバー。つながらないときはSQLiteで検索する
+- mmap        : プロセス内の転置インデックス（backend/mmap_index.py）。関連度順はSQLiteで検索する
+
+SQLiteが常に正のデータで、MeiliSearchはその写しです。
+同期処理は upsert_messages で書き込んだあと index_ingested() を呼び、変更のあった
+メッセージをバックエンドへ送ります。送信はバックグラウンドのスレッドがまとめて行うので、
+同期処理は待たされません。
+
+設定（環境変数）:
+    SEARCH_BACKEND           sqlite / meilisearch / mmap
+    MEILISEARCH_HOST         MeiliSearchのURL（既定: http://127.0.0.1:7700）
+    MEILISEARCH_MASTER_KEY   APIキー（開発用は空でOK）
+    MEILISEARCH_INDEX        インデックス名（既定: messages）
+
+SQLiteの内容をMeiliSearchに入れ直す場合:
+    SEARCH_BACKEND=meilisearch python backend/search_backend.py reindex database/integrated_search.db
+"""
+
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import requests
+
+from metrics import SEARCH_ROWS_RETURNED, SEARCH_ROWS_SCANNED, SQLITE_QUERY_SECONDS
+from pagination import (
+    count_matches, decode_cursor, decode_relevance_cursor, encode_cursor, encode_relevance_cursor,
+    next_cursor, next_relevance_cursor, relevance_seek_condition, seek_condition
+)
+from search_cache import bump_data_generation
+from search_index import (
+    RECENCY_WEIGHT, RELEVANCE_FIELDS, build_search_filter, can_rank_by_relevance, field_highlights, has_json1,
+    highlight_content, message_columns, register_highlight_function, relevance_query
+)
+
+# 📐 バックエンド設定
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'sqlite').strip().lower()
+MEILISEARCH_HOST = os.getenv('MEILISEARCH_HOST', 'http://127.0.0.1:7700')
+MEILISEARCH_MASTER_KEY = os.getenv('MEILISEARCH_MASTER_KEY') or None
+MEILISEARCH_INDEX = os.getenv('MEILISEARCH_INDEX', 'messages')
+
+PUSH_BATCH_SIZE = 1000     # 1回の送信に入れるドキュメント数
+PUSH_INTERVAL = 1.0        # 送信待ちがこの秒数たまったら送る
+REINDEX_BATCH_SIZE = 5000  # 入れ直しでSQLiteから1回に読む行数
+TASK_TIMEOUT = 60.0        # MeiliSearchのタスク完了を待つ最大秒数
+TASK_POLL_INTERVAL = 0.05  # タスクの状態を確認する間隔（秒）
+REQUEST_TIMEOUT = 10       # 1リクエストのタイムアウト（秒）
+STREAM_BATCH = 200         # ストリーミング応答でSQLiteから1回に読む行数
+
+# 検索結果に含める列（messagesテーブルにある列だけ。列名はテーブルのまま返す）
+RESULT_COLUMNS = (
+    'id', 'platform', 'platform_id', 'message_id', 'title', 'content',
+    'author_name', 'author', 'channel_name', 'channel', 'created_at', 'timestamp',
+    'updated_at', 'url'
+)
+
+
+def result_columns(conn):
+    """検索結果に含める、messagesテーブルに実在する列"""
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(messages)')}
+    return [c for c in RESULT_COLUMNS if c in existing]
+
+
+def load_message_rows(conn, keys, columns=None):
+    """(platform, message_id) の一覧から、SQLiteの今の行を読む（columns を省略すると検索結果の列）"""
+    message_id = message_columns(conn)['message_id']
+    selected = ', '.join(columns or result_columns(conn))
+    by_platform = {}
+    for platform, key in keys:
+        by_platform.setdefault(platform, []).append(key)
+
+    rows = []
+    for platform, ids in by_platform.items():
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows.extend(conn.execute(
+                f'SELECT {selected} FROM messages '
+                f'WHERE platform = ? AND {message_id} IN ({", ".join("?" * len(chunk))})',
+                [platform, *chunk]
+            ).fetchall())
+    return rows
+
+
+class SearchBackend:
+    """
+    検索バックエンドの共通インターフェース
+
+    search() の戻り値:
+        {'results': [行の辞書], 'total': 件数 or None, 'total_exact': bool,
+         'next_cursor': 次ページのカーソル or None, 'sort': 実際の並び順}
+    行の辞書のキーはmessagesテーブルの列名です（画面側の表示を変えないため）。
+
+    search_fields は検索する列（論理名。例: ('content', 'author')）で、省略すると本文だけを検索します。
+    関連度順では、これに加えてタイトル・チャンネル名も検索します。
+    """
+
+    name = 'base'
+
+    def search(self, query, platform=None, limit=50, offset=0, cursor=None,
+               count_mode='exact', sort='recent', recency=RECENCY_WEIGHT, search_fields=None):
+        raise NotImplementedError
+
+    def iter_results(self, query, platform=None, limit=50, offset=0, cursor=None,
+                     sort='recent', recency=RECENCY_WEIGHT, search_fields=None):
+        """
+        検索結果の行を1件ずつ返す（ストリーミング応答用。件数は数えない）
+
+        既定では search() の結果を順に返します。SQLite・mmapインデックスは読みながら返します。
+        """
+        yield from self.search(query, platform, limit, offset, cursor, 'none', sort, recency, search_fields)['results']
+
+    def search_json(self, query, platform=None, limit=50, offset=0, cursor=None, count_mode='exact',
+                    sort='recent', recency=RECENCY_WEIGHT, full=False, fields=None,
+                    search_fields=None):
+        """
+        search() と同じ検索で、結果の一覧を組み立て済みのJSON文字列にして返す
+
+        戻り値は search() の 'results' の代わりに 'results_json'（JSON配列の文字列）と 'count'（件数）です。
+        本文はキーワード周辺の抜粋と一致位置にします（full=True なら本文全体）。
+        関連度順ではタイトル・チャンネル名の一致位置も field_highlights に付けます。
+        fields を渡すとその列だけを返します。SQLiteはJSON関数で組み立て、行ごとの辞書を作りません。
+        """
+        found = self.search(query, platform, limit, offset, cursor, count_mode, sort, recency, search_fields)
+        rows = []
+        for row in found.pop('results'):
+            message = {key: row[key] for key in fields} if fields else dict(row)
+            message.update(highlight_content(row['content'], query, full))
+            if found['sort'] == 'relevance':
+                message['field_highlights'] = field_highlights(row, query)
+            rows.append(message)
+        found['results_json'] = json.dumps(rows, ensure_ascii=False, default=str)
+        found['count'] = len(rows)
+        return found
+
+    def index_messages(self, platform, message_ids):
+        """書き込んだメッセージを検索対象に反映する（SQLite自身なら何もしない）"""
+
+    def index_keys(self, keys):
+        """(platform, message_id) の一覧を検索対象に反映する（ensure_upsert_index の戻り値など）"""
+        by_platform = {}
+        for platform, message_id in keys:
+            by_platform.setdefault(platform, []).append(message_id)
+        for platform, message_ids in by_platform.items():
+            self.index_messages(platform, message_ids)
+
+    def index_ingested(self, platform, rows, result):
+        """upsert_messages の結果に新規・更新があれば、その行をバックエンドへ送る"""
+        if result['inserted'] or result['updated']:
+            self.index_messages(platform, [str(row['message_id']) for row in rows])
+
+    def reindex(self, clear=False):
+        """SQLiteの全メッセージを入れ直す（入れた件数を返す）"""
+        return 0
+
+    def flush(self, timeout=TASK_TIMEOUT):
+        """送信待ちを送り、反映されるまで待つ"""
+        return True
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {'name': self.name}
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """SQLite（FTSインデックス / LIKE）で検索するバックエンド"""
+
+    name = 'sqlite'
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._json1 = None
+
+    def _page_query(self, conn, query, platform, limit, offset, cursor, sort, recency, selected=None,
+                    search_fields=None):
+        """1ページ分を取り出すSQLと、件数を数えるための条件（selected を省略すると検索結果の列すべて）"""
+        columns = message_columns(conn)
+        timestamp = columns['timestamp']
+        deleted = columns['is_deleted']
+        selected = selected or result_columns(conn)
+
+        # 関連度順はFTSインデックスで扱えるクエリだけ（短いクエリは新しい順）
+        ranked = sort == 'relevance' and can_rank_by_relevance(conn, query)
+
+        # 検索する列（省略すると本文だけ）。関連度順ではタイトル・チャンネル名も検索する
+        fields = tuple(search_fields or ('content',))
+        if ranked:
+            fields = RELEVANCE_FIELDS + tuple(f for f in fields if f not in RELEVANCE_FIELDS)
+
+        # 検索条件（全文検索インデックス or LIKE）
+        search_filter, filter_params = build_search_filter(conn, query, fields)
+        where_sql = search_filter + (f' AND {deleted} = 0' if deleted else '')
+        where_params = list(filter_params)
+
+        # プラットフォーム絞り込み
+        if platform:
+            where_sql += ' AND platform = ?'
+            where_params.append(platform)
+
+        reference_time = None
+        if ranked:
+            # 関連度順（並べ替えはSQLiteの中で。2ページ目以降は1ページ目と同じ基準時刻で計算する）
+            if cursor:
+                score, row_id, reference_time = decode_relevance_cursor(cursor)
+            else:
+                reference_time = datetime.now().isoformat(timespec='seconds')
+
+            conditions = [f'm.{deleted} = 0'] if deleted else []
+            if platform:
+                conditions.append('m.platform = ?')
+            ranked_sql, params = relevance_query(
+                conn, query,
+                ', '.join(f'm.{c}' for c in selected),
+                ' AND '.join(conditions) or '1',
+                [platform] if platform else [],
+                reference_time=reference_time,
+                recency_weight=recency,
+                fields=fields
+            )
+            sql = f'SELECT * FROM ({ranked_sql})'
+            if cursor:
+                seek_sql, seek_params = relevance_seek_condition(score, row_id)
+                sql += f' WHERE {seek_sql}'
+                params.extend(seek_params)
+            sql += ' ORDER BY score DESC, id DESC LIMIT ?'
+        else:
+            sql = f'SELECT {", ".join(selected)} FROM messages WHERE {where_sql}'
+            params = list(where_params)
+
+            # カーソル指定があれば、その続きから読む
+            if cursor:
+                seek_sql, seek_params = seek_condition(cursor, timestamp)
+                sql += f' AND {seek_sql}'
+                params.extend(seek_params)
+
+            # 並び順（新しい順）
+            sql += f' ORDER BY {timestamp} DESC, id DESC LIMIT ?'
+
+        params.append(limit)
+        if not cursor:
+            sql += ' OFFSET ?'
+            params.append(offset)
+
+        return {
+            'sql': sql, 'params': params, 'ranked': ranked, 'timestamp': timestamp,
+            'reference_time': reference_time, 'where_sql': where_sql, 'where_params': where_params,
+            'skipped': 0 if cursor else offset,
+        }
+
+    @staticmethod
+    def _count(conn, page, count_mode):
+        """総件数を数える（処理時間を記録する）"""
+        if count_mode == 'none':
+            return None, False
+        with SQLITE_QUERY_SECONDS.time('count'):
+            return count_matches(conn, page['where_sql'], page['where_params'], count_mode)
+
+    @staticmethod
+    def _record_rows(page, returned, total, count_mode):
+        """読んだ行数（OFFSETで読み飛ばした行・件数を数えた行を含む）と返した行数"""
+        sort = 'relevance' if page['ranked'] else 'recent'
+        counted = total if count_mode != 'none' and total is not None else 0
+        SEARCH_ROWS_SCANNED.inc(sort, amount=page['skipped'] + returned + counted)
+        SEARCH_ROWS_RETURNED.inc(sort, amount=returned)
+
+    def search(self, query, platform=None, limit=50, offset=0, cursor=None,
+               count_mode='exact', sort='recent', recency=RECENCY_WEIGHT, search_fields=None):
+        conn = self.pool.connection()
+        try:
+            page = self._page_query(conn, query, platform, limit, offset, cursor, sort, recency,
+                                    search_fields=search_fields)
+            with SQLITE_QUERY_SECONDS.time('search_relevance' if page['ranked'] else 'search_recent'):
+                results = [dict(row) for row in conn.execute(page['sql'], page['params']).fetchall()]
+            if page['ranked']:
+                page_next = next_relevance_cursor(results, limit, page['reference_time'])
+            else:
+                page_next = next_cursor(results, limit, page['timestamp'])
+
+            # 総件数取得（count=none なら数えない）
+            total, total_exact = self._count(conn, page, count_mode)
+        finally:
+            conn.close()
+        self._record_rows(page, len(results), total, count_mode)
+
+        return {
+            'results': results,
+            'total': total,
+            'total_exact': total_exact,
+            'next_cursor': page_next,
+            'sort': 'relevance' if page['ranked'] else 'recent',
+        }
+
+    def search_json(self, query, platform=None, limit=50, offset=0, cursor=None, count_mode='exact',
+                    sort='recent', recency=RECENCY_WEIGHT, full=False, fields=None,
+                    search_fields=None):
+        """1行ずつJSONの文字列をSQLiteに作らせて、つなげて返す（JSON関数が無いSQLiteでは辞書から作る）"""
+        if self._json1 is None:
+            conn = self.pool.connection()
+            self._json1 = has_json1(conn)
+            conn.close()
+        if not self._json1:
+            return super().search_json(query, platform, limit, offset, cursor, count_mode, sort, recency, full, fields,
+                                       search_fields)
+
+        conn = self.pool.connection()
+        try:
+            register_highlight_function(conn)
+            # 並べ替えは id と並び順の列だけで行い、ページに残った行だけをJSONにする
+            names = message_columns(conn)
+            timestamp = names['timestamp']
+            page = self._page_query(conn, query, platform, limit, offset, cursor, sort, recency, ['id', timestamp],
+                                    search_fields)
+            order_column = 'score' if page['ranked'] else timestamp
+
+            # 本文は highlight_json で抜粋・一致位置と入れ替える（full のときは本文はそのまま）
+            columns = result_columns(conn) + (['score'] if page['ranked'] else [])
+            keys = [c for c in (fields or columns) if c in columns and (full or c != 'content')]
+            pairs = ', '.join(f"'{c}', p.score" if c == 'score' else f"'{c}', m.{c}" for c in keys)
+            # 関連度順ではタイトル・チャンネル名の一致位置も付ける
+            field_args = ''
+            if page['ranked']:
+                field_args = ', 1' + ''.join(
+                    f", '{field}', m.{names[field]}" for field in RELEVANCE_FIELDS if field != 'content' and names[field]
+                )
+            sql = f'''
+                SELECT json_patch(json_object({pairs}), highlight_json(m.content, ?, ?{field_args})), p.id, p.{order_column}
+                FROM ({page['sql']}) p
+                JOIN messages m ON m.id = p.id
+                ORDER BY p.{order_column} DESC, p.id DESC
+            '''
+            with SQLITE_QUERY_SECONDS.time('search_relevance' if page['ranked'] else 'search_recent'):
+                rows = conn.execute(sql, [query, int(full)] + page['params']).fetchall()
+
+            page_next = None
+            if rows and len(rows) >= limit:
+                _, row_id, position = rows[-1]
+                page_next = (
+                    encode_relevance_cursor(position, row_id, page['reference_time']) if page['ranked']
+                    else encode_cursor(position, row_id)
+                )
+
+            total, total_exact = self._count(conn, page, count_mode)
+        finally:
+            conn.close()
+        self._record_rows(page, len(rows), total, count_mode)
+
+        return {
+            'results_json': '[' + ','.join(row[0] for row in rows) + ']',
+            'count': len(rows),
+            'total': total,
+            'total_exact': total_exact,
+            'next_cursor': page_next,
+            'sort': 'relevance' if page['ranked'] else 'recent',
+        }
+
+    def iter_results(self, query, platform=None, limit=50, offset=0, cursor=None,
+                     sort='recent', recency=RECENCY_WEIGHT, search_fields=None):
+        """カーソルから STREAM_BATCH 行ずつ読んで返す（結果の一覧をメモリに作らない）"""
+        conn = self.pool.connection()
+        page, returned = None, 0
+        try:
+            page = self._page_query(conn, query, platform, limit, offset, cursor, sort, recency,
+                                    search_fields=search_fields)
+            rows = conn.execute(page['sql'], page['params'])
+            while True:
+                batch = rows.fetchmany(STREAM_BATCH)
+                if not batch:
+                    return
+                returned += len(batch)
+                for row in batch:
+                    yield dict(row)
+        finally:
+            conn.close()
+            # 処理時間は受け取る側の速さで決まるので記録せず、行数だけ記録する
+            if page:
+                self._record_rows(page, returned, None, 'none')
+
+
+def timestamp_unix(value):
+    """日時の文字列をUNIX時間（秒）にする（並べ替え・絞り込み用。読めなければ0）"""
+    if not value:
+        return 0
+    try:
+        return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return 0
+
+
+def document_id(platform, message_id):
+    """MeiliSearchのドキュメントID（英数字・-・_ だけが使える）"""
+    raw = f'{platform}-{message_id}'
+    if re.fullmatch(r'[A-Za-z0-9_-]{1,500}', raw):
+        return raw
+    return f"{platform}-x{str(message_id).encode('utf-8').hex()}"[:500]
+
+
+def _filter_string(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class MeiliSearchBackend(SearchBackend):
+    """
+    MeiliSearchで検索するバックエンド
+
+    ドキュメントの送信はバックグラウンドのスレッドがまとめて行い、
+    MeiliSearchのタスク（非同期処理）の完了を確認します。
+    反映が終わったらデータ世代を進めるので、検索結果キャッシュも新しい結果に入れ替わります。
+    """
+
+    name = 'meilisearch'
+
+    def __init__(self, pool, host=MEILISEARCH_HOST, api_key=MEILISEARCH_MASTER_KEY,
+                 index_uid=MEILISEARCH_INDEX, batch_size=PUSH_BATCH_SIZE,
+                 push_interval=PUSH_INTERVAL, task_poll_interval=TASK_POLL_INTERVAL):
+        self.pool = pool
+        self.host = host.rstrip('/')
+        self.index_uid = index_uid
+        self.batch_size = batch_size
+        self.push_interval = push_interval
+        self.task_poll_interval = task_poll_interval
+        self.fallback = SQLiteSearchBackend(pool)
+
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers['Authorization'] = f'Bearer {api_key}'
+
+        # 送信待ちのメッセージ（(platform, message_id) の重複はまとめる）と、完了待ちのタスク
+        self._pending = OrderedDict()
+        self._tasks = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._index_ready = False
+
+        self.documents_pushed = 0
+        self.documents_deleted = 0
+        self.batches_pushed = 0
+        self.tasks_succeeded = 0
+        self.tasks_failed = 0
+        self.task_polls = 0
+        self.fallbacks = 0
+        self.errors = 0
+
+        atexit.register(self.close)
+
+    # --- MeiliSearch API ---
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(
+            method, f'{self.host}{path}', timeout=REQUEST_TIMEOUT, **kwargs
+        )
+        if response.status_code >= 400:
+            raise requests.HTTPError(
+                f'MeiliSearch {method} {path}: {response.status_code} {response.text[:200]}',
+                response=response
+            )
+        return response.json() if response.content else {}
+
+    def wait_for_task(self, task_uid, timeout=TASK_TIMEOUT):
+        """タスクが終わるまで状態を確認し続ける（終わったタスクを返す）"""
+        deadline = time.monotonic() + timeout
+        while True:
+            task = self._request('GET', f'/tasks/{task_uid}')
+            self.task_polls += 1
+            if task.get('status') not in ('enqueued', 'processing'):
+                return task
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f'MeiliSearchのタスク{task_uid}が{timeout:g}秒以内に終わりませんでした')
+            time.sleep(self.task_poll_interval)
+
+    def ensure_index(self):
+        """インデックスと設定を用意する（検索する列の優先順位・絞り込み・並べ替え）"""
+        if self._index_ready:
+            return
+        try:
+            task = self._request('POST', '/indexes', json={'uid': self.index_uid, 'primaryKey': 'uid'})
+            self.wait_for_task(task['taskUid'])
+        except requests.HTTPError as e:
+            # 既にある場合（index_already_exists）はそのまま使う
+            if e.response is None or e.response.status_code != 409:
+                raise
+
+        task = self._request('PATCH', f'/indexes/{self.index_uid}/settings', json={
+            # 先に書いた列ほど一致したときの順位が高い（タイトル・チャンネル名を本文より上に）
+            'searchableAttributes': ['title', 'channel', 'content', 'author'],
+            'filterableAttributes': ['platform', 'timestamp_unix', 'row_id'],
+            'sortableAttributes': ['timestamp_unix', 'row_id'],
+            # 関連度が同じなら新しい方を上に
+            'rankingRules': ['words', 'typo', 'proximity', 'attribute', 'sort', 'exactness',
+                             'timestamp_unix:desc'],
+        })
+        self.wait_for_task(task['taskUid'])
+        self._index_ready = True
+
+    def add_documents(self, documents):
+        """ドキュメントを送る（タスクIDを返す。反映は非同期）"""
+        task = self._request(
+            'POST', f'/indexes/{self.index_uid}/documents',
+            params={'primaryKey': 'uid'}, json=documents
+        )
+        self.batches_pushed += 1
+        self.documents_pushed += len(documents)
+        return task['taskUid']
+
+    def delete_documents(self, uids):
+        """ドキュメントをIDで削除する（タスクIDを返す。反映は非同期）"""
+        task = self._request('POST', f'/indexes/{self.index_uid}/documents/delete-batch', json=list(uids))
+        self.documents_deleted += len(uids)
+        return task['taskUid']
+
+    # --- ドキュメントの送信 ---
+
+    def _selected_columns(self, conn):
+        """送信用に読む列（検索結果の列と、削除フラグ）"""
+        columns = message_columns(conn)
+        selected = result_columns(conn)
+        if columns['is_deleted']:
+            selected.append(columns['is_deleted'])
+        return selected
+
+    def _documents(self, conn, rows):
+        """
+        行をドキュメントにする
+
+        戻り値: (送るドキュメント, 削除するドキュメントID)。削除済み（is_deleted=1）の行は削除する側に入ります。
+        """
+        columns = message_columns(conn)
+        existing = set(rows[0].keys()) if rows else set()
+        deleted = columns['is_deleted'] if columns['is_deleted'] in existing else None
+        documents = []
+        removed = []
+        for row in rows:
+            def value(field):
+                column = columns.get(field)
+                return row[column] if column and column in existing else None
+
+            if deleted and row[deleted]:
+                removed.append(document_id(row['platform'], value('message_id')))
+                continue
+
+            documents.append({
+                'uid': document_id(row['platform'], value('message_id')),
+                'row_id': row['id'],
+                'platform': row['platform'],
+                'message_id': value('message_id'),
+                'title': value('title'),
+                'content': value('content'),
+                'author': value('author'),
+                'channel': value('channel'),
+                'timestamp': value('timestamp'),
+                'timestamp_unix': timestamp_unix(value('timestamp')),
+                'url': row['url'] if 'url' in existing else None,
+            })
+        return documents, removed
+
+    def index_messages(self, platform, message_ids):
+        """変更のあったメッセージを送信待ちに積む（すぐに戻る）"""
+        with self._lock:
+            for message_id in message_ids:
+                self._pending[(platform, str(message_id))] = True
+            pending = len(self._pending)
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='meilisearch-push', daemon=True
+                )
+                self._thread.start()
+
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.push_interval)
+            self._wakeup.clear()
+            try:
+                self._push_pending()
+                self._check_tasks()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ MeiliSearchへの送信エラー（次回やり直します）: {e}")
+
+    def _push_pending(self):
+        """送信待ちを batch_size 件ずつ送る"""
+        while True:
+            with self._lock:
+                keys = list(self._pending)[:self.batch_size]
+            if not keys:
+                return
+
+            self.ensure_index()
+            conn = self.pool.connection()
+            try:
+                documents, _ = self._documents(
+                    conn, load_message_rows(conn, keys, self._selected_columns(conn))
+                )
+            finally:
+                conn.close()
+
+            # 削除済みの行と、SQLiteから消えた行（物理削除・重複の整理）はMeiliSearchから消す
+            sent = {document['uid'] for document in documents}
+            removed = [
+                uid for uid in (document_id(platform, key) for platform, key in keys) if uid not in sent
+            ]
+
+            task_uids = []
+            if documents:
+                task_uids.append(self.add_documents(documents))
+            if removed:
+                task_uids.append(self.delete_documents(removed))
+
+            # 送れたものだけ送信待ちから外す（失敗したら例外で抜けて次回やり直す）
+            with self._lock:
+                for key in keys:
+                    self._pending.pop(key, None)
+                self._tasks.extend(task_uids)
+
+    def _check_tasks(self, wait=False, timeout=TASK_TIMEOUT):
+        """送信したタスクの状態を確認する。すべて反映されたらデータ世代を進める"""
+        with self._lock:
+            tasks = list(self._tasks)
+        if not tasks:
+            return True
+
+        finished = []
+        for task_uid in tasks:
+            if wait:
+                task = self.wait_for_task(task_uid, timeout)
+            else:
+                task = self._request('GET', f'/tasks/{task_uid}')
+                self.task_polls += 1
+            status = task.get('status')
+            if status in ('enqueued', 'processing'):
+                continue
+            if status == 'succeeded':
+                self.tasks_succeeded += 1
+            else:
+                self.tasks_failed += 1
+                print(f"⚠️ MeiliSearchのタスク{task_uid}が失敗しました: {task.get('error')}")
+            finished.append(task_uid)
+
+        with self._lock:
+            self._tasks = [t for t in self._tasks if t not in finished]
+            done = not self._tasks and not self._pending
+
+        if finished and done:
+            # MeiliSearchに反映されたので、古い結果を持っている検索結果キャッシュを無効にする
+            with self.pool.writer() as conn:
+                bump_data_generation(conn)
+        return done
+
+    def flush(self, timeout=TASK_TIMEOUT):
+        """送信待ちを今すぐ送り、MeiliSearchに反映されるまで待つ"""
+        self._push_pending()
+        return self._check_tasks(wait=True, timeout=timeout)
+
+    def reindex(self, clear=False, batch_size=REINDEX_BATCH_SIZE):
+        """
+        SQLiteの全メッセージをMeiliSearchに入れ直す（入れた件数を返す）
+
+        削除済み（is_deleted=1）の行は送らず、MeiliSearchにあれば消します。
+        clear=True なら先に全ドキュメントを削除します（SQLiteで物理削除した行も消えます）。
+        """
+        self.ensure_index()
+        if clear:
+            task = self._request('DELETE', f'/indexes/{self.index_uid}/documents')
+            self.wait_for_task(task['taskUid'])
+
+        total = 0
+        last_id = 0
+        conn = self.pool.connection()
+        try:
+            selected = ', '.join(self._selected_columns(conn))
+            while True:
+                rows = conn.execute(
+                    f'SELECT {selected} FROM messages WHERE id > ? ORDER BY id LIMIT ?',
+                    (last_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                documents, removed = self._documents(conn, rows)
+                for start in range(0, len(documents), self.batch_size):
+                    task_uid = self.add_documents(documents[start:start + self.batch_size])
+                    with self._lock:
+                        self._tasks.append(task_uid)
+                if removed and not clear:
+                    task_uid = self.delete_documents(removed)
+                    with self._lock:
+                        self._tasks.append(task_uid)
+                total += len(documents)
+        finally:
+            conn.close()
+
+        self._check_tasks(wait=True)
+        return total
+
+    # --- 検索 ---
+
+    def search(self, query, platform=None, limit=50, offset=0, cursor=None,
+               count_mode='exact', sort='recent', recency=RECENCY_WEIGHT, search_fields=None):
+        """
+        MeiliSearchで検索する（つながらないときはSQLiteで検索）
+
+        新しい順は (日時, id) のカーソルで続きを読めます（SQLiteと同じ形式）。
+        関連度順はMeiliSearchの順位付け（タイトル・チャンネル名を重視し、同点なら新しい順）で、
+        recency は使いません。続きはオフセットのカーソルで読みます。
+        """
+        try:
+            return self._search(query, platform, limit, offset, cursor, count_mode, sort, search_fields)
+        except (requests.RequestException, KeyError) as e:
+            self.fallbacks += 1
+            print(f"⚠️ MeiliSearchで検索できませんでした（SQLiteで検索します）: {e}")
+            return self.fallback.search(query, platform, limit, offset, cursor, count_mode, sort, recency, search_fields)
+
+    def _search(self, query, platform, limit, offset, cursor, count_mode, sort, search_fields):
+        filters = []
+        if platform:
+            filters.append(f'platform = {_filter_string(platform)}')
+
+        body = {'q': query, 'limit': limit, 'matchingStrategy': 'all'}
+        if sort == 'relevance':
+            if cursor:
+                offset = _decode_offset_cursor(cursor)
+        else:
+            body['sort'] = ['timestamp_unix:desc', 'row_id:desc']
+            if cursor:
+                value, row_id = decode_cursor(cursor)
+                unix = timestamp_unix(value)
+                filters.append(
+                    f'(timestamp_unix < {unix} OR (timestamp_unix = {unix} AND row_id < {int(row_id)}))'
+                )
+                offset = 0
+        body['offset'] = offset
+        if search_fields:
+            # 検索する列を指定されたときだけ絞る（関連度順ではタイトル・チャンネル名も）
+            searched = tuple(search_fields) if sort != 'relevance' else RELEVANCE_FIELDS + tuple(
+                f for f in search_fields if f not in RELEVANCE_FIELDS
+            )
+            body['attributesToSearchOn'] = list(searched)
+        if filters:
+            body['filter'] = ' AND '.join(filters)
+
+        response = self._request('POST', f'/indexes/{self.index_uid}/search', json=body)
+        hits = response['hits']
+
+        # 行の辞書はSQLiteの列名にそろえる
+        conn = self.pool.connection()
+        try:
+            columns = message_columns(conn)
+            selected = result_columns(conn)
+        finally:
+            conn.close()
+        results = [_hit_to_row(hit, columns, selected) for hit in hits]
+
+        if len(hits) < limit:
+            page_next = None
+        elif sort == 'relevance':
+            page_next = _encode_offset_cursor(offset + limit)
+        else:
+            last = hits[-1]
+            page_next = encode_cursor(last.get('timestamp'), last['row_id'])
+
+        total = response.get('estimatedTotalHits', response.get('totalHits'))
+        return {
+            'results': results,
+            'total': None if count_mode == 'none' else total,
+            'total_exact': False,
+            'next_cursor': page_next,
+            'sort': sort,
+        }
+
+    def close(self):
+        """送信スレッドを止めて、送信待ちを送る（終了時に自動で呼ばれる）"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        with self._lock:
+            remaining = bool(self._pending or self._tasks)
+        if remaining:
+            try:
+                self.flush(timeout=10)
+            except Exception as e:
+                print(f"⚠️ MeiliSearchへ送れなかったメッセージがあります（reindexで入れ直してください）: {e}")
+        self.session.close()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+            tasks = len(self._tasks)
+        return {
+            'name': self.name,
+            'host': self.host,
+            'index': self.index_uid,
+            'pending_documents': pending,
+            'pending_tasks': tasks,
+            'documents_pushed': self.documents_pushed,
+            'documents_deleted': self.documents_deleted,
+            'batches_pushed': self.batches_pushed,
+            'tasks_succeeded': self.tasks_succeeded,
+            'tasks_failed': self.tasks_failed,
+            'task_polls': self.task_polls,
+            'fallbacks': self.fallbacks,
+            'errors': self.errors,
+        }
+
+
+def _encode_offset_cursor(offset):
+    return encode_cursor(None, -int(offset) - 1)
+
+
+def _decode_offset_cursor(cursor):
+    # オフセットは (None, -(offset + 1)) の形でカーソルに入れる（日時のカーソルとは id が負になる点で区別）
+    _, value = decode_cursor(cursor)
+    if value >= 0:
+        raise ValueError('カーソルの形式が正しくありません')
+    return -value - 1
+
+
+def _hit_to_row(hit, columns, selected):
+    """MeiliSearchのドキュメントを、SQLiteの検索結果と同じ列名の辞書にする"""
+    physical = {
+        'id': hit.get('row_id'),
+        'platform': hit.get('platform'),
+        'content': hit.get('content'),
+        'url': hit.get('url'),
+    }
+    for field in ('message_id', 'title', 'author', 'channel', 'timestamp'):
+        if columns.get(field):
+            physical[columns[field]] = hit.get(field)
+    return {column: physical.get(column) for column in selected}
+
+
+def create_search_backend(pool, name=None):
+    """名前（省略すると SEARCH_BACKEND）からバックエンドを作る"""
+    name = (name or SEARCH_BACKEND).strip().lower()
+    if name == 'meilisearch':
+        return MeiliSearchBackend(pool)
+    if name == 'mmap':
+        from mmap_index import MmapIndexBackend
+        return MmapIndexBackend(pool)
+    if name != 'sqlite':
+        print(f"⚠️ 不明な検索バックエンド: {name}（SQLiteを使います）")
+    return SQLiteSearchBackend(pool)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_search_backend(pool):
+    """接続プールごとの検索バックエンド（プロセス内で共有）"""
+    with _backends_lock:
+        backend = _backends.get(pool.db_path)
+        if backend is None:
+            backend = _backends[pool.db_path] = create_search_backend(pool)
+        return backend
+
+
+if __name__ == '__main__':
+    from db_pool import get_pool
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'reindex':
+        print("使い方: python backend/search_backend.py reindex [DBファイル] [--clear]")
+        sys.exit(1)
+
+    args = [a for a in sys.argv[2:] if not a.startswith('--')]
+    db_path = args[0] if args else 'database/integrated_search.db'
+    if not os.path.exists(db_path):
+        print(f"❌ データベースが見つかりません: {db_path}")
+        sys.exit(1)
+
+    backend = get_search_backend(get_pool(db_path))
+    print(f"🔌 検索バックエンド「{backend.name}」に入れ直しています: {db_path}")
+    started = time.perf_counter()
+    count = backend.reindex(clear='--clear' in sys.argv)
+    print(f"✅ {count}件を入れ直しました（{time.perf_counter() - started:.1f}秒）")
+    print(json.dumps(backend.stats(), ensure_ascii=False, indent=2))
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+🧠 検索結果のキャッシュ（データ世代で無効化）
+
+よく検索されるキーワードや、リアルタイム検索で打ち直した同じクエリは、
+毎回SQLiteで同じ検索を繰り返しています。
+ここでは検索結果をメモリ上のLRUキャッシュに保持し、同じ条件の検索はキャッシュから返します。
+
+- キーは正規化した (クエリ, プラットフォーム, 件数, オフセット/カーソル, 件数の数え方, 並び順)
+- 件数とおおよそのメモリ量の両方に上限があり、超えたら古く使われたものから捨てる
+- 同期処理はメッセージを書き込んだトランザクションで「データ世代」を1つ進める。
+  キャッシュは世代が変わったら中身を全部捨てるので、同期後に古い結果を返すことはない
+
+データ世代は data_generation テーブルに保存するので、同期を別プロセス
+（backend/sync_scheduler.py や backend/sync_data.py）で実行していても無効化されます。
+
+使い方:
+    generation = read_data_generation(conn)     # 検索より先に読む
+    key = search_cache_key(query, platform, limit, offset, cursor, count_mode)
+    result = cache.get(key, generation)
+    if result is None:
+        result = ...  # 検索
+        cache.put(key, generation, result)
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import SQLITE_QUERY_SECONDS
+
+# 📐 キャッシュ設定
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '1000'))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv('SEARCH_CACHE_MAX_MB', '32')) * 1024 * 1024
+
+
+def ensure_data_generation(conn):
+    """data_generation テーブルを作成（1行だけのテーブル）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO data_generation (id, generation) VALUES (1, 0)')
+    conn.commit()
+
+
+def bump_data_generation(conn):
+    """
+    データ世代を1つ進める（commitは呼び出し側で）
+
+    メッセージを書き込んだのと同じトランザクションで呼ぶと、
+    書き込みがcommitされた時点で世代も進みます。
+    """
+    conn.execute('''
+        INSERT INTO data_generation (id, generation, updated_at) VALUES (1, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT(id) DO UPDATE SET
+            generation = generation + 1,
+            updated_at = CURRENT_TIMESTAMP
+    ''')
+
+
+def read_data_generation(conn):
+    """現在のデータ世代（テーブルが無ければ0）"""
+    try:
+        with SQLITE_QUERY_SECONDS.time('generation'):
+            row = conn.execute('SELECT generation FROM data_generation WHERE id = 1').fetchone()
+    except Exception:
+        # data_generation が無い古いDB（init_db.py の再実行前）
+        return 0
+    return row[0] if row else 0
+
+
+def search_cache_key(query, platform=None, limit=50, offset=0, cursor=None, count_mode='exact',
+                     sort='recent', recency=None, full=False):
+    """
+    キャッシュのキー（同じ結果になる検索条件は同じキーになるように正規化）
+
+    クエリの中の空白や大文字・小文字は検索結果を変えることがあるので、前後の空白だけ除きます。
+    カーソルを指定した検索ではオフセットを使わないので、キーにも含めません。
+    """
+    platform = (platform or '').strip().lower() or None
+    cursor = (cursor or '').strip() or None
+    return (
+        (query or '').strip(),
+        platform,
+        int(limit),
+        None if cursor else int(offset or 0),
+        cursor,
+        count_mode,
+        sort,
+        recency if sort == 'relevance' else None,
+        bool(full),
+    )
+
+
+def _estimate_size(key, value):
+    """キャッシュ1件分のおおよそのメモリ量（JSONにしたときのバイト数）"""
+    payload = json.dumps(value, ensure_ascii=False, default=str)
+    return len(payload.encode('utf-8')) + sum(len(str(part)) for part in key) + 200
+
+
+class SearchResultCache:
+    """データ世代で無効化する検索結果のLRUキャッシュ"""
+
+    def __init__(self, max_entries=SEARCH_CACHE_MAX_ENTRIES, max_bytes=SEARCH_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.generation = None
+        self._entries = OrderedDict()   # キー → (結果, バイト数)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0       # 上限を超えて捨てた件数
+        self.invalidations = 0   # データ世代が変わって全部捨てた回数
+        self.oversized = 0       # 大きすぎて保存しなかった件数
+
+    def _sync_generation(self, generation):
+        """世代が進んでいたら中身を捨てる（ロックを持って呼ぶ）"""
+        if self.generation == generation:
+            return
+        if self.generation is not None and self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._bytes = 0
+        self.generation = generation
+
+    def get(self, key, generation):
+        """キャッシュされた結果（無ければNone）"""
+        with self._lock:
+            if self.generation is None or generation > self.generation:
+                self._sync_generation(generation)
+
+            entry = self._entries.get(key) if generation == self.generation else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, generation, value):
+        """
+        検索結果を保存する
+
+        generation は検索を始める前に読んだデータ世代です。検索中に同期が
+        commitされて世代が進んでいた場合は、古いかもしれない結果なので保存しません。
+        """
+        size = _estimate_size(key, value)
+        with self._lock:
+            if self.generation is None or generation > self.generation:
+                self._sync_generation(generation)
+            if generation != self.generation:
+                return False
+            if size > self.max_bytes:
+                self.oversized += 1
+                return False
+
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """キャッシュの利用状況（/api/stats 用）"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'generation': self.generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'oversized': self.oversized,
+            }
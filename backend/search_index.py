@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔎 全文検索インデックス（SQLite FTS5）
+
+messagesテーブルの内容（本文・タイトル・発信者・チャンネル）を
+FTS5仮想テーブル messages_fts にミラーします。
+trigramトークナイザーを使うので、日本語の部分一致検索もインデックスで処理できます。
+関連度順（sort=relevance）の検索では、BM25に新しさを混ぜた値でSQLiteの中で並べ替えます。
+検索結果の本文は、キーワード周辺の抜粋と一致位置（ハイライト）にして返します。
+関連度順ではタイトル・チャンネル名の一致位置も列ごとに返します（field_highlights）。
+
+使い方（既存データベースの移行）:
+    python backend/search_index.py database/integrated_search.db
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+from itertools import islice
+
+# trigramトークナイザーは3文字未満のクエリをインデックスで扱えない
+TRIGRAM_MIN_LENGTH = 3
+
+# FTSテーブルの列（論理名）
+FTS_FIELDS = ('content', 'title', 'author', 'channel')
+
+# 📐 関連度順（BM25）の設定
+# 列ごとの重み（FTS_FIELDS と同じ順）。タイトル・チャンネル名に一致した方を本文より上にする
+BM25_WEIGHTS = {'content': 1.0, 'title': 4.0, 'author': 0.5, 'channel': 2.0}
+# 関連度順で検索する列
+RELEVANCE_FIELDS = ('content', 'title', 'channel')
+# 新しさを混ぜる割合（0: BM25だけ / 1: 古いメッセージほど大きく下げる）
+RECENCY_WEIGHT = float(os.getenv('SEARCH_RECENCY_WEIGHT', '0.3'))
+# 新しさの効き方（この日数たったメッセージは新しさの分が半分になる）
+RECENCY_HALF_LIFE_DAYS = float(os.getenv('SEARCH_RECENCY_HALF_LIFE_DAYS', '30'))
+
+SORT_MODES = ('recent', 'relevance')
+
+# ✂️ 検索結果の抜粋
+# 抜粋の長さ（文字数。full=1 のときは本文をそのまま返す）
+SNIPPET_LENGTH = int(os.getenv('SEARCH_SNIPPET_LENGTH', '200'))
+# 1件の本文で探す一致の数の上限（長いNotionページでも探す手間を抑える）
+MAX_HIGHLIGHTS = 100
+# 抜粋が途中から・途中までのときに付ける記号
+ELLIPSIS = '…'
+
+# messagesテーブルの列構成は2種類ある
+#   init_db.py版: platform_id / title / author_name / channel_name / created_at
+#   本番版     : message_id / author / channel / timestamp / url
+_COLUMN_CANDIDATES = {
+    'message_id': ('platform_id', 'message_id'),
+    'title': ('title',),
+    'author': ('author_name', 'author'),
+    'channel': ('channel_name', 'channel'),
+    'timestamp': ('created_at', 'timestamp'),
+}
+
+
+def message_columns(conn):
+    """messagesテーブルの論理名→実際の列名の対応を返す（存在しない列はNone）"""
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(messages)')}
+    columns = {'content': 'content' if 'content' in existing else None}
+    for field, candidates in _COLUMN_CANDIDATES.items():
+        columns[field] = next((c for c in candidates if c in existing), None)
+    columns['is_deleted'] = 'is_deleted' if 'is_deleted' in existing else None
+    return columns
+
+
+def has_fts_index(conn):
+    """messages_fts が作成済みかどうか"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='messages_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def has_json1(conn):
+    """SQLiteのJSON関数（json_object など）が使えるか"""
+    try:
+        conn.execute("SELECT json_object('a', 1)").fetchone()
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def ensure_fts_index(conn):
+    """
+    FTSインデックスを作成する（既存DBの移行を兼ねる）
+
+    すでに作成済みなら何もしません。新規作成した場合は既存データから
+    インデックスを再構築します。作成できなかった場合はFalseを返します
+    （その場合、検索はLIKEにフォールバックします）。
+    """
+    if has_fts_index(conn):
+        return True
+
+    columns = message_columns(conn)
+    if not columns['content']:
+        # messagesテーブルがまだ無い
+        return False
+
+    def source(field, prefix=''):
+        column = columns[field]
+        return f'{prefix}{column}' if column else "''"
+
+    try:
+        # 列名の違いを吸収するビューを外部コンテンツとして使う
+        conn.execute(f'''
+            CREATE VIEW IF NOT EXISTS messages_fts_source AS
+            SELECT id, content,
+                   {source('title')} AS title,
+                   {source('author')} AS author,
+                   {source('channel')} AS channel
+            FROM messages
+        ''')
+        conn.execute('''
+            CREATE VIRTUAL TABLE messages_fts USING fts5(
+                content, title, author, channel,
+                content='messages_fts_source',
+                content_rowid='id',
+                tokenize='trigram'
+            )
+        ''')
+
+        new_values = ', '.join(source(f, 'new.') for f in FTS_FIELDS)
+        old_values = ', '.join(source(f, 'old.') for f in FTS_FIELDS)
+        watched = ', '.join(columns[f] for f in FTS_FIELDS if columns[f])
+
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts(rowid, content, title, author, channel)
+                VALUES (new.id, {new_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, content, title, author, channel)
+                VALUES ('delete', old.id, {old_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF {watched} ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, content, title, author, channel)
+                VALUES ('delete', old.id, {old_values});
+                INSERT INTO messages_fts(rowid, content, title, author, channel)
+                VALUES (new.id, {new_values});
+            END
+        ''')
+
+        # 既存データをインデックスに取り込む
+        conn.execute("INSERT INTO messages_fts(messages_fts) VALUES('rebuild')")
+        conn.commit()
+        return True
+
+    except sqlite3.OperationalError as e:
+        # trigramはSQLite 3.34以降。古い環境ではLIKE検索のまま動かす
+        conn.rollback()
+        print(f"⚠️ 全文検索インデックスを作成できませんでした（LIKE検索を使用します）: {e}")
+        return False
+
+
+def fts_phrase(query, fields=FTS_FIELDS):
+    """ユーザー入力をFTS5のフレーズ検索式に変換（記号はそのまま文字列として扱う）"""
+    phrase = '"' + query.replace('"', '""') + '"'
+    if tuple(fields) == FTS_FIELDS:
+        return phrase
+    return '{' + ' '.join(fields) + '} : ' + phrase
+
+
+def build_search_filter(conn, query, fields=('content',)):
+    """
+    検索条件のSQL断片とパラメータを返す
+
+    3文字以上のクエリはFTSインデックスで絞り込み、それ未満（またはFTSが
+    使えない場合）は従来どおりLIKEの部分一致で検索します。
+    戻り値はmessagesテーブルに対する WHERE 句の一部です。
+    """
+    if len(query) >= TRIGRAM_MIN_LENGTH and has_fts_index(conn):
+        return (
+            'id IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)',
+            [fts_phrase(query, fields)]
+        )
+
+    columns = message_columns(conn)
+    like_columns = [columns[f] for f in fields if columns.get(f)]
+    sql = '(' + ' OR '.join(f'{c} LIKE ?' for c in like_columns) + ')'
+    return sql, [f'%{query}%'] * len(like_columns)
+
+
+def parse_sort_mode(value):
+    """sort パラメータ（recent / relevance）を解釈する"""
+    value = (value or 'recent').strip().lower()
+    if value not in SORT_MODES:
+        raise ValueError(f'sortは {" / ".join(SORT_MODES)} のいずれかを指定してください')
+    return value
+
+
+def can_rank_by_relevance(conn, query):
+    """関連度順で検索できるか（FTSインデックスで扱える長さのクエリだけ）"""
+    return len(query) >= TRIGRAM_MIN_LENGTH and has_fts_index(conn)
+
+
+def relevance_query(conn, query, select_sql, where_sql='1', where_params=(), reference_time=None,
+                    recency_weight=RECENCY_WEIGHT, half_life_days=RECENCY_HALF_LIFE_DAYS,
+                    fields=RELEVANCE_FIELDS):
+    """
+    関連度（BM25と新しさの組み合わせ）を score 列に付けて返すSELECT文
+
+    並べ替えはSQLiteの中で行います。呼び出し側はこの文をサブクエリにして
+    ORDER BY score DESC, id DESC LIMIT ? を付けてください。
+
+    - score = BM25 × ((1 - recency_weight) + recency_weight × 新しさ)
+    - 新しさ = 1 / (1 + 経過日数 / half_life_days)（日時が無い行は0）
+    - 経過日数は reference_time（ISO形式の日時。省略すると現在）から数える
+      ページ送りの間に順位が動かないよう、2ページ目以降は1ページ目と同じ値を渡します
+
+    select_sql: messagesテーブル（別名 m）から取り出す列（例: 'm.id, m.content'）
+    where_sql: m に対する追加の条件（例: 'm.platform = ?'）
+    fields: 検索する列（論理名。FTS_FIELDS のうち）
+    戻り値: (sql, params)
+    """
+    columns = message_columns(conn)
+    timestamp = columns['timestamp']
+    # FTS5の bm25() は一致するほど小さい（負の）値なので、符号を反転して大きいほど上位にする
+    weights = ', '.join(str(BM25_WEIGHTS[field]) for field in FTS_FIELDS)
+    recency = (
+        f"IFNULL(1.0 / (1.0 + MAX(julianday(?) - julianday(m.{timestamp}), 0) / ?), 0)"
+        if timestamp else '0'
+    )
+
+    sql = f'''
+        SELECT {select_sql},
+               -r.bm25 * ((1.0 - ?) + ? * {recency}) AS score
+        FROM (
+            SELECT rowid, bm25(messages_fts, {weights}) AS bm25
+            FROM messages_fts
+            WHERE messages_fts MATCH ?
+        ) r
+        JOIN messages m ON m.id = r.rowid
+        WHERE {where_sql}
+    '''
+    params = [recency_weight, recency_weight]
+    if timestamp:
+        params += [reference_time or 'now', half_life_days]
+    params.append(fts_phrase(query, fields))
+    params.extend(where_params)
+    return sql, params
+
+
+def find_matches(text, query, limit=MAX_HIGHLIGHTS):
+    """本文の中でクエリに一致する位置 [(開始, 終了), ...]（英字の大文字・小文字は区別しない）"""
+    if not text or not query:
+        return []
+
+    folded, needle = text.lower(), query.lower()
+    if len(folded) != len(text) or len(needle) != len(query):
+        # 小文字にすると長さが変わる文字がある（位置がずれる）ときは正規表現で探す
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        return [match.span() for match in islice(pattern.finditer(text), limit)]
+
+    matches = []
+    start = folded.find(needle)
+    while start >= 0 and len(matches) < limit:
+        matches.append((start, start + len(needle)))
+        start = folded.find(needle, start + len(needle))
+    return matches
+
+
+def snippet_window(matches, text_length, length=SNIPPET_LENGTH):
+    """一致がいちばん多く入る length 文字の範囲 (開始, 終了)（一致が無ければ先頭から）"""
+    if text_length <= length:
+        return 0, text_length
+    if not matches:
+        return 0, length
+
+    best_start, best_count, last = matches[0][0], 0, 0
+    for first, (start, _) in enumerate(matches):
+        while last < len(matches) and matches[last][1] <= start + length:
+            last += 1
+        if last - first > best_count:
+            best_start, best_count = start, last - first
+
+    # 最初の一致の前にも少し文脈を残す
+    start = max(0, min(best_start - length // 4, text_length - length))
+    return start, start + length
+
+
+def highlight_content(content, query, full=False, length=SNIPPET_LENGTH):
+    """
+    検索結果の本文を抜粋にして、一致位置を付ける
+
+    戻り値（検索結果の行に上書きする項目）:
+    - content: キーワード周辺の length 文字（前後を省いたときは … を付ける）。full=True なら本文全体
+    - highlights: content の中での一致位置 [[開始, 終了], ...]（文字単位。終了は含まない）
+    - content_length: 元の本文の文字数
+    - content_truncated: 本文を省いたか
+    """
+    content = content or ''
+    matches = find_matches(content, query)
+    start, end = (0, len(content)) if full else snippet_window(matches, len(content), length)
+
+    snippet = content[start:end]
+    shift = -start
+    if start > 0:
+        snippet = ELLIPSIS + snippet
+        shift += len(ELLIPSIS)
+    if end < len(content):
+        snippet += ELLIPSIS
+
+    return {
+        'content': snippet,
+        'highlights': [[s + shift, e + shift] for s, e in matches if s >= start and e <= end],
+        'content_length': len(content),
+        'content_truncated': (start, end) != (0, len(content)),
+    }
+
+
+def highlight_fields(values, query):
+    """列ごとの一致位置 {論理名: [[開始, 終了], ...]}（values は {論理名: 値}。値は抜粋せずそのまま）"""
+    return {field: [list(span) for span in find_matches(value, query)] for field, value in values.items()}
+
+
+def field_highlights(row, query):
+    """
+    検索結果の行の、本文以外で関連度順に検索する列（タイトル・チャンネル名）の一致位置
+
+    本文と同じく英字の大文字・小文字を区別せずに Python で探します（FTS5の highlight() は使いません）。
+    行に無い列は含めません。
+    """
+    names = list(row.keys())
+    values = {}
+    for field in RELEVANCE_FIELDS:
+        if field == 'content':
+            continue
+        column = next((c for c in _COLUMN_CANDIDATES[field] if c in names), None)
+        if column:
+            values[field] = row[column]
+    return highlight_fields(values, query)
+
+
+def highlight_json(content, query, full=False, per_field=False, *field_values):
+    """
+    highlight_content の結果をJSONの文字列で返す（full のときは本文を含めない）
+
+    per_field が真なら、field_values（論理名, 値 の繰り返し）の一致位置を field_highlights に付けます。
+    """
+    fields = highlight_content(content, query, bool(full))
+    if full:
+        del fields['content']
+    if per_field:
+        fields['field_highlights'] = highlight_fields(dict(zip(field_values[::2], field_values[1::2])), query)
+    return json.dumps(fields, ensure_ascii=False)
+
+
+def register_highlight_function(conn):
+    """
+    SQLの中で highlight_json(本文, クエリ, full[, per_field, 論理名, 値, ...]) を使えるようにする
+    （検索結果をJSON1で組み立てるとき）
+    """
+    conn.create_function('highlight_json', -1, highlight_json, deterministic=True)
+
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/integrated_search.db'
+
+    if not os.path.exists(db_path):
+        print(f"❌ データベースが見つかりません: {db_path}")
+        sys.exit(1)
+
+    conn = sqlite3.connect(db_path)
+    print(f"🔎 全文検索インデックスを準備しています: {db_path}")
+    if ensure_fts_index(conn):
+        count = conn.execute('SELECT COUNT(*) FROM messages_fts').fetchone()[0]
+        print(f"✅ 全文検索インデックスの準備ができました（{count}件）")
+    conn.close()
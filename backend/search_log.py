@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+📝 検索統計の非同期記録
+
+検索のたびに search_stats へ1行INSERTしてcommitすると、入力中の検索（リアルタイム検索）
+ごとに書き込みトランザクションが走ります。
+ここではメモリ上のリングバッファに貯めておき、バックグラウンドのスレッドが
+一定件数または一定時間ごとに executemany でまとめて書き込みます。
+
+バッファがあふれた場合は古いものから捨て、捨てた件数を dropped で数えます。
+書き込みに失敗した分はバッファの先頭に戻し、次回まとめて書き込みます。
+"""
+
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+# 📐 記録設定
+BUFFER_CAPACITY = 5000   # バッファに貯められる最大件数
+BATCH_SIZE = 200         # この件数たまったらすぐ書き込む
+FLUSH_INTERVAL = 2.0     # 少なくともこの秒数ごとに書き込む
+
+
+class SearchStatsLogger:
+    """検索統計をまとめて書き込むロガー"""
+
+    def __init__(self, pool, capacity=BUFFER_CAPACITY, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.logged = 0      # 受け付けた件数
+        self.written = 0     # 書き込んだ件数
+        self.dropped = 0     # バッファあふれで捨てた件数
+        self.errors = 0      # 書き込みに失敗した回数
+
+        atexit.register(self.close)
+
+    def log(self, query, results_count, search_time_ms):
+        """検索1回分を記録（すぐに戻る）"""
+        # searched_at のDEFAULT（CURRENT_TIMESTAMP）と同じUTC形式で、検索した時刻を残す
+        searched_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append((query, results_count, search_time_ms, searched_at))
+            self.logged += 1
+            pending = len(self._buffer)
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='search-stats-logger', daemon=True
+                )
+                self._thread.start()
+
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """バッファの内容をまとめて書き込む"""
+        with self._lock:
+            if not self._buffer:
+                return 0
+            rows = list(self._buffer)
+            self._buffer.clear()
+
+        try:
+            with self.pool.writer() as conn:
+                conn.executemany('''
+                INSERT INTO search_stats (search_query, results_count, search_time_ms, searched_at)
+                VALUES (?, ?, ?, ?)
+                ''', rows)
+        except Exception as e:
+            self.errors += 1
+            print(f"検索統計記録エラー: {e}")
+            self._requeue(rows)
+            return 0
+
+        self.written += len(rows)
+        return len(rows)
+
+    def _requeue(self, rows):
+        """書き込めなかった行をバッファの先頭に戻す（入りきらない分は古いものから捨てて dropped に数える）"""
+        with self._lock:
+            room = self._buffer.maxlen - len(self._buffer)
+            kept = rows[len(rows) - room:] if room < len(rows) else rows
+            self.dropped += len(rows) - len(kept)
+            self._buffer.extendleft(reversed(kept))
+
+    def close(self):
+        """バックグラウンドスレッドを止めて、残りを書き込む（終了時に自動で呼ばれる）"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        """記録状況（/api/stats 用）"""
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            'logged': self.logged,
+            'written': self.written,
+            'pending': pending,
+            'dropped': self.dropped,
+            'errors': self.errors
+        }
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+📦 組み立て済みJSONの検索レスポンス
+
+検索バックエンドの search_json() は結果の一覧をJSON配列の文字列で返します
+（SQLiteではJSON関数で1行ずつ作るので、行ごとの辞書を作りません）。
+ここではそれを jsonify で解き直さず、周りの項目だけをJSONにしてつなげて返します。
+"""
+
+import json
+
+from flask import Response
+
+
+def encode_search_payload(payload, results_key, results_json):
+    """payload（辞書）のJSONに、組み立て済みの結果一覧を results_key として差し込んだ文字列"""
+    head = json.dumps(payload, ensure_ascii=False, default=str)
+    separator = ', ' if payload else ''
+    return f'{head[:-1]}{separator}{json.dumps(results_key)}: {results_json}}}'
+
+
+def search_json_response(payload, results_key, results_json):
+    """組み立て済みの結果一覧をそのまま使うJSONレスポンス"""
+    return Response(encode_search_payload(payload, results_key, results_json), mimetype='application/json')
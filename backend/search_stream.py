@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+🌊 検索結果のストリーミング応答（NDJSON）
+
+?stream=1 または Accept: application/x-ndjson のとき、検索結果を1行1件のJSONで
+読んだそばから返します。結果の一覧をメモリに作らないので、limit を大きくしても
+メモリ使用量は増えず、最初の1件はすぐに届きます。
+
+最後の行は {"done": true, "count": 件数, "search_time_ms": ...} のまとめです。
+途中でエラーになった場合は、まとめの行が {"done": false, "error": ...} になります
+（ステータスコードは先に200で送っているため）。
+"""
+
+import json
+import time
+
+from flask import Response, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_stream(request):
+    """ストリーミングで返すリクエストか（?stream=1 または Accept: application/x-ndjson）"""
+    if request.args.get('stream', '').strip().lower() in ('1', 'true', 'yes'):
+        return True
+    accept = request.headers.get('Accept', '')
+    return any(part.split(';')[0].strip() == NDJSON_MIMETYPE for part in accept.split(','))
+
+
+def ndjson_lines(rows, transform=None, on_finish=None):
+    """
+    行を1件ずつJSONにして返すジェネレーター
+
+    rows: 検索結果の行（ジェネレーター可。読み終わるか応答が切れたら閉じる）
+    transform: 行をレスポンス用の辞書に変える関数
+    on_finish: 最後に (件数, 検索時間ms) で呼ぶ関数（検索統計の記録など）
+    """
+    started = time.perf_counter()
+    count = 0
+    summary = {'done': True}
+    try:
+        for row in rows:
+            yield json.dumps(transform(row) if transform else row, ensure_ascii=False, default=str) + '\n'
+            count += 1
+    except Exception as e:
+        print(f"❌ ストリーミング検索エラー: {e}")
+        summary = {'done': False, 'error': str(e)}
+    finally:
+        # クライアントが途中で切断してもデータベース接続を返す
+        close = getattr(rows, 'close', None)
+        if close:
+            close()
+
+    search_time = (time.perf_counter() - started) * 1000
+    if on_finish:
+        on_finish(count, search_time)
+    summary.update(count=count, search_time_ms=round(search_time, 2))
+    yield json.dumps(summary, ensure_ascii=False) + '\n'
+
+
+def ndjson_response(rows, transform=None, on_finish=None):
+    """検索結果をNDJSONで少しずつ返すFlaskレスポンス"""
+    return Response(
+        stream_with_context(ndjson_lines(rows, transform, on_finish)),
+        mimetype=NDJSON_MIMETYPE,
+        headers={
+            'Cache-Control': 'no-cache',
+            # nginx などのプロキシにためこまず、そのまま流してもらう
+            'X-Accel-Buffering': 'no',
+        }
+    )
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+🛬 同じ検索の同時実行をまとめる（シングルフライト）
+
+お知らせの直後などに大勢が同じキーワードを同時に検索すると、検索結果キャッシュに
+入る前なので、リクエストの数だけ同じ検索（LIKE・FTSの検索と COUNT(*)）がSQLiteで走ります。
+ここでは同じキーの検索が実行中なら新しく実行せず、その完了を待って同じ結果を使います。
+
+- キーは検索結果キャッシュと同じ正規化した検索条件 + データ世代
+  （同期で世代が進んだ後のリクエストは、前の世代の検索には相乗りしない）
+- 完了後も短い時間（SEARCH_COALESCE_LINGER_MS、既定200ミリ秒）は結果を残し、
+  少し遅れて届いた同じリクエストにも使う。長く持つのは検索結果キャッシュの役目
+- 検索がエラーになったら、待っていたリクエストにも同じエラーを返す（エラーは残さない）
+
+使い方:
+    flights = SingleFlight()
+    found = flights.run((cache_key, generation), lambda: backend.search_json(...))
+
+共有した結果は複数のリクエストで同じオブジェクトなので、書き換えないでください。
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# 📐 設定
+SEARCH_COALESCE_LINGER = float(os.getenv('SEARCH_COALESCE_LINGER_MS', '200')) / 1000
+# 実行中の検索を待つ最大秒数（これを超えたら自分で検索する）
+SEARCH_COALESCE_WAIT_TIMEOUT = 30.0
+
+
+class _Flight:
+    """実行中（または完了直後）の1つの検索"""
+
+    __slots__ = ('done', 'result', 'error', 'finished_at', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """同じキーの処理を同時に1回だけ実行し、結果を分け合う"""
+
+    def __init__(self, linger=SEARCH_COALESCE_LINGER, wait_timeout=SEARCH_COALESCE_WAIT_TIMEOUT):
+        self.linger = linger
+        self.wait_timeout = wait_timeout
+        self._flights = {}              # キー → _Flight（実行中・完了直後）
+        self._finished = OrderedDict()  # 完了した順のキー（残す時間が過ぎたら消す）
+        self._lock = threading.Lock()
+
+        self.executions = 0      # 実際に実行した回数
+        self.shared = 0          # 実行中の処理を待って結果を分けてもらった回数
+        self.lingered = 0        # 完了直後の結果を使った回数
+        self.errors = 0          # 実行がエラーになった回数
+        self.wait_timeouts = 0   # 待ちきれずに自分で実行した回数
+        self.max_waiters = 0     # 1回の実行を待ったリクエストの最大数
+
+    def _expire(self, now):
+        """残す時間が過ぎた完了済みの結果を消す（ロックを持って呼ぶ）"""
+        while self._finished:
+            key, finished_at = next(iter(self._finished.items()))
+            if now - finished_at <= self.linger:
+                break
+            self._finished.popitem(last=False)
+            self._flights.pop(key, None)
+
+    def run(self, key, fn):
+        """key の処理が実行中・完了直後ならその結果を、無ければ fn() を実行して返す"""
+        with self._lock:
+            self._expire(time.monotonic())
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+                leader = True
+            elif flight.done.is_set():
+                self.lingered += 1
+                return flight.result
+            else:
+                flight.waiters += 1
+                self.max_waiters = max(self.max_waiters, flight.waiters)
+                leader = False
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                with self._lock:
+                    self.wait_timeouts += 1
+                return fn()
+            with self._lock:
+                self.shared += 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.errors += 1
+                self._flights.pop(key, None)
+            raise
+        else:
+            with self._lock:
+                flight.finished_at = time.monotonic()
+                if self.linger > 0:
+                    self._finished[key] = flight.finished_at
+                else:
+                    self._flights.pop(key, None)
+        finally:
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        """まとめた状況（/api/stats 用）"""
+        with self._lock:
+            saved = self.shared + self.lingered
+            requests = self.executions + saved + self.wait_timeouts
+            return {
+                'linger_ms': round(self.linger * 1000),
+                'in_flight': sum(1 for flight in self._flights.values() if not flight.done.is_set()),
+                'executions': self.executions,
+                'shared': self.shared,
+                'lingered': self.lingered,
+                'saved_executions': saved,
+                'saved_ratio': round(saved / requests, 3) if requests else None,
+                'errors': self.errors,
+                'wait_timeouts': self.wait_timeouts,
+                'max_waiters': self.max_waiters,
+            }
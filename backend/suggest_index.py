@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+💡 入力中の検索候補（前方一致のインデックス）
+
+入力中に /api/search で本文を全件検索する代わりに、検索候補（サジェスト）を
+メモリ上のソート済み配列から bisect で前方一致検索して返します。
+
+候補にするもの（出現回数が多いほど上位）:
+- 本文・タイトル中の単語（英数字の並び、カタカナ・漢字の並び）
+- タイトル・発信者名・チャンネル名
+- search_stats に記録された過去の検索キーワード（結果があったものだけ。重みを大きくする）
+
+SQLiteを読むのは更新時だけで、候補を返すときはメモリしか見ません。
+更新は差分だけです（前回読んだ messages.id / search_stats.id より後の行と、変更ログ）。
+同期でデータ世代（search_cache.py）が進んだら、次の問い合わせをきっかけに
+バックグラウンドで差分を取り込みます。更新中も古い候補のまま応答できます。
+
+内容の更新・削除は messages.id が増えないので、トリガーで変更前の内容を suggest_changes に記録し、
+古い内容の分を引いて今の内容を足し直します（ensure_suggest_changes で作成）。
+差分で変わった語だけをソート済みの配列に差し込み、上位候補もその語の前方一致だけ求め直します。
+"""
+
+import heapq
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from itertools import islice, takewhile
+
+from search_cache import read_data_generation
+from search_index import message_columns
+
+# 📐 候補の設定
+SUGGEST_LIMIT = 10            # 既定で返す候補の数
+SUGGEST_MAX_LIMIT = 20        # 返す候補の最大数
+SUGGEST_REFRESH_SECONDS = 60  # データ世代が変わらなくても、この秒数ごとに検索履歴を取り込む
+SCAN_BATCH = 5000             # 差分を読むときに1回で読む行数
+SCAN_LIMIT = 20000            # 長い前方一致で見る候補の上限（応答時間を一定に保つ）
+TOP_PREFIX_LENGTH = 2         # この文字数以下の前方一致は上位候補を事前に計算しておく
+MAX_TERM_LENGTH = 40          # これより長い語・名前は候補にしない
+QUERY_WEIGHT = 3              # 過去の検索キーワード1回分の重み
+INSORT_LIMIT = 1000           # 新しい語がこれ以下なら1語ずつ差し込む（多ければ並び済みの2列を併合する）
+CHANGE_LOG_KEEP = 100000      # 変更ログに残す件数（これより遅れた場合は候補を作り直す）
+
+# 単語の取り出し（英数字の並び、カタカナ・漢字の並び）
+TERM_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_\-.]+|[\u30A0-\u30FF\u4E00-\u9FFF々]{2,}')
+
+# 同じ候補が複数の種類から来たときに表示する種類（左ほど優先）
+KIND_PRIORITY = ('query', 'title', 'channel', 'author', 'term')
+
+
+def extract_terms(text):
+    """文章から候補にする単語を取り出す（重複なし）"""
+    if not text:
+        return set()
+    return {
+        term.rstrip('.-') for term in TERM_PATTERN.findall(text)
+        if len(term) <= MAX_TERM_LENGTH
+    }
+
+
+def _prefixes(key):
+    """上位候補を事前に計算しておく前方一致（TOP_PREFIX_LENGTH 文字まで）"""
+    return [key[:length] for length in range(1, min(TOP_PREFIX_LENGTH, len(key)) + 1)]
+
+
+def ensure_suggest_changes(conn):
+    """
+    更新・削除されたメッセージの変更前の内容を記録するテーブルとトリガーを作成する
+
+    ログは新しい CHANGE_LOG_KEEP 件だけ残します（古い分はトリガーの中で消す）。
+    """
+    columns = message_columns(conn)
+    if not columns['content']:
+        # messagesテーブルがまだ無い
+        return False
+
+    def old(field):
+        return f'old.{columns[field]}' if columns[field] else 'NULL'
+
+    was_deleted = f"old.{columns['is_deleted']}" if columns['is_deleted'] else '0'
+    watched = ', '.join(
+        c for c in ('content', columns['title'], columns['author'], columns['channel'], columns['is_deleted']) if c
+    )
+    record = f'''
+        INSERT INTO suggest_changes (row_id, content, title, author, channel, was_deleted)
+        VALUES (old.id, old.content, {old('title')}, {old('author')}, {old('channel')}, IFNULL({was_deleted}, 0));
+        DELETE FROM suggest_changes WHERE id <= last_insert_rowid() - {CHANGE_LOG_KEEP};
+    '''
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS suggest_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            row_id INTEGER NOT NULL,          -- messages.id
+            content TEXT,                     -- 変更前の本文
+            title TEXT,                       -- 変更前のタイトル
+            author TEXT,                      -- 変更前の発信者名
+            channel TEXT,                     -- 変更前のチャンネル名
+            was_deleted INTEGER NOT NULL DEFAULT 0  -- 変更前に削除フラグが立っていたか
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS suggest_changes_au AFTER UPDATE OF {watched} ON messages BEGIN
+            {record}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS suggest_changes_ad AFTER DELETE ON messages BEGIN
+            {record}
+        END
+    ''')
+    conn.commit()
+    return True
+
+
+class _Snapshot:
+    """候補の検索に使う読み取り専用のデータ（更新時は差し替える）"""
+
+    def __init__(self, entries, keys, top):
+        # 正規化した語 → (表示する語, 種類, 重み)
+        self.entries = entries
+        self.keys = keys
+        # 前方一致 → 重みの大きい語（短い前方一致は範囲が広いので先に求めておく）
+        self.top = top
+
+    @classmethod
+    def build(cls, entries):
+        """すべての語から作る"""
+        keys = sorted(entries)
+        grouped = defaultdict(list)
+        for key in keys:
+            for prefix in _prefixes(key):
+                grouped[prefix].append(key)
+        top = {
+            prefix: heapq.nlargest(SUGGEST_MAX_LIMIT, group, key=lambda k: entries[k][2])
+            for prefix, group in grouped.items()
+        }
+        return cls(entries, keys, top)
+
+    def updated(self, counts, changed):
+        """changed の語だけを反映した新しいスナップショット（この版は検索中の側がそのまま使える）"""
+        entries = dict(self.entries)
+        added, removed = [], []
+        for key in changed:
+            entry = counts.get(key)
+            if entry is None:
+                if entries.pop(key, None) is not None:
+                    removed.append(key)
+                continue
+            if key not in entries:
+                added.append(key)
+            entries[key] = tuple(entry)
+
+        # ソート済みの配列に、消えた語を抜いて新しい語を差し込む（全体を並べ替えない）
+        keys = list(self.keys)
+        for key in removed:
+            del keys[bisect_left(keys, key)]
+        if len(added) <= INSORT_LIMIT:
+            for key in added:
+                insort(keys, key)
+        else:
+            # 新しい語が多いときは、並び済みの2列をつなげて併合する（list.sort は並び済みの区間を線形時間で併合する）
+            keys.extend(sorted(added))
+            keys.sort()
+
+        # 変わった語の前方一致だけ上位候補を求め直す
+        top = dict(self.top)
+        for prefix in {prefix for key in changed for prefix in _prefixes(key)}:
+            current = top.get(prefix, [])
+            if any(key in changed and (key not in entries or entries[key][2] < self.entries[key][2])
+                   for key in current):
+                # 上位の語が減った・消えたときは、次点を知らないので前方一致の範囲を見直す
+                start = bisect_left(keys, prefix)
+                candidates = list(takewhile(lambda k: k.startswith(prefix), islice(keys, start, None)))
+            else:
+                candidates = set(current) | {k for k in changed if k.startswith(prefix) and k in entries}
+            best = heapq.nlargest(SUGGEST_MAX_LIMIT, candidates, key=lambda k: entries[k][2])
+            if best:
+                top[prefix] = best
+            else:
+                top.pop(prefix, None)
+        return _Snapshot(entries, keys, top)
+
+
+class SuggestIndex:
+    """入力中の検索候補のインデックス"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._counts = {}       # 正規化した語 → [表示する語, 種類, 重み]（更新スレッドだけが触る）
+        self._changed = set()   # 前回のスナップショットから重みが変わった語
+        self._rebuild = False   # 次の更新でスナップショットを全体から作り直すか
+        self._snapshot = _Snapshot.build({})
+        self._refresh_lock = threading.Lock()
+
+        self.generation = None
+        self.last_message_id = 0
+        self.last_query_id = 0
+        self.last_change_id = None  # 取り込んだ変更ログの位置（None: まだ読んでいない）
+        self.refreshed_at = None
+        self.refreshes = 0
+        self.last_refresh_seconds = None
+
+    @property
+    def ready(self):
+        return self.refreshed_at is not None
+
+    def _add(self, text, kind, weight=1):
+        """候補の重みを足す（weight が負なら引き、0以下になったら候補から外す）"""
+        text = (text or '').strip()
+        if not text or len(text) > MAX_TERM_LENGTH:
+            return
+        key = text.casefold()
+        self._changed.add(key)
+        entry = self._counts.get(key)
+        if entry is None:
+            if weight > 0:
+                self._counts[key] = [text, kind, weight]
+            return
+        entry[2] += weight
+        if entry[2] <= 0:
+            del self._counts[key]
+        elif weight > 0 and KIND_PRIORITY.index(kind) < KIND_PRIORITY.index(entry[1]):
+            entry[0], entry[1] = text, kind
+
+    def _add_message(self, content, title, author, channel, weight=1):
+        """1件のメッセージの単語・名前を候補に足す（weight=-1 なら引く）"""
+        for term in extract_terms(content) | extract_terms(title):
+            self._add(term, 'term', weight)
+        self._add(title, 'title', weight)
+        self._add(author, 'author', weight)
+        self._add(channel, 'channel', weight)
+
+    def _message_sql(self, columns, where):
+        def column(field):
+            return columns[field] or 'NULL'
+
+        return f'''
+            SELECT id, content, {column('title')}, {column('author')}, {column('channel')}
+            FROM messages
+            WHERE {where} {f"AND {columns['is_deleted']} = 0" if columns['is_deleted'] else ''}
+        '''
+
+    def _load_messages(self, conn):
+        """前回より後に追加されたメッセージを取り込む。取り込んだ件数を返す"""
+        columns = message_columns(conn)
+        if not columns['content']:
+            return 0
+
+        sql = self._message_sql(columns, 'id > ?') + ' ORDER BY id LIMIT ?'
+        loaded = 0
+        while True:
+            rows = conn.execute(sql, (self.last_message_id, SCAN_BATCH)).fetchall()
+            for row_id, content, title, author, channel in rows:
+                self._add_message(content, title, author, channel)
+                self.last_message_id = row_id
+            loaded += len(rows)
+            if len(rows) < SCAN_BATCH:
+                return loaded
+
+    def _load_changes(self, conn):
+        """
+        前回より後に更新・削除されたメッセージを取り込む（取り込んだ件数を返す）
+
+        取り込み済みの行（messages.id が last_message_id 以下）だけが対象です。
+        変更前の内容は、その行の最初の変更ログ（前回取り込んだ時点の内容）を使います。
+        変更ログが切り詰められて追いつけないときは、候補を作り直します。
+        """
+        try:
+            if self.last_change_id is None:
+                # 最初の取り込みは今の内容から作るので、ここまでの変更は読み飛ばす
+                self.last_change_id = conn.execute('SELECT IFNULL(MAX(id), 0) FROM suggest_changes').fetchone()[0]
+                return 0
+            rows = conn.execute('''
+                SELECT id, row_id, content, title, author, channel, was_deleted
+                FROM suggest_changes WHERE id > ? ORDER BY id
+            ''', (self.last_change_id,)).fetchall()
+        except sqlite3.OperationalError:
+            # 変更ログが無いDB（ensure_suggest_changes を実行していない）
+            return 0
+
+        if not rows:
+            return 0
+        if rows[0][0] > self.last_change_id + 1:
+            # 読む前に古いログが消された
+            self._reset()
+            return 0
+
+        previous = {}
+        for change_id, row_id, content, title, author, channel, was_deleted in rows:
+            if row_id <= self.last_message_id:
+                previous.setdefault(row_id, (content, title, author, channel, was_deleted))
+            self.last_change_id = change_id
+
+        for content, title, author, channel, was_deleted in previous.values():
+            if not was_deleted:
+                self._add_message(content, title, author, channel, -1)
+
+        # 今の内容を足し直す（削除された行・削除フラグが立った行は読まれない）
+        columns = message_columns(conn)
+        ids = list(previous)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            sql = self._message_sql(columns, f'id IN ({", ".join("?" * len(chunk))})')
+            for _, content, title, author, channel in conn.execute(sql, chunk):
+                self._add_message(content, title, author, channel)
+        return len(previous)
+
+    def _reset(self):
+        """候補を空にして、次の取り込みで全件から作り直す"""
+        self._counts = {}
+        self._changed = set()
+        self.last_message_id = 0
+        self.last_query_id = 0
+        self.last_change_id = None
+        self._rebuild = True
+
+    def _load_queries(self, conn):
+        """前回より後に記録された検索キーワードを取り込む"""
+        try:
+            rows = conn.execute('''
+                SELECT id, search_query FROM search_stats
+                WHERE id > ? AND results_count > 0
+                ORDER BY id
+            ''', (self.last_query_id,)).fetchall()
+        except Exception:
+            # search_stats が無いDB（本番版）
+            return 0
+
+        for row_id, query in rows:
+            self._add(query, 'query', QUERY_WEIGHT)
+            self.last_query_id = row_id
+        return len(rows)
+
+    def refresh(self):
+        """差分を取り込んで候補を作り直す（取り込んだ行数を返す）"""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            conn = self.pool.connection()
+            try:
+                # 変更ログとメッセージを同じ時点の内容で読む（読み込み中にcommitされた分は次回に取り込まれる）
+                conn.execute('BEGIN')
+                generation = read_data_generation(conn)
+                loaded = self._load_changes(conn)
+                if self._rebuild:
+                    loaded += self._load_changes(conn)
+                loaded += self._load_messages(conn) + self._load_queries(conn)
+            finally:
+                conn.rollback()
+                conn.close()
+
+            if self._rebuild or not self.ready:
+                self._snapshot = _Snapshot.build({key: tuple(entry) for key, entry in self._counts.items()})
+            elif self._changed:
+                self._snapshot = self._snapshot.updated(self._counts, self._changed)
+            self._changed = set()
+            self._rebuild = False
+
+            self.generation = generation
+            self.refreshed_at = time.monotonic()
+            self.refreshes += 1
+            self.last_refresh_seconds = time.perf_counter() - started
+            return loaded
+
+    def refresh_async(self):
+        """バックグラウンドで更新を始める（更新中なら何もしない）"""
+        if self._refresh_lock.locked():
+            return False
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"検索候補の更新エラー: {e}")
+
+        threading.Thread(target=run, name='suggest-refresh', daemon=True).start()
+        return True
+
+    def maybe_refresh(self, generation):
+        """データ世代が進んだか、前回の更新から時間がたっていればバックグラウンドで更新する"""
+        stale = (
+            not self.ready
+            or generation != self.generation
+            or time.monotonic() - self.refreshed_at >= SUGGEST_REFRESH_SECONDS
+        )
+        if stale:
+            self.refresh_async()
+        return stale
+
+    def suggest(self, prefix, limit=SUGGEST_LIMIT):
+        """前方一致する候補を重みの大きい順に返す"""
+        key = (prefix or '').strip().casefold()
+        limit = max(1, min(int(limit), SUGGEST_MAX_LIMIT))
+        if not key:
+            return []
+
+        snapshot = self._snapshot
+        if len(key) <= TOP_PREFIX_LENGTH:
+            matches = snapshot.top.get(key, [])[:limit]
+        else:
+            keys = snapshot.keys
+            start = bisect_left(keys, key)
+            candidates = []
+            for index in range(start, min(start + SCAN_LIMIT, len(keys))):
+                if not keys[index].startswith(key):
+                    break
+                candidates.append(keys[index])
+            matches = heapq.nlargest(limit, candidates, key=lambda k: snapshot.entries[k][2])
+
+        return [
+            {'text': snapshot.entries[k][0], 'kind': snapshot.entries[k][1], 'score': snapshot.entries[k][2]}
+            for k in matches
+        ]
+
+    def stats(self):
+        """インデックスの状況（/api/stats 用）"""
+        return {
+            'ready': self.ready,
+            'terms': len(self._snapshot.keys),
+            'generation': self.generation,
+            'last_message_id': self.last_message_id,
+            'last_query_id': self.last_query_id,
+            'last_change_id': self.last_change_id,
+            'refreshes': self.refreshes,
+            'last_refresh_seconds': (
+                round(self.last_refresh_seconds, 3) if self.last_refresh_seconds is not None else None
+            ),
+        }
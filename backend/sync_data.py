@@ -16,6 +16,13 @@ from dotenv import load_dotenv
 # プロジェクトルートを追加
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from bulk_ingest import ensure_upsert_index, upsert_messages
+from chatwork_client import CHATWORK_API_BASE, ChatworkClient, room_cursor, room_cursor_changed
+from db_pool import get_pool
+from discord_client import DISCORD_API_BASE, DiscordClient, backfill_scope, message_author, message_url
+from search_backend import get_search_backend
+from sync_state import ensure_sync_state, load_sync_states, save_sync_state
+
 # 環境変数を読み込み
 load_dotenv()
 
@@ -23,9 +30,14 @@ class DataSyncManager:
     def __init__(self):
         self.db_path = os.getenv('DATABASE_PATH', './data/search.db')
         self.chatwork_token = os.getenv('CHATWORK_API_TOKEN')
+        self.chatwork_api_base = os.getenv('CHATWORK_API_BASE', CHATWORK_API_BASE)
         self.notion_token = os.getenv('NOTION_API_TOKEN')
         self.notion_database_id = os.getenv('NOTION_DATABASE_ID')
         self.discord_token = os.getenv('DISCORD_BOT_TOKEN')
+        self.discord_guild_id = os.getenv('DISCORD_GUILD_ID')
+        self.discord_api_base = os.getenv('DISCORD_API_BASE', DISCORD_API_BASE)
+        # 同期したメッセージは検索バックエンドにも送る（MeiliSearchならバックグラウンドで送信）
+        self.search_backend = get_search_backend(get_pool(self.db_path))
         
     def connect_db(self):
         """データベース接続"""
@@ -39,67 +51,60 @@ class DataSyncManager:
             print("⚠️  Chatwork APIキーが設定されていません")
             return 0
             
-        headers = {
-            'X-ChatWorkToken': self.chatwork_token
-        }
+        client = ChatworkClient(self.chatwork_token, base_url=self.chatwork_api_base)
         
         try:
             # ルーム一覧を取得
-            rooms_response = requests.get(
-                'https://api.chatwork.com/v2/rooms',
-                headers=headers
-            )
-            
-            if rooms_response.status_code != 200:
-                print(f"❌ Chatwork API エラー: {rooms_response.status_code}")
-                return 0
-                
-            rooms = rooms_response.json()
+            rooms = client.get_rooms()
             total_messages = 0
             
             conn = self.connect_db()
-            cursor = conn.cursor()
+            ensure_sync_state(conn)
+            self.search_backend.index_keys(ensure_upsert_index(conn))
+            states = load_sync_states(conn, 'chatwork')
             
-            for room in rooms[:5]:  # 最初の5つのルームのみ
+            # 更新のあったルームだけ差分を並列に取得（レート制限はクライアント側で調整）
+            for room, messages in client.iter_room_updates(rooms, states):
                 room_id = room['room_id']
+                state = states.get(str(room_id))
+                if not messages:
+                    # 新しいメッセージが無くても、確認した last_update_time までは進める（次回はAPIを呼ばない）
+                    cursor = room_cursor([], room, state)
+                    if messages is not None and room_cursor_changed(state, cursor):
+                        save_sync_state(conn, 'chatwork', room_id, *cursor)
+                        conn.commit()
+                    continue
+                
                 room_name = room['name']
                 
-                print(f"📱 ルーム: {room_name} からメッセージを取得中...")
+                print(f"📱 ルーム: {room_name} から{len(messages)}件のメッセージを取得しました")
                 
-                # メッセージを取得
-                messages_response = requests.get(
-                    f'https://api.chatwork.com/v2/rooms/{room_id}/messages',
-                    headers=headers,
-                    params={'force': 1}
-                )
+                rows = [{
+                    'message_id': f"chatwork_{room_id}_{message['message_id']}",
+                    'content': message.get('body', ''),
+                    'author': message.get('account', {}).get('name', 'Unknown'),
+                    'channel': room_name,
+                    'timestamp': datetime.fromtimestamp(message.get('send_time', 0)),
+                    'url': f"https://www.chatwork.com/#!rid{room_id}"
+                } for message in messages]
+                result = upsert_messages(conn, 'chatwork', rows)
+                total_messages += result['inserted'] + result['updated']
                 
-                if messages_response.status_code == 200:
-                    messages = messages_response.json()
-                    
-                    for message in messages[-20:]:  # 最新20件
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO messages 
-                            (platform, message_id, content, author, channel, timestamp, url)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            'chatwork',
-                            f"chatwork_{room_id}_{message['message_id']}",
-                            message.get('body', ''),
-                            message.get('account', {}).get('name', 'Unknown'),
-                            room_name,
-                            datetime.fromtimestamp(message.get('send_time', 0)),
-                            f"https://www.chatwork.com/#!rid{room_id}"
-                        ))
-                        total_messages += 1
+                # 進捗もメッセージと一緒に、ルームごとに確定させる（書き込みロックを長く持たない）
+                save_sync_state(conn, 'chatwork', room_id, *room_cursor(messages, room, state))
+                conn.commit()
+                self.search_backend.index_ingested('chatwork', rows, result)
             
-            conn.commit()
             conn.close()
-            print(f"✅ Chatwork: {total_messages}件のメッセージを同期しました")
+            print(f"✅ Chatwork: {total_messages}件のメッセージを同期しました（API呼び出し: {client.api_calls}回）")
             return total_messages
             
         except Exception as e:
             print(f"❌ Chatwork同期エラー: {str(e)}")
             return 0
+        
+        finally:
+            client.close()
     
     def sync_notion_data(self):
         """Notionからデータを同期"""
@@ -131,10 +136,7 @@ class DataSyncManager:
                 return 0
                 
             search_results = search_response.json()
-            total_pages = 0
-            
-            conn = self.connect_db()
-            cursor = conn.cursor()
+            rows = []
             
             for page in search_results.get('results', []):
                 page_id = page['id']
@@ -158,23 +160,23 @@ class DataSyncManager:
                                 title = text_array[0].get('plain_text', '')[:100]
                                 break
                 
-                cursor.execute('''
-                    INSERT OR REPLACE INTO messages 
-                    (platform, message_id, content, author, channel, timestamp, url)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    'notion',
-                    f"notion_{page_id}",
-                    title,
-                    'Notion User',
-                    'Notion Pages',
-                    datetime.fromisoformat(page.get('created_time', '').replace('Z', '+00:00')) if page.get('created_time') else datetime.now(),
-                    page.get('url', f"https://notion.so/{page_id}")
-                ))
-                total_pages += 1
+                rows.append({
+                    'message_id': f"notion_{page_id}",
+                    'content': title,
+                    'author': 'Notion User',
+                    'channel': 'Notion Pages',
+                    'timestamp': datetime.fromisoformat(page.get('created_time', '').replace('Z', '+00:00')) if page.get('created_time') else datetime.now(),
+                    'url': page.get('url', f"https://notion.so/{page_id}")
+                })
             
+            conn = self.connect_db()
+            self.search_backend.index_keys(ensure_upsert_index(conn))
+            result = upsert_messages(conn, 'notion', rows)
             conn.commit()
             conn.close()
+            self.search_backend.index_ingested('notion', rows, result)
+            
+            total_pages = result['inserted'] + result['updated']
             print(f"✅ Notion: {total_pages}件のページを同期しました")
             return total_pages
             
@@ -189,10 +191,63 @@ class DataSyncManager:
         if not self.discord_token or self.discord_token == 'test_token':
             print("⚠️  Discord APIキーが設定されていません")
             return 0
+        
+        if not self.discord_guild_id:
+            print("⚠️  DISCORD_GUILD_IDが設定されていません")
+            return 0
             
-        # Discord APIは複雑なので、今回は簡単な実装
-        print("⚠️  Discord同期は今回スキップします（Bot権限設定が必要）")
-        return 0
+        client = DiscordClient(self.discord_token, base_url=self.discord_api_base)
+        
+        try:
+            # テキストチャンネル一覧を取得
+            channels = client.get_text_channels(self.discord_guild_id)
+            total_messages = 0
+            
+            conn = self.connect_db()
+            ensure_sync_state(conn)
+            self.search_backend.index_keys(ensure_upsert_index(conn))
+            states = load_sync_states(conn, 'discord')
+            
+            # チャンネルごとに、新しいメッセージと過去へのさかのぼりを並列に取得
+            for channel, updates in client.iter_channel_updates(channels, states):
+                if updates is None:
+                    continue
+                
+                messages, newest, oldest = updates
+                channel_id = channel['id']
+                
+                if messages:
+                    print(f"💬 チャンネル: #{channel['name']} から{len(messages)}件のメッセージを取得しました")
+                
+                rows = [{
+                    'message_id': f"discord_{channel_id}_{message['id']}",
+                    'content': message.get('content', ''),
+                    'author': message_author(message),
+                    'channel': f"#{channel['name']}",
+                    'timestamp': message.get('timestamp'),
+                    'url': message_url(self.discord_guild_id, channel_id, message['id'])
+                } for message in messages if message.get('content')]
+                result = upsert_messages(conn, 'discord', rows)
+                total_messages += result['inserted'] + result['updated']
+                
+                # 最新側とさかのぼりの進捗（Snowflake ID）もメッセージと一緒に確定させる
+                if newest:
+                    save_sync_state(conn, 'discord', channel_id, newest)
+                if oldest:
+                    save_sync_state(conn, 'discord', backfill_scope(channel_id), oldest)
+                conn.commit()
+                self.search_backend.index_ingested('discord', rows, result)
+            
+            conn.close()
+            print(f"✅ Discord: {total_messages}件のメッセージを同期しました（API呼び出し: {client.api_calls}回）")
+            return total_messages
+            
+        except Exception as e:
+            print(f"❌ Discord同期エラー: {str(e)}")
+            return 0
+        
+        finally:
+            client.close()
     
     def run_sync(self):
         """すべてのプラットフォームからデータを同期"""
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+🧵 非同期の同期ジョブ（ジョブIDと進捗の確認）
+
+POST /api/sync で同期を最後まで待つと、大きなワークスペースでは
+リバースプロキシのタイムアウトに引っかかります。
+ここでは同期をバックグラウンドのジョブとして受け付けてすぐにジョブIDを返し、
+進捗は GET /api/sync/jobs/<id> で確認できるようにします。
+
+- プラットフォームごとの進捗（ルーム数・ページ数、書き込んだ件数、速度、残り時間の目安）
+- 実行中のジョブがあれば新しく始めず、そのジョブに相乗りする（同じ取得を二重に走らせない）
+  実行中のジョブでは足りない指定（full など）は、終わったあとに続けて実行するジョブにまとめる
+- 各プラットフォームの同期はスケジューラーのジョブとして実行する（定期同期とも重ならない）
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+# 📐 ジョブ設定
+MAX_FINISHED_JOBS = 50   # 結果を残しておく終了済みジョブの数
+
+
+class SyncProgress:
+    """1プラットフォーム分の進捗（同期処理から更新される）"""
+
+    def __init__(self, platform, unit):
+        self.platform = platform
+        self.unit = unit          # 'rooms' / 'pages' など
+        self.total = None
+        self.done = 0
+        self.rows = 0
+        self.status = 'pending'
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.status = 'running'
+            self.started = time.monotonic()
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+
+    def advance(self, done=1, rows=0):
+        with self._lock:
+            self.done += done
+            self.rows += rows
+
+    def finish(self, status):
+        with self._lock:
+            self.status = status
+            self.finished = time.monotonic()
+
+    def to_dict(self):
+        with self._lock:
+            elapsed = ((self.finished or time.monotonic()) - self.started) if self.started else 0.0
+            rate = self.done / elapsed if elapsed > 0 else None
+            eta = None
+            if self.status == 'running' and rate and self.total is not None:
+                eta = round(max(0, self.total - self.done) / rate, 1)
+            return {
+                'status': self.status,
+                'unit': self.unit,
+                'done': self.done,
+                'total': self.total,
+                'rows_written': self.rows,
+                'elapsed_seconds': round(elapsed, 1),
+                'rate_per_second': round(rate, 2) if rate else None,
+                'rows_per_second': round(self.rows / elapsed, 1) if elapsed > 0 else None,
+                'eta_seconds': eta,
+            }
+
+
+class SyncJobRun:
+    """1回分の同期ジョブ"""
+
+    def __init__(self, platforms, options):
+        self.id = uuid.uuid4().hex[:12]
+        self.options = options
+        self.status = 'queued'
+        self.created_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.coalesced = 0        # 相乗りしたリクエストの数
+        self.results = {}
+        self.progress = OrderedDict(
+            (platform, SyncProgress(platform, unit)) for platform, unit in platforms
+        )
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'options': self.options,
+            'coalesced_requests': self.coalesced,
+            'synced': self.results,
+            'platforms': {name: p.to_dict() for name, p in self.progress.items()},
+        }
+
+
+class SyncJobManager:
+    """
+    同期ジョブの受付と実行
+
+    scheduler: SyncScheduler（プラットフォームごとのジョブが登録済み）
+    platforms: [(ジョブ名, 進捗の単位), ...]
+    """
+
+    def __init__(self, scheduler, platforms):
+        self.scheduler = scheduler
+        self.platforms = platforms
+        self.jobs = OrderedDict()
+        self._current = None
+        self._next = None         # 実行中のジョブが終わったら続けて実行するジョブ
+        self._lock = threading.Lock()
+
+    def submit(self, **options):
+        """
+        同期ジョブを受け付ける。(ジョブ, 相乗りしたかどうか) を返す
+
+        実行中のジョブがあれば新しく始めずに、そのジョブを返します。
+        実行中のジョブの指定では足りないとき（通常の同期の実行中に full=True など）は、
+        そのジョブが終わったあとに続けて実行するジョブを返します（指定を捨てないように）。
+        """
+        with self._lock:
+            current = self._current
+            if current is not None and current.active:
+                if self._covers(current.options, options):
+                    current.coalesced += 1
+                    return current, True
+                if self._next is not None:
+                    self._next.options = self._merge(self._next.options, options)
+                    self._next.coalesced += 1
+                    return self._next, True
+
+                self._next = SyncJobRun(self.platforms, options)
+                self.jobs[self._next.id] = self._next
+                self._prune()
+                return self._next, False
+
+            job = SyncJobRun(self.platforms, options)
+            self.jobs[job.id] = job
+            self._current = job
+            self._prune()
+
+        threading.Thread(target=self._run_all, args=(job,), name=f'sync-job-{job.id}', daemon=True).start()
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def recent(self, limit=10):
+        with self._lock:
+            return list(self.jobs.values())[-limit:][::-1]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    @staticmethod
+    def _covers(running, requested):
+        """実行中のジョブの指定で、受け付けた指定を満たせるか（full=True は full のジョブだけが満たす）"""
+        return all(running.get(key) == value for key, value in requested.items() if value)
+
+    @staticmethod
+    def _merge(options, requested):
+        return {key: options.get(key) or requested.get(key) for key in {**options, **requested}}
+
+    def _run_all(self, job):
+        """ジョブを実行し、続けて実行するジョブがあれば同じスレッドで実行する"""
+        while job is not None:
+            failed = self._run(job)
+            # 相乗りの判定（submit）と食い違わないよう、終了と次のジョブへの切り替えはロックの中で
+            with self._lock:
+                job.finished_at = datetime.now().isoformat()
+                job.status = 'failed' if failed else 'completed'
+                job, self._next = self._next, None
+                if job is not None:
+                    self._current = job
+
+    def _run(self, job):
+        """ジョブの各プラットフォームを同期する（失敗したものがあれば True を返す）"""
+        job.status = 'running'
+        failed = False
+
+        for name, progress in job.progress.items():
+            progress.start()
+            # 定期同期が実行中なら終わるのを待ってから、最新の状態で取り直す
+            count, error = self.scheduler.run_now(name, wait=True, progress=progress, **self._options_for(name, job))
+            if error:
+                failed = True
+                progress.finish('failed')
+            else:
+                progress.finish('completed')
+            job.results[name] = count or 0
+        return failed
+
+    @staticmethod
+    def _options_for(name, job):
+        # full はNotionだけが受け付ける（全ページの取り直し）
+        if name == 'notion' and job.options.get('full'):
+            return {'full': True}
+        return {}
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+⏰ バックグラウンド同期スケジューラー
+
+プラットフォームごとの同期ジョブを、それぞれの間隔（SYNC_INTERVAL_MINUTES）で
+バックグラウンドのスレッドから実行します。検索リクエストを処理するスレッドは使いません。
+
+- 間隔には揺らぎ（SYNC_JITTER_SECONDS）を加え、複数ジョブの実行が重ならないようにする
+- 同じジョブが実行中なら、次の実行はスキップする（同じ同期が二重に走らない）
+- 実行結果と所要時間を sync_logs テーブルに記録する
+
+設定（環境変数）:
+    SYNC_INTERVAL_MINUTES           全ジョブ共通の間隔（分）。0 なら定期実行しない（手動の同期のみ）
+    CHATWORK_SYNC_INTERVAL_MINUTES  ジョブごとの間隔（分）。ジョブ名を大文字にした接頭辞
+    SYNC_JITTER_SECONDS             間隔に加える揺らぎの最大秒数
+    SYNC_SCHEDULER                  off にするとWebサーバーのプロセスでは同期を実行しない
+
+単体で起動する場合（Webサーバーとは別プロセスで同期だけを実行）:
+    SYNC_SCHEDULER=off python backend/app_production.py   # Webサーバー側では実行しない
+    python backend/sync_scheduler.py
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import schedule
+
+# 📐 スケジュール設定
+SYNC_INTERVAL_MINUTES = float(os.getenv('SYNC_INTERVAL_MINUTES', '30'))
+SYNC_JITTER_SECONDS = int(os.getenv('SYNC_JITTER_SECONDS', '60'))
+TICK_SECONDS = 1.0  # 実行予定を確認する間隔
+
+
+def ensure_sync_logs(conn):
+    """sync_logs テーブルを作成（init_db.py と同じ構成）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            platform TEXT NOT NULL,          -- 同期したプラットフォーム
+            status TEXT NOT NULL,             -- 'success', 'error', 'partial'
+            messages_count INTEGER DEFAULT 0,-- 同期したメッセージ数
+            error_message TEXT,               -- エラーメッセージ（あれば）
+            started_at DATETIME,              -- 同期開始時間
+            completed_at DATETIME DEFAULT CURRENT_TIMESTAMP,  -- 同期完了時間
+            duration_seconds REAL             -- 同期時間（秒）
+        )
+    ''')
+    conn.commit()
+
+
+def job_interval_minutes(name):
+    """ジョブの間隔（<ジョブ名>_SYNC_INTERVAL_MINUTES があればそちらを優先）"""
+    return float(os.getenv(f'{name.upper()}_SYNC_INTERVAL_MINUTES', SYNC_INTERVAL_MINUTES))
+
+
+def _utc_now():
+    # completed_at のDEFAULT（CURRENT_TIMESTAMP）と同じUTC形式
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class SyncJob:
+    """1つの同期ジョブ（実行中はロックを持つ）"""
+
+    def __init__(self, name, func, interval_minutes, jitter_seconds):
+        self.name = name
+        self.func = func
+        self.interval_minutes = interval_minutes
+        self.jitter_seconds = jitter_seconds
+        self.lock = threading.Lock()
+
+        # 実行状況（/api/sync/status 用）
+        self.runs = 0
+        self.skipped = 0
+        self.last_started_at = None
+        self.last_duration = None
+        self.last_count = None
+        self.last_error = None
+
+
+class SyncScheduler:
+    """同期ジョブを定期実行するスケジューラー"""
+
+    def __init__(self, pool, tick=TICK_SECONDS):
+        self.pool = pool
+        self.tick = tick
+        self.scheduler = schedule.Scheduler()
+        self.jobs = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, func, interval_minutes=None, jitter_seconds=SYNC_JITTER_SECONDS):
+        """
+        ジョブを登録する
+
+        func: 同期処理（同期した件数を返す関数）
+        interval_minutes: 省略すると環境変数から決める。0以下なら定期実行しない（手動実行のみ）
+        """
+        if interval_minutes is None:
+            interval_minutes = job_interval_minutes(name)
+        job = SyncJob(name, func, interval_minutes, jitter_seconds)
+        self.jobs[name] = job
+
+        if interval_minutes > 0:
+            seconds = max(1, int(interval_minutes * 60))
+            every = self.scheduler.every(seconds)
+            if jitter_seconds > 0:
+                every = every.to(seconds + jitter_seconds)
+            every.seconds.do(self.trigger, name).tag(name)
+        return job
+
+    def trigger(self, name):
+        """
+        ジョブをバックグラウンドで開始する
+
+        同じジョブが実行中ならスキップしてFalseを返します。
+        """
+        job = self.jobs[name]
+        if not job.lock.acquire(blocking=False):
+            job.skipped += 1
+            print(f"⏭️ {name}: 前回の同期がまだ実行中のためスキップしました")
+            return False
+
+        threading.Thread(
+            target=self._run_locked, args=(job,), name=f'sync-{name}', daemon=True
+        ).start()
+        return True
+
+    def run_now(self, name, wait=False, **kwargs):
+        """
+        ジョブをこのスレッドで実行して (件数, エラー) を返す（kwargs は同期処理にそのまま渡す）
+
+        エラーはこの実行のもの（成功ならNone）。job.last_error は直後に始まった
+        定期同期で書き換わることがあるので、結果の判定にはこちらを使ってください。
+        同じジョブが実行中の場合、wait=False なら重ねて実行せずに (None, None) を返し、
+        wait=True なら終わるのを待ってから実行します。
+        """
+        job = self.jobs[name]
+        if not job.lock.acquire(blocking=wait):
+            job.skipped += 1
+            return None, None
+        return self._run_locked(job, kwargs)
+
+    def _run_locked(self, job, kwargs=None):
+        try:
+            return self._run(job, kwargs or {})
+        finally:
+            job.lock.release()
+
+    def _run(self, job, kwargs):
+        started_at = _utc_now()
+        started = time.perf_counter()
+        count = 0
+        error = None
+
+        try:
+            count = job.func(**kwargs) or 0
+        except Exception as e:
+            error = str(e)
+            print(f"⚠️ {job.name}: 同期が失敗しました（{time.perf_counter() - started:.1f}秒）")
+
+        duration = time.perf_counter() - started
+        job.runs += 1
+        job.last_started_at = started_at
+        job.last_duration = duration
+        job.last_count = count
+        job.last_error = error
+
+        self._log(job.name, 'error' if error else 'success', count, error, started_at, duration)
+        return count, error
+
+    def _log(self, platform, status, count, error, started_at, duration):
+        """sync_logs に実行結果を記録"""
+        try:
+            with self.pool.writer() as conn:
+                conn.execute('''
+                    INSERT INTO sync_logs
+                    (platform, status, messages_count, error_message, started_at, completed_at, duration_seconds)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (platform, status, count, error, started_at, _utc_now(), round(duration, 3)))
+        except Exception as e:
+            print(f"同期ログ記録エラー: {e}")
+
+    def start(self, run_now=False):
+        """スケジューラーのスレッドを開始（run_now=True なら全ジョブをすぐに1回実行）"""
+        with self.pool.writer() as conn:
+            ensure_sync_logs(conn)
+
+        if run_now:
+            for name in self.jobs:
+                self.trigger(name)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='sync-scheduler', daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stopped.wait(self.tick):
+            self.scheduler.run_pending()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def status(self):
+        """ジョブごとの実行状況"""
+        result = {}
+        for name, job in self.jobs.items():
+            scheduled = self.scheduler.get_jobs(name)
+            next_run = scheduled[0].next_run if scheduled else None
+            result[name] = {
+                'interval_minutes': job.interval_minutes,
+                'running': job.lock.locked(),
+                'next_run': next_run.isoformat() if next_run else None,
+                'runs': job.runs,
+                'skipped': job.skipped,
+                'last_started_at': job.last_started_at,
+                'last_duration_seconds': round(job.last_duration, 3) if job.last_duration is not None else None,
+                'last_count': job.last_count,
+                'last_error': job.last_error,
+            }
+        return result
+
+
+if __name__ == '__main__':
+    # 別プロセス（サイドカー）として同期だけを実行する
+    import app_production
+
+    app_production.init_database()
+    sync_scheduler = app_production.create_sync_scheduler()
+    sync_scheduler.start(run_now=True)
+    print(f"⏰ 同期スケジューラーを起動しました（{SYNC_INTERVAL_MINUTES:g}分ごと）")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        sync_scheduler.stop()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+🔖 同期の進捗（ハイウォーターマーク）
+
+プラットフォームのルーム・チャンネル・ワークスペースごとに「どこまで取り込んだか」を
+sync_state テーブルに保存します。次回の同期はその続き（差分）だけを取得します。
+
+- platform: 'chatwork' / 'notion' / 'discord'
+- scope:    ルームID・チャンネルIDなど（ワークスペース全体なら '*'）
+- cursor:   最後に取り込んだメッセージIDなど
+- cursor_time: 最後に取り込んだメッセージの日時など
+"""
+
+import sqlite3
+from datetime import datetime
+
+
+def ensure_sync_state(conn):
+    """sync_state テーブルを作成"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            platform TEXT NOT NULL,           -- 'chatwork', 'notion', 'discord'
+            scope TEXT NOT NULL,              -- ルームID・チャンネルIDなど
+            cursor TEXT,                      -- 最後に取り込んだメッセージIDなど
+            cursor_time TEXT,                 -- 最後に取り込んだメッセージの日時など
+            updated_at TEXT,                  -- この進捗を記録した日時
+            PRIMARY KEY (platform, scope)
+        )
+    ''')
+    conn.commit()
+
+
+def load_sync_states(conn, platform):
+    """プラットフォームの進捗をまとめて取得 {scope: {'cursor', 'cursor_time', 'updated_at'}}"""
+    try:
+        rows = conn.execute(
+            'SELECT scope, cursor, cursor_time, updated_at FROM sync_state WHERE platform = ?',
+            (platform,)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # sync_state がまだ無いDBでは、すべて初回同期として扱う
+        return {}
+
+    return {
+        row[0]: {'cursor': row[1], 'cursor_time': row[2], 'updated_at': row[3]}
+        for row in rows
+    }
+
+
+def load_sync_state(conn, platform, scope):
+    """1つのスコープの進捗（無ければNone）"""
+    try:
+        row = conn.execute(
+            'SELECT cursor, cursor_time, updated_at FROM sync_state WHERE platform = ? AND scope = ?',
+            (platform, str(scope))
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return {'cursor': row[0], 'cursor_time': row[1], 'updated_at': row[2]} if row else None
+
+
+def save_sync_state(conn, platform, scope, cursor, cursor_time=None):
+    """進捗を保存（commitは呼び出し側で。取り込んだデータと同じトランザクションにする）"""
+    conn.execute('''
+        INSERT INTO sync_state (platform, scope, cursor, cursor_time, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(platform, scope) DO UPDATE SET
+            cursor = excluded.cursor,
+            cursor_time = excluded.cursor_time,
+            updated_at = excluded.updated_at
+    ''', (platform, str(scope), cursor, cursor_time, datetime.now().isoformat()))
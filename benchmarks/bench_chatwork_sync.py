@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ Chatwork取得のスループット測定
+
+モックサーバー（benchmarks/mock_chatwork.py）に対して、
+1ルームずつ順番に取得した場合と並列に取得した場合の速さを比べます。
+ネットワークやAPIトークンは不要です。
+
+使い方:
+    python benchmarks/bench_chatwork_sync.py --rooms 50 --latency 0.05 --workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from chatwork_client import ChatworkClient
+from mock_chatwork import MockChatworkServer
+
+
+def run(server, workers):
+    """全ルームを取得して (秒数, メッセージ数, API呼び出し数, 429回数) を返す"""
+    client = ChatworkClient('dummy-token', base_url=server.base_url, max_workers=workers,
+                            rate_limit=server.rate_limit, rate_window=server.rate_window)
+    started = time.perf_counter()
+    rooms = client.get_rooms()
+    total = sum(len(messages or []) for _, messages in client.iter_room_messages(rooms))
+    elapsed = time.perf_counter() - started
+    client.close()
+    return elapsed, total, client.api_calls, client.rate_limited
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chatwork取得のスループット測定')
+    parser.add_argument('--rooms', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=100, help='ルームごとのメッセージ数')
+    parser.add_argument('--latency', type=float, default=0.05, help='モックの応答遅延（秒）')
+    parser.add_argument('--workers', type=int, default=8, help='並列取得のスレッド数')
+    parser.add_argument('--rate-limit', type=int, default=300, help='モックのレート制限（回数）')
+    parser.add_argument('--rate-window', type=int, default=300, help='モックのレート制限（秒）')
+    args = parser.parse_args()
+
+    print(f"⏱️ ルーム数: {args.rooms} / 応答遅延: {args.latency * 1000:.0f}ms / レート制限: {args.rate_limit}回/{args.rate_window}秒")
+    print("-" * 60)
+
+    for label, workers in (('順番に取得', 1), (f'並列取得（{args.workers}スレッド）', args.workers)):
+        with MockChatworkServer(args.rooms, args.messages, args.latency,
+                                rate_limit=args.rate_limit, rate_window=args.rate_window) as server:
+            elapsed, total, calls, limited = run(server, workers)
+        print(f"{label:<24} {elapsed:7.2f}秒  {args.rooms / elapsed:7.1f}ルーム/秒  "
+              f"{total / elapsed:9.0f}件/秒  API {calls}回  429: {limited}回")
+
+
+if __name__ == '__main__':
+    main()
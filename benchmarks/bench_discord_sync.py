@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ Discordのチャンネル取得のスループット測定
+
+モックサーバー（benchmarks/mock_discord.py）に対して、
+1チャンネルずつ順番にさかのぼった場合と並列にさかのぼった場合の速さを比べます。
+チャンネルごとのレート制限バケットがあるため、並列にするほど待ち時間が重ならずに済みます。
+ネットワークやBotトークンは不要です。
+
+使い方:
+    python benchmarks/bench_discord_sync.py --channels 10 --messages 1000 --latency 0.05 --workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from discord_client import DiscordClient
+from mock_discord import MockDiscordServer
+
+
+def run(server, workers):
+    """全チャンネルをさかのぼって (秒数, メッセージ数, API呼び出し数, 429回数) を返す"""
+    client = DiscordClient('dummy-token', base_url=server.base_url, max_workers=workers)
+    started = time.perf_counter()
+    channels = client.get_text_channels(server.guild_id)
+    total = sum(
+        len(updates[0]) for _, updates in client.iter_channel_updates(channels, {}) if updates
+    )
+    elapsed = time.perf_counter() - started
+    client.close()
+    return elapsed, total, client.api_calls, client.rate_limited
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Discordのチャンネル取得のスループット測定')
+    parser.add_argument('--channels', type=int, default=10)
+    parser.add_argument('--messages', type=int, default=1000, help='チャンネルごとのメッセージ数')
+    parser.add_argument('--latency', type=float, default=0.05, help='モックの応答遅延（秒）')
+    parser.add_argument('--workers', type=int, default=8, help='並列取得のスレッド数')
+    parser.add_argument('--bucket-limit', type=int, default=5, help='バケットあたりの回数')
+    parser.add_argument('--bucket-window', type=float, default=1.0, help='バケットのリセット間隔（秒）')
+    args = parser.parse_args()
+
+    print(f"⏱️ チャンネル数: {args.channels} / 応答遅延: {args.latency * 1000:.0f}ms / "
+          f"レート制限: {args.bucket_limit}回/{args.bucket_window:g}秒（チャンネルごと）")
+    print("-" * 60)
+
+    for label, workers in (('順番に取得', 1), (f'並列取得（{args.workers}スレッド）', args.workers)):
+        with MockDiscordServer(args.channels, args.messages, args.latency,
+                               bucket_limit=args.bucket_limit, bucket_window=args.bucket_window) as server:
+            elapsed, total, calls, limited = run(server, workers)
+        print(f"{label:<24} {elapsed:7.2f}秒  {args.channels / elapsed:7.1f}チャンネル/秒  "
+              f"{total / elapsed:9.0f}件/秒  API {calls}回  429: {limited}回")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ mmapインデックスとSQLiteの検索の応答時間の比較
+
+一時ディレクトリに本番版の列構成のデータベースを作り、同じクエリを
+SQLiteバックエンドとmmapインデックス（backend/mmap_index.py）で検索して比べます。
+インデックスの作成時間・ファイルの大きさ、同期のような追記とまとめ直しの時間も表示します。
+
+使い方:
+    python benchmarks/bench_mmap_index.py --messages 50000 --searches 200
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from bulk_ingest import ensure_upsert_index, upsert_messages
+from db_pool import get_pool
+from mmap_index import MmapIndexBackend
+from search_backend import SQLiteSearchBackend
+from search_index import ensure_fts_index
+
+WORDS = [
+    '会議', '議事録', 'release', 'deploy', 'ビルド', 'レビュー', 'incident', 'デザイン',
+    '明日', '確認', 'customer', '見積もり', 'schedule', '障害', 'migration', '共有',
+]
+QUERIES = ['release', '議事録', 'e', '会議', 'customer migration', '#12345', 'zzz']
+
+
+def make_rows(start, count, rng):
+    return [{
+        'message_id': str(i),
+        'content': ' '.join(rng.choice(WORDS) for _ in range(8)) + f' #{i}',
+        'author': f'user{i % 17}',
+        'channel': f'room-{i % 23}',
+        'timestamp': f'2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00',
+        'url': f'https://example.com/m/{i}',
+    } for i in range(start, start + count)]
+
+
+def create_database(path, messages, rng):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY, platform TEXT, message_id TEXT, content TEXT,
+            author TEXT, channel TEXT, timestamp DATETIME, url TEXT
+        )
+    ''')
+    ensure_fts_index(conn)
+    ensure_upsert_index(conn)
+    upsert_messages(conn, 'chatwork', make_rows(0, messages, rng))
+    conn.commit()
+    conn.close()
+
+
+def measure(backend, query, count_mode, searches):
+    timings = []
+    for _ in range(searches):
+        started = time.perf_counter()
+        backend.search(query, limit=20, count_mode=count_mode)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='mmapインデックスとSQLiteの検索の応答時間の比較')
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--searches', type=int, default=200, help='クエリごとの検索回数')
+    parser.add_argument('--appends', type=int, default=10, help='同期のような追記の回数')
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        create_database(db_path, args.messages, rng)
+        pool = get_pool(db_path)
+        sqlite_backend = SQLiteSearchBackend(pool)
+        mmap_backend = MmapIndexBackend(pool, merge_segments=args.appends + 1)
+
+        started = time.perf_counter()
+        mmap_backend.reindex()
+        print(f"🗂️ インデックス作成: {args.messages}件 {time.perf_counter() - started:.2f}秒 / "
+              f"{os.path.getsize(mmap_backend.path) / 1024 / 1024:.1f}MB")
+        print("-" * 72)
+
+        for count_mode in ('none', 'exact'):
+            for query in QUERIES:
+                sqlite_p50, sqlite_p95 = measure(sqlite_backend, query, count_mode, args.searches)
+                mmap_p50, mmap_p95 = measure(mmap_backend, query, count_mode, args.searches)
+                print(f"count={count_mode:<5} {query:<20} SQLite p50 {sqlite_p50:7.3f}ms p95 {sqlite_p95:7.3f}ms  "
+                      f"mmap p50 {mmap_p50:7.3f}ms p95 {mmap_p95:7.3f}ms")
+
+        # 同期のような少しずつの追記と、まとめ直し
+        print("-" * 72)
+        next_id = args.messages
+        started = time.perf_counter()
+        for _ in range(args.appends):
+            rows = make_rows(next_id, 100, rng)
+            next_id += 100
+            with pool.writer() as conn:
+                result = upsert_messages(conn, 'chatwork', rows)
+            mmap_backend.index_ingested('chatwork', rows, result)
+            mmap_backend.flush()
+        appended = time.perf_counter() - started
+        segments = mmap_backend.stats()['segments']
+        p50, _ = measure(mmap_backend, 'release', 'exact', args.searches)
+        print(f"追記 {args.appends}回: {appended / args.appends * 1000:.1f}ms/回  "
+              f"セグメント {segments}個での検索 p50 {p50:.3f}ms")
+
+        started = time.perf_counter()
+        mmap_backend.merge()
+        merged = time.perf_counter() - started
+        p50, _ = measure(mmap_backend, 'release', 'exact', args.searches)
+        print(f"まとめ直し: {merged:.2f}秒  セグメント {mmap_backend.stats()['segments']}個での検索 p50 {p50:.3f}ms")
+
+        mmap_backend.close()
+        pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
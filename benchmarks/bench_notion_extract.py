@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ Notionページ本文の抽出速度の測定
+
+記録済みのワークスペース（benchmarks/fixtures/notion_workspace.json）を
+モック（benchmarks/mock_notion.py）で返し、次の3つを比べます。
+
+- 従来の方法: blocks.children.list を1回だけ（ページ送り・子ブロックなし）
+- 順番に取得: ページ送り・子ブロックをたどるが、API呼び出しは1本ずつ
+- 並列取得  : NotionBlockExtractor の並列取得
+
+ネットワークやAPIトークンは不要です。
+
+使い方:
+    python benchmarks/bench_notion_extract.py --latency 0.05 --workers 8 --pages 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_notion import FIXTURE_PATH, MockNotionClient
+from notion_extract import NotionBlockExtractor, block_text
+
+
+def run_first_page_only(notion):
+    """従来の方法（1回の呼び出しで返ってきた分だけ）"""
+    started = time.perf_counter()
+    chars = 0
+    for page_id in notion.pages:
+        blocks = notion.blocks.children.list(block_id=page_id).get('results', [])
+        chars += len('\n\n'.join(text for text in map(block_text, blocks) if text))
+    return time.perf_counter() - started, chars
+
+
+def run_extractor(notion, workers, pages):
+    started = time.perf_counter()
+    extractor = NotionBlockExtractor(notion, max_workers=workers)
+    chars = sum(
+        len(text or '')
+        for _, text in extractor.extract_pages(list(notion.pages), max_pages=pages)
+    )
+    extractor.close()
+    return time.perf_counter() - started, chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Notionページ本文の抽出速度の測定')
+    parser.add_argument('--fixture', default=FIXTURE_PATH, help='ワークスペースのフィクスチャ')
+    parser.add_argument('--latency', type=float, default=0.05, help='モックの応答遅延（秒）')
+    parser.add_argument('--workers', type=int, default=8, help='同時に実行するAPI呼び出しの数')
+    parser.add_argument('--pages', type=int, default=4, help='同時に抽出するページ数')
+    args = parser.parse_args()
+
+    probe = MockNotionClient.from_fixture(args.fixture)
+    blocks = sum(len(children) for children in probe.children.values())
+    print(f"⏱️ {len(probe.pages)}ページ / {blocks}ブロック / 応答遅延: {args.latency * 1000:.0f}ms")
+    print("-" * 60)
+
+    runs = (
+        ('従来の方法（1回のみ）', lambda notion: run_first_page_only(notion)),
+        ('順番に取得', lambda notion: run_extractor(notion, 1, 1)),
+        (f'並列取得（{args.workers}並列・{args.pages}ページ同時）',
+         lambda notion: run_extractor(notion, args.workers, args.pages)),
+    )
+    for label, run in runs:
+        notion = MockNotionClient.from_fixture(args.fixture, latency=args.latency)
+        elapsed, chars = run(notion)
+        print(f"{label:<28} {elapsed:7.2f}秒  API {notion.request_count:4d}回  "
+              f"{chars:8d}文字  {len(notion.pages) / elapsed:6.1f}ページ/秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ MeiliSearchバックエンドの送信・検索の測定
+
+モックサーバー（benchmarks/mock_meilisearch.py）に対して、次の3つを測ります。
+MeiliSearch本体やネットワークは不要です。
+
+1. reindex（SQLiteの全メッセージの入れ直し）の速さ・バッチ数・タスク確認の回数
+2. 同期のように少しずつ書き込んだときの送信（index_ingested → まとめて送信 → 反映待ち）
+3. 検索の応答時間（SQLiteバックエンドとの比較、新しい順のカーソルで全ページ読めるか）
+
+使い方:
+    python benchmarks/bench_search_backend.py --messages 20000 --task-delay 0.05
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bulk_ingest import ensure_upsert_index, upsert_messages
+from db_pool import get_pool
+from mock_meilisearch import MockMeiliSearchServer
+from search_backend import MeiliSearchBackend, SQLiteSearchBackend
+from search_index import ensure_fts_index
+
+PHRASES = [
+    'デプロイ完了しました', 'レビューお願いします', 'ビルドが落ちています', '議事録を共有します',
+    'release checklist', 'incident report', '明日の定例について', 'design review notes',
+]
+
+
+def make_rows(start, count):
+    """検索用のメッセージ（本番版の列構成）"""
+    return [{
+        'message_id': str(i),
+        'content': f'{PHRASES[i % len(PHRASES)]} #{i}',
+        'author': f'user{i % 17}',
+        'channel': f'room-{i % 23}',
+        'timestamp': f'2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00',
+        'url': f'https://example.com/m/{i}',
+    } for i in range(start, start + count)]
+
+
+def create_database(path, messages):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY, platform TEXT, message_id TEXT, content TEXT,
+            author TEXT, channel TEXT, timestamp DATETIME, url TEXT
+        )
+    ''')
+    ensure_fts_index(conn)
+    ensure_upsert_index(conn)
+    upsert_messages(conn, 'chatwork', make_rows(0, messages))
+    conn.commit()
+    conn.close()
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MeiliSearchバックエンドの送信・検索の測定')
+    parser.add_argument('--messages', type=int, default=20000, help='最初に入れておくメッセージ数')
+    parser.add_argument('--batches', type=int, default=50, help='同期で書き込む回数')
+    parser.add_argument('--batch-rows', type=int, default=40, help='1回の同期で書き込む件数')
+    parser.add_argument('--task-delay', type=float, default=0.05, help='モックがタスクを処理するまでの時間（秒）')
+    parser.add_argument('--searches', type=int, default=200, help='検索の回数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            MockMeiliSearchServer(task_delay=args.task_delay) as server:
+        db_path = os.path.join(workdir, 'bench.db')
+        create_database(db_path, args.messages)
+        pool = get_pool(db_path)
+        backend = MeiliSearchBackend(pool, host=server.base_url, api_key=server.api_key, push_interval=0.2)
+
+        print(f"⏱️ メッセージ数: {args.messages} / タスク処理の遅延: {args.task_delay * 1000:.0f}ms")
+        print("-" * 60)
+
+        # 1. 入れ直し
+        started = time.perf_counter()
+        count = backend.reindex()
+        elapsed = time.perf_counter() - started
+        print(f"reindex              {elapsed:7.2f}秒  {count / elapsed:9.0f}件/秒  "
+              f"バッチ {len(server.batch_sizes)}回  タスク確認 {server.task_polls}回  "
+              f"ドキュメント {server.document_count(backend.index_uid)}件")
+
+        # 2. 同期のような少しずつの書き込み
+        batches_before, polls_before = len(server.batch_sizes), server.task_polls
+        started = time.perf_counter()
+        next_id = args.messages
+        for _ in range(args.batches):
+            rows = make_rows(next_id, args.batch_rows)
+            next_id += args.batch_rows
+            with pool.writer() as conn:
+                result = upsert_messages(conn, 'chatwork', rows)
+            backend.index_ingested('chatwork', rows, result)
+        enqueued = time.perf_counter() - started
+        backend.flush()
+        elapsed = time.perf_counter() - started
+        pushed = args.batches * args.batch_rows
+        print(f"同期からの送信       {elapsed:7.2f}秒  書き込み側の待ち {enqueued * 1000:.0f}ms  "
+              f"{pushed}件を{len(server.batch_sizes) - batches_before}バッチで送信  "
+              f"タスク確認 {server.task_polls - polls_before}回")
+
+        # 3. 検索の応答時間
+        sqlite_backend = SQLiteSearchBackend(pool)
+        for label, target in (('SQLite', sqlite_backend), ('MeiliSearch(モック)', backend)):
+            timings = []
+            for i in range(args.searches):
+                started = time.perf_counter()
+                target.search(PHRASES[i % len(PHRASES)], limit=20, count_mode='none')
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"検索 {label:<18} p50 {statistics.median(timings):6.2f}ms  "
+                  f"p95 {percentile(timings, 0.95):6.2f}ms")
+
+        # 新しい順のカーソルで全ページ読み、SQLiteと同じ件数・順番になるか確かめる
+        def read_all(target):
+            ids, cursor = [], None
+            while True:
+                page = target.search('release', limit=100, cursor=cursor, count_mode='none')
+                ids.extend(row['id'] for row in page['results'])
+                cursor = page['next_cursor']
+                if not cursor:
+                    return ids
+
+        same = read_all(backend) == read_all(sqlite_backend)
+        print(f"カーソルでの全件読み出し: {'SQLiteと一致' if same else '⚠️ SQLiteと不一致'}")
+        print(f"フォールバック: {backend.fallbacks}回 / エラー: {backend.errors}回")
+
+        backend.close()
+        pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ 検索結果のJSON組み立ての比較（辞書から作る / SQLiteのJSON関数で作る）
+
+一時ディレクトリに本番版の列構成のデータベースを作り、同じ検索について
+1. 行ごとに辞書を作って json.dumps する（SearchBackend.search_json の既定の方法）
+2. SQLiteに1行ずつJSONを作らせてつなげる（SQLiteSearchBackend.search_json）
+の所要時間を limit ごとに比べます。どちらも本文は抜粋と一致位置にします。
+「検索のみ」は行を読むまで（search()）の時間で、差がJSONの組み立てにかかった時間です。
+
+使い方:
+    python benchmarks/bench_search_json.py --messages 50000 --searches 200
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from bulk_ingest import ensure_upsert_index, upsert_messages
+from db_pool import get_pool
+from search_backend import SearchBackend, SQLiteSearchBackend
+from search_index import ensure_fts_index
+
+WORDS = [
+    '会議', '議事録', 'release', 'deploy', 'ビルド', 'レビュー', 'incident', 'デザイン',
+    '明日', '確認', 'customer', '見積もり', 'schedule', '障害', 'migration', '共有',
+]
+# app_production.py の検索APIと同じ項目
+MESSAGE_FIELDS = ('id', 'platform', 'message_id', 'content', 'author', 'channel', 'timestamp', 'url')
+
+
+def make_rows(count, rng):
+    return [{
+        'message_id': str(i),
+        'content': ' '.join(rng.choice(WORDS) for _ in range(rng.choice((8, 40, 400)))),
+        'author': f'user{i % 17}',
+        'channel': f'room-{i % 23}',
+        'timestamp': f'2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00',
+        'url': f'https://example.com/m/{i}',
+    } for i in range(count)]
+
+
+def create_database(path, messages, rng):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY, platform TEXT, message_id TEXT, content TEXT,
+            author TEXT, channel TEXT, timestamp DATETIME, url TEXT
+        )
+    ''')
+    ensure_fts_index(conn)
+    ensure_upsert_index(conn)
+    upsert_messages(conn, 'chatwork', make_rows(messages, rng))
+    conn.commit()
+    conn.close()
+
+
+def measure(targets, searches):
+    """targets を交互に呼んで測る（マシンの負荷の変化がどれか1つに偏らないように）"""
+    timings = [[] for _ in targets]
+    results = [None] * len(targets)
+    for _ in range(searches):
+        for index, target in enumerate(targets):
+            started = time.perf_counter()
+            results[index] = target()
+            timings[index].append((time.perf_counter() - started) * 1000)
+    return [
+        (statistics.median(values), sorted(values)[min(len(values) - 1, int(len(values) * 0.95))], result)
+        for values, result in zip(timings, results)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='検索結果のJSON組み立ての比較')
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--searches', type=int, default=200, help='条件ごとの検索回数')
+    parser.add_argument('--query', default='release')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        create_database(db_path, args.messages, random.Random(0))
+        pool = get_pool(db_path)
+        backend = SQLiteSearchBackend(pool)
+
+        print(f"⏱️ メッセージ数: {args.messages} / クエリ: {args.query}")
+        print("-" * 72)
+        for limit in (50, 500):
+            for full in (False, True):
+                def with_dicts():
+                    return SearchBackend.search_json(backend, args.query, limit=limit, count_mode='none',
+                                                     full=full, fields=MESSAGE_FIELDS)
+
+                def with_json1():
+                    return backend.search_json(args.query, limit=limit, count_mode='none',
+                                               full=full, fields=MESSAGE_FIELDS)
+
+                def search_only():
+                    return backend.search(args.query, limit=limit, count_mode='none')
+
+                (search_p50, _, _), (dict_p50, dict_p95, expected), (json1_p50, json1_p95, found) = measure(
+                    (search_only, with_dicts, with_json1), args.searches
+                )
+                same = json.loads(expected['results_json']) == json.loads(found['results_json'])
+                print(f"limit={limit:<4} full={int(full)}  検索のみ p50 {search_p50:6.2f}ms  "
+                      f"辞書 p50 {dict_p50:6.2f}ms p95 {dict_p95:6.2f}ms  "
+                      f"JSON1 p50 {json1_p50:6.2f}ms p95 {json1_p95:6.2f}ms  "
+                      f"{len(found['results_json'].encode('utf-8')) / 1024:7.1f}KB"
+                      f"{'' if same else '  ⚠️ 結果が不一致'}")
+
+        pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ 検索の応答時間ベンチマーク（コーパスの件数 × アプリの種類 × 検索バックエンド）
+
+合成コーパス（benchmarks/generate_corpus.py）を件数ごとに作り、決まったクエリの組み合わせを
+検索バックエンドで実行して、クエリごとの p50 / p95 / p99 と1秒あたりの検索数を測ります。
+結果はJSONで保存できるので、リリースごとの結果を --compare で比べられます。
+
+アプリの種類（呼び出し方は各アプリの /api/search と同じ）:
+    app        : backend/app.py（init_db.py 版の列構成、件数は exact で数える）
+    production : backend/app_production.py（本番版の列構成、件数は数えない、返す項目を絞る）
+
+検索バックエンド: sqlite / mmap / meilisearch（--meilisearch-host が無ければモックサーバー）
+検索結果キャッシュ・同時検索のまとめは通さず、毎回バックエンドで検索します。
+
+使い方:
+    python benchmarks/bench_search_suite.py --rows 10k,100k --output results.json
+    python benchmarks/bench_search_suite.py --rows 10k,100k --compare results.json
+    python benchmarks/bench_search_suite.py --rows 1m,10m --backends sqlite,mmap --data-dir /var/tmp/corpus
+"""
+
+import argparse
+import json
+import os
+import platform as host_platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db_pool import get_pool
+from generate_corpus import corpus_label, ensure_corpus, parse_rows
+from mmap_index import MmapIndexBackend
+from search_backend import MeiliSearchBackend, SQLiteSearchBackend
+
+# app_production.py の検索APIで返す項目
+MESSAGE_FIELDS = ('id', 'platform', 'message_id', 'content', 'author', 'channel', 'timestamp', 'url')
+
+VARIANTS = {
+    'app': {'schema': 'app', 'count_mode': 'exact', 'fields': None},
+    'production': {'schema': 'production', 'count_mode': 'none', 'fields': MESSAGE_FIELDS},
+}
+BACKENDS = ('sqlite', 'mmap', 'meilisearch')
+
+# 🔎 クエリの組み合わせ（q が複数あれば順番に使う）
+QUERY_MIX = [
+    {'name': 'short_kana', 'q': ['よろ', 'です']},
+    {'name': 'long_phrase', 'q': ['来週の定例ミーティングの議題', 'スケジュールを調整させてください']},
+    {'name': 'ascii', 'q': ['deploy', 'review', 'PR']},
+    {'name': 'mixed', 'q': ['API 仕様', 'CI が落ちてる']},
+    {'name': 'platform_notion', 'q': ['議事録', '決定事項'], 'platform': 'notion'},
+    {'name': 'platform_discord', 'q': ['release', 'ビルド'], 'platform': 'discord'},
+    {'name': 'relevance', 'q': ['リリース', '障害報告'], 'sort': 'relevance'},
+    {'name': 'deep_offset', 'q': ['確認'], 'offset': 1000},
+    {'name': 'deep_cursor', 'q': ['確認'], 'page': 50},
+    {'name': 'no_hit', 'q': ['zzqqxx']},
+]
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def summarize(timings, rows):
+    """応答時間（ミリ秒）の一覧から集計値を作る"""
+    return {
+        'runs': len(timings),
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'qps': round(len(timings) / (sum(timings) / 1000), 1) if sum(timings) else None,
+        'rows': round(statistics.mean(rows), 1),
+    }
+
+
+def page_cursor(backend, query, limit, page, options):
+    """page ページ目を読むためのカーソル（前のページを順に読んで作る）"""
+    cursor = None
+    for _ in range(page - 1):
+        cursor = backend.search_json(query, limit=limit, cursor=cursor, count_mode='none', **options)['next_cursor']
+        if not cursor:
+            return None
+    return cursor
+
+
+def run_query_mix(backend, variant, iterations, limit, warmup):
+    """クエリの組み合わせを実行して、クエリごとの集計を返す"""
+    settings = VARIANTS[variant]
+    results = {}
+    all_timings = []
+
+    for entry in QUERY_MIX:
+        options = {'platform': entry.get('platform'), 'sort': entry.get('sort', 'recent')}
+        calls = []
+        for query in entry['q']:
+            arguments = dict(options, offset=entry.get('offset', 0))
+            if entry.get('page'):
+                arguments['cursor'] = page_cursor(backend, query, limit, entry['page'], options)
+            calls.append((query, arguments))
+
+        timings, rows = [], []
+        for index in range(warmup + iterations):
+            query, arguments = calls[index % len(calls)]
+            started = time.perf_counter()
+            found = backend.search_json(query, limit=limit, count_mode=settings['count_mode'],
+                                        fields=settings['fields'], **arguments)
+            elapsed = (time.perf_counter() - started) * 1000
+            if index >= warmup:
+                timings.append(elapsed)
+                rows.append(found['count'])
+        results[entry['name']] = summarize(timings, rows)
+        all_timings.extend(timings)
+
+    overall = summarize(all_timings, [0])
+    overall.pop('rows')
+    return results, overall
+
+
+def open_backend(name, pool, variant, meilisearch_host, mock_server):
+    """検索バックエンドを用意して (バックエンド, 準備にかかった秒数) を返す"""
+    started = time.perf_counter()
+    if name == 'sqlite':
+        return SQLiteSearchBackend(pool), 0.0
+
+    if name == 'mmap':
+        # 前回のインデックスは使わず、毎回作る
+        path = pool.db_path + f'.{variant}.msgidx'
+        if os.path.exists(path):
+            os.remove(path)
+        backend = MmapIndexBackend(pool, path=path)
+        while backend.snapshot() is None:
+            time.sleep(0.05)
+        return backend, time.perf_counter() - started
+
+    host, api_key = (meilisearch_host, os.getenv('MEILISEARCH_MASTER_KEY')) if meilisearch_host \
+        else (mock_server.base_url, mock_server.api_key)
+    backend = MeiliSearchBackend(pool, host=host, api_key=api_key, index_uid=f'bench_{variant}')
+    backend.reindex(clear=True)
+    return backend, time.perf_counter() - started
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(previous, current):
+    """前回の結果と p50 / p95 を比べて表示する"""
+    print("-" * 72)
+    print("📊 前回との比較（p50 / p95、1.00より小さいほど速くなった）")
+    for size, variants in current['results'].items():
+        for variant, backends in variants.items():
+            for backend, result in backends.items():
+                before = previous.get('results', {}).get(size, {}).get(variant, {}).get(backend)
+                if not before:
+                    continue
+                for name, now in result['queries'].items():
+                    old = before['queries'].get(name)
+                    if not old or not old['p50_ms'] or not old['p95_ms']:
+                        continue
+                    p50 = now['p50_ms'] / old['p50_ms']
+                    p95 = now['p95_ms'] / old['p95_ms']
+                    mark = '⚠️' if p50 > 1.2 else ('✨' if p50 < 0.8 else '  ')
+                    print(f"{mark} {size:>4} {variant:<10} {backend:<11} {name:<17} "
+                          f"p50 {old['p50_ms']:8.2f} → {now['p50_ms']:8.2f}ms ({p50:4.2f})  p95 ({p95:4.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='検索の応答時間ベンチマーク')
+    parser.add_argument('--rows', default='10k,100k', help='コーパスの件数（カンマ区切り。10k / 100k / 1m / 10m）')
+    parser.add_argument('--variants', default='app,production', help=f'アプリの種類（{", ".join(VARIANTS)}）')
+    parser.add_argument('--backends', default='sqlite,mmap', help=f'検索バックエンド（{", ".join(BACKENDS)}）')
+    parser.add_argument('--iterations', type=int, default=50, help='クエリごとの計測回数')
+    parser.add_argument('--warmup', type=int, default=3, help='計測前に捨てる回数')
+    parser.add_argument('--limit', type=int, default=20, help='1ページの件数')
+    parser.add_argument('--seed', type=int, default=0, help='コーパスの乱数の種')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'search-bench-corpus'),
+                        help='コーパスの置き場所（同じ件数・種なら作り直さない）')
+    parser.add_argument('--meilisearch-host', default=None, help='実際のMeiliSearch（省略するとモックサーバー）')
+    parser.add_argument('--output', help='結果のJSONの保存先')
+    parser.add_argument('--compare', help='比べる前回の結果のJSON')
+    args = parser.parse_args()
+
+    sizes = [parse_rows(value) for value in args.rows.split(',') if value.strip()]
+    variants = [value.strip() for value in args.variants.split(',') if value.strip()]
+    backends = [value.strip() for value in args.backends.split(',') if value.strip()]
+    for value in variants:
+        if value not in VARIANTS:
+            parser.error(f'不明なアプリの種類です: {value}')
+    for value in backends:
+        if value not in BACKENDS:
+            parser.error(f'不明な検索バックエンドです: {value}')
+
+    report = {
+        'meta': {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': host_platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': f'{host_platform.system()} {host_platform.machine()}',
+            'iterations': args.iterations,
+            'limit': args.limit,
+            'seed': args.seed,
+            'meilisearch': 'mock' if 'meilisearch' in backends and not args.meilisearch_host else args.meilisearch_host,
+        },
+        'results': {},
+    }
+
+    mock_server = None
+    if 'meilisearch' in backends and not args.meilisearch_host:
+        from mock_meilisearch import MockMeiliSearchServer
+        mock_server = MockMeiliSearchServer(task_delay=0.0).start()
+
+    try:
+        for rows in sizes:
+            size = corpus_label(rows)
+            for variant in variants:
+                path = ensure_corpus(args.data_dir, rows, VARIANTS[variant]['schema'], args.seed)
+                pool = get_pool(path)
+                for name in backends:
+                    backend, setup_seconds = open_backend(name, pool, variant, args.meilisearch_host, mock_server)
+                    try:
+                        queries, overall = run_query_mix(backend, variant, args.iterations, args.limit, args.warmup)
+                    finally:
+                        backend.close()
+                    report['results'].setdefault(size, {}).setdefault(variant, {})[name] = {
+                        'setup_seconds': round(setup_seconds, 2),
+                        'overall': overall,
+                        'queries': queries,
+                    }
+
+                    print("-" * 72)
+                    print(f"📦 {size}件 / {variant} / {name}"
+                          f"{f'（準備 {setup_seconds:.1f}秒）' if setup_seconds else ''}  "
+                          f"全体 p50 {overall['p50_ms']:.2f}ms p99 {overall['p99_ms']:.2f}ms {overall['qps']}件/秒")
+                    for query_name, result in queries.items():
+                        print(f"   {query_name:<17} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+                              f"p99 {result['p99_ms']:8.2f}ms  {result['qps']:>8}件/秒  {result['rows']:>5}行")
+                pool.close_all()
+    finally:
+        if mock_server:
+            mock_server.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"💾 結果を保存しました: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏭 検索ベンチマーク用のメッセージデータ（合成コーパス）の作成
+
+Chatwork・Notion・Discordらしい日本語と英語の混ざったメッセージを、
+指定した件数だけ messages テーブルに入れたデータベースを作ります。
+乱数の種が同じなら、何度作っても同じ内容になります（リリース間で結果を比べられるように）。
+
+- Chatwork: [To:] 付きの業務連絡、[info] のお知らせ、短い返事
+- Notion  : タイトル付きの議事録・仕様書（見出し・箇条書きのある長めの本文）
+- Discord : 英語まじりの短い雑談、PR・デプロイの連絡、コード片、絵文字
+
+列構成は2種類から選べます。
+    app        : database/init_db.py 版（platform_id / title / author_name / channel_name / created_at）
+    production : backend/app_production.py 版（message_id / author / channel / timestamp / url）
+
+使い方:
+    python benchmarks/generate_corpus.py --rows 100k --schema app --output /tmp/corpus.db
+    （件数は 10k / 100k / 1m / 10m のように k・m を付けて指定できます）
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from bulk_ingest import ensure_upsert_index
+from message_counters import ensure_message_counters
+from pagination import ensure_pagination_indexes
+from search_cache import ensure_data_generation
+from search_index import ensure_fts_index
+
+SCHEMAS = ('app', 'production')
+PLATFORM_SHARES = (('chatwork', 0.5), ('discord', 0.35), ('notion', 0.15))
+INSERT_BATCH = 10000
+# メッセージの日時の範囲（この日から遡って2年分）
+LATEST_TIME = datetime(2025, 6, 30, 18, 0, 0)
+SPAN_SECONDS = 2 * 365 * 24 * 3600
+
+SCHEMA_SQL = {
+    'app': '''
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            platform TEXT NOT NULL,
+            platform_id TEXT NOT NULL,
+            title TEXT,
+            content TEXT NOT NULL,
+            author_name TEXT,
+            author_id TEXT,
+            channel_name TEXT,
+            channel_id TEXT,
+            created_at DATETIME,
+            updated_at DATETIME,
+            synchronized_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            is_deleted INTEGER DEFAULT 0,
+            metadata TEXT,
+            UNIQUE(platform, platform_id)
+        )
+    ''',
+    'production': '''
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY,
+            platform TEXT,
+            message_id TEXT,
+            content TEXT,
+            author TEXT,
+            channel TEXT,
+            timestamp DATETIME,
+            url TEXT
+        )
+    ''',
+}
+
+# 📚 語彙
+PEOPLE = [
+    '佐藤', '鈴木', '高橋', '田中', '伊藤', '渡辺', '山本', '中村', '小林', '加藤',
+    '吉田', '山田', '佐々木', '松本', '井上', 'Alex', 'Emily', 'Ken', 'Yuki', 'Chris',
+]
+HANDLES = ['taro', 'hanako', 'kenji', 'yuki_dev', 'sakura', 'ops-bot', 'mika', 'ryo', 'alex', 'emily']
+ROOMS = [
+    '営業部', '開発チーム', '全社連絡', 'デザイン', 'カスタマーサポート', '経理・総務',
+    'プロジェクトA', 'プロジェクトB', '採用', 'マーケティング',
+]
+DISCORD_CHANNELS = ['general', 'dev', 'random', 'release', 'infra', 'frontend', 'backend', 'qa']
+NOTION_SPACES = ['プロダクト', '開発', '営業', '人事', 'デザイン', 'Engineering Wiki']
+TOPICS = [
+    'リリース', '見積もり', '議事録', '請求書', 'API 仕様', 'デザイン案', '来週の定例ミーティングの議題',
+    '顧客対応', '障害報告', 'セキュリティ診断', '新機能', 'ロードマップ', 'データ移行', '採用面接',
+    'キャンペーン', 'サーバー増強', 'ログイン不具合', '検索機能', 'dashboard', 'onboarding',
+]
+GREETINGS = [
+    'お疲れ様です', 'おはようございます', 'お世話になっております', '失礼します', 'こんにちは',
+]
+ACTIONS = [
+    'ご確認をお願いします', '資料を共有します', '修正版をアップしました', '本日中に対応します',
+    '先方から返信がありました', 'スケジュールを調整させてください', 'レビューお願いします',
+    '問題なさそうです', '少し遅れそうです', '明日の午前中に確認します',
+]
+CLOSINGS = ['よろしくお願いします。', '以上です。', 'ありがとうございます！', '引き続きよろしくお願いいたします。', '']
+REPLIES = ['了解です！', '承知しました。', 'ありがとうございます！', '確認しました', 'OKです', 'よろしくお願いします']
+NOTION_KINDS = ['議事録', '仕様書', '設計メモ', '振り返り', '手順書', '企画書']
+NOTION_HEADINGS = ['背景', '目的', '決定事項', 'TODO', '課題', '次回までに', 'Overview', 'Next steps']
+DISCORD_LINES = [
+    'deploy done 🚀', 'PR #{n} review お願いします', 'lol', 'bug in staging? 500 返ってくる',
+    'CI が落ちてる…', 'LGTM 👍', 'merged!', 'hotfix 入れました', 'ちょっと見てみます',
+    'anyone seen this error? `TypeError: undefined is not a function`', 'release notes 書きました',
+    'npm run build が通らない', 'ビルド直りました 🎉', 'meeting 5分遅れます 🙏', 'おつかれさまです〜',
+    'docker compose up で動くようになった', 'レビューありがとうございます！', 'rollback しました',
+]
+CODE_LINES = [
+    '```\ngit rebase -i main\n```', '```python\nprint("hello")\n```', '`SELECT * FROM messages LIMIT 10`',
+    '```\nkubectl get pods -n prod\n```',
+]
+
+
+def parse_rows(value):
+    """'100k' や '1m' を件数に変える"""
+    value = str(value).strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    return int(float(value[:-1] if scale > 1 else value) * scale)
+
+
+def corpus_label(rows):
+    """件数の短い表記（10000 → 10k）"""
+    if rows % 1000000 == 0:
+        return f'{rows // 1000000}m'
+    if rows % 1000 == 0:
+        return f'{rows // 1000}k'
+    return str(rows)
+
+
+def chatwork_message(rng):
+    topic = rng.choice(TOPICS)
+    kind = rng.random()
+    if kind < 0.25:
+        return None, rng.choice(REPLIES)
+    if kind < 0.35:
+        return None, (f"[info][title]{topic}のお知らせ[/title]"
+                      f"{rng.choice(GREETINGS)}。{topic}について、{rng.choice(ACTIONS)}。\n"
+                      f"期限: {rng.randint(1, 12)}月{rng.randint(1, 28)}日[/info]")
+    mention = f"[To:{rng.randint(100000, 999999)}]{rng.choice(PEOPLE)}さん\n" if rng.random() < 0.6 else ''
+    return None, (f"{mention}{rng.choice(GREETINGS)}。{topic}の件、{rng.choice(ACTIONS)}。"
+                  f"{rng.choice(CLOSINGS)}")
+
+
+def notion_message(rng):
+    topic = rng.choice(TOPICS)
+    title = f"{topic} {rng.choice(NOTION_KINDS)} {rng.randint(2023, 2025)}-{rng.randint(1, 12):02d}"
+    lines = []
+    for heading in rng.sample(NOTION_HEADINGS, rng.randint(2, 5)):
+        lines.append(f'## {heading}')
+        for _ in range(rng.randint(2, 8)):
+            lines.append(f"- {rng.choice(TOPICS)}: {rng.choice(ACTIONS)}（{rng.choice(PEOPLE)}）")
+        if rng.random() < 0.4:
+            lines.append(f"{topic}は{rng.choice(['予定どおり', '一部遅れて', '前倒しで'])}進めます。"
+                         f"詳細は {rng.choice(HANDLES)} に確認してください。")
+    return title, '\n'.join(lines)
+
+
+def discord_message(rng):
+    parts = [rng.choice(DISCORD_LINES).format(n=rng.randint(100, 9999))]
+    if rng.random() < 0.15:
+        parts.append(rng.choice(CODE_LINES))
+    if rng.random() < 0.2:
+        parts.append(f"{rng.choice(TOPICS)} の件どうなりました？")
+    return None, ' '.join(parts)
+
+
+MAKERS = {'chatwork': chatwork_message, 'notion': notion_message, 'discord': discord_message}
+
+
+def generate_messages(rows, seed=0):
+    """(platform, 番号, タイトル, 本文, 発信者, チャンネル, 日時) を古い順に作る"""
+    rng = random.Random(seed)
+    platforms = [name for name, _ in PLATFORM_SHARES]
+    weights = [share for _, share in PLATFORM_SHARES]
+    step = SPAN_SECONDS / max(rows, 1)
+    started = LATEST_TIME - timedelta(seconds=SPAN_SECONDS)
+
+    for number in range(rows):
+        platform = rng.choices(platforms, weights)[0]
+        title, content = MAKERS[platform](rng)
+        if platform == 'chatwork':
+            author, channel = rng.choice(PEOPLE), rng.choice(ROOMS)
+        elif platform == 'discord':
+            author, channel = rng.choice(HANDLES), rng.choice(DISCORD_CHANNELS)
+        else:
+            author, channel = rng.choice(PEOPLE), rng.choice(NOTION_SPACES)
+        # 古い順に並ぶ日時（少しだけ前後する）
+        moment = started + timedelta(seconds=number * step + rng.uniform(0, step))
+        yield platform, number, title, content, author, channel, moment.isoformat(timespec='seconds')
+
+
+def create_corpus(path, rows, schema='app', seed=0):
+    """コーパスのデータベースを作る（作りかけのファイルを残さないよう、一時ファイルに作ってから置き換える）"""
+    if schema not in SCHEMAS:
+        raise ValueError(f'schemaは {" / ".join(SCHEMAS)} のいずれかを指定してください')
+
+    temporary = path + '.tmp'
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    conn = sqlite3.connect(temporary)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute(SCHEMA_SQL[schema])
+
+    if schema == 'app':
+        sql = '''
+            INSERT INTO messages (platform, platform_id, title, content, author_name, author_id,
+                                  channel_name, channel_id, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+
+        def to_row(platform, number, title, content, author, channel, moment):
+            return (platform, str(number), title, content, author, author, channel, channel, moment, moment)
+    else:
+        sql = '''
+            INSERT INTO messages (platform, message_id, content, author, channel, timestamp, url)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        '''
+
+        def to_row(platform, number, title, content, author, channel, moment):
+            if title:
+                content = f'{title}\n{content}'
+            return (platform, str(number), content, author, channel, moment,
+                    f'https://example.com/{platform}/{number}')
+
+    batch = []
+    for message in generate_messages(rows, seed):
+        batch.append(to_row(*message))
+        if len(batch) >= INSERT_BATCH:
+            conn.executemany(sql, batch)
+            batch.clear()
+    if batch:
+        conn.executemany(sql, batch)
+    conn.commit()
+
+    # インデックスは入れ終わってから作る（1件ずつトリガーで入れるより速い）
+    if schema == 'app':
+        conn.execute('CREATE INDEX idx_messages_platform ON messages(platform)')
+        conn.execute('CREATE INDEX idx_messages_created_at ON messages(created_at)')
+    else:
+        ensure_upsert_index(conn)
+    ensure_fts_index(conn)
+    ensure_message_counters(conn)
+    ensure_pagination_indexes(conn)
+    ensure_data_generation(conn)
+    conn.commit()
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.close()
+    os.replace(temporary, path)
+    return path
+
+
+def corpus_path(data_dir, rows, schema='app', seed=0):
+    """コーパスの置き場所（同じ条件なら作り直さずに使い回す）"""
+    return os.path.join(data_dir, f'corpus-{schema}-{corpus_label(rows)}-seed{seed}.db')
+
+
+def ensure_corpus(data_dir, rows, schema='app', seed=0):
+    """コーパスが無ければ作って、そのパスを返す"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = corpus_path(data_dir, rows, schema, seed)
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        print(f"🏭 コーパスを作成しています: {schema} {corpus_label(rows)}件 → {path}")
+        create_corpus(path, rows, schema, seed)
+        print(f"   {time.perf_counter() - started:.1f}秒 / {os.path.getsize(path) / 1024 / 1024:.1f}MB")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='検索ベンチマーク用の合成コーパスを作成')
+    parser.add_argument('--rows', default='10k', help='件数（10k / 100k / 1m / 10m など）')
+    parser.add_argument('--schema', choices=SCHEMAS, default='app')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', required=True, help='作成するデータベースファイル')
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        print(f"❌ すでにファイルがあります: {args.output}")
+        sys.exit(1)
+
+    rows = parse_rows(args.rows)
+    started = time.perf_counter()
+    create_corpus(args.output, rows, args.schema, args.seed)
+    print(f"✅ {rows}件のコーパスを作成しました: {args.output} "
+          f"（{time.perf_counter() - started:.1f}秒 / {os.path.getsize(args.output) / 1024 / 1024:.1f}MB）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🚦 本番版アプリの負荷試験（どの同時接続数で /api/search・/api/stats・/api/sync/status が頭打ちになるか）
+
+仮想ユーザーを同時接続数ごとに一定時間動かし、エンドポイントごとに
+応答時間のヒストグラム・p50 / p95 / p99・1秒あたりの件数・エラー率と、
+SQLiteの busy / locked（"database is locked" などのエラー）の回数を記録します。
+
+仮想ユーザーの動き:
+1. ページを開いて GET /api/stats
+2. 検索語を1文字ずつ入力する。入力が --debounce-ms（既定500ミリ秒）止まったら、
+   その時点の入力で GET /api/search（入力中の検索のデバウンスを想定）
+3. 入力し終えたら Enter で GET /api/search（frontend/index_fixed.html と同じ）
+4. 結果を読んでから次の検索へ。ときどき絞り込み（platform）を変えて検索し直す
+5. --status-interval 秒ごとに GET /api/sync/status（同期状況の確認）
+--debounce-ms 0 なら入力中は検索せず、Enter のときだけ検索します。
+--speed で待ち時間を縮めると、少ないスレッドで多くの利用者の負荷を作れます。
+
+アプリの動かし方:
+- 既定: 合成コーパス（benchmarks/generate_corpus.py）の複製を DATABASE_PATH にして
+  app_production をこのプロセス内で起動する（定期同期は止める）
+- --url: 起動済みのアプリ（例: http://127.0.0.1:8000）に対して実行する
+
+--with-sync: 同時接続数ごとに「同期なし」と「同期しながら」の2回を測り、読み取りと書き込みの干渉を比べます。
+- プロセス内: Chatwork APIモック（benchmarks/mock_chatwork.py）にメッセージを足しながら
+  sync_chatwork_data() を繰り返す
+- --url: POST /api/sync でジョブを始め、完了したらまた始める
+
+使い方:
+    python benchmarks/load_test.py --concurrency 1,4,16,64 --duration 30
+    python benchmarks/load_test.py --rows 1m --with-sync --speed 5 --output load.json
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --concurrency 8,32 --with-sync
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform as host_platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCHMARKS_DIR, '..', 'backend'))
+sys.path.append(BENCHMARKS_DIR)
+
+from generate_corpus import corpus_label, ensure_corpus, parse_rows
+
+ENDPOINTS = ('/api/search', '/api/stats', '/api/sync/status')
+# ヒストグラムの区切り（ミリ秒、最後は上限なし）
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+REQUEST_TIMEOUT = 30
+
+# ⌨️ 入力する検索語（合成コーパスに出てくる言葉）
+QUERIES = [
+    'よろしく', '確認お願いします', '来週の定例ミーティングの議題', 'スケジュールを調整',
+    'deploy', 'review', 'PR', 'API 仕様', 'CI が落ちてる', '議事録', '決定事項',
+    'release', 'ビルド', 'リリース', '障害報告', '見積もり', 'デザイン',
+]
+PLATFORMS = (None, None, None, 'chatwork', 'notion', 'discord')
+LIMITS = (20, 20, 50, 100)
+
+# 人の操作の間隔（秒。--speed で割る）
+KEY_INTERVAL = (0.12, 0.05)      # 打鍵の間隔（平均, 標準偏差）
+PAUSE_PROBABILITY = 0.15         # 入力の途中で手が止まる確率
+PAUSE_SECONDS = (0.4, 1.5)       # 手が止まる長さ
+ENTER_DELAY = (0.1, 0.4)         # 入力し終えてからEnterまで
+READ_SECONDS = (2.0, 8.0)        # 結果を読む時間
+REFINE_PROBABILITY = 0.2         # 絞り込みを変えて検索し直す確率
+
+
+def is_busy_error(message):
+    """SQLiteのロック待ちが原因のエラーか"""
+    message = (message or '').lower()
+    return 'locked' in message or 'busy' in message
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+class EndpointStats:
+    """1つのエンドポイントの記録"""
+
+    def __init__(self):
+        self.timings = []
+        self.errors = 0
+        self.busy = 0
+        self.error_samples = []
+
+    def summary(self, seconds):
+        count = len(self.timings)
+        histogram = {f'le_{bucket}ms': 0 for bucket in BUCKETS_MS}
+        histogram['inf'] = 0
+        for elapsed in self.timings:
+            for bucket in BUCKETS_MS:
+                if elapsed <= bucket:
+                    histogram[f'le_{bucket}ms'] += 1
+                    break
+            else:
+                histogram['inf'] += 1
+        return {
+            'requests': count,
+            'errors': self.errors,
+            'error_rate': round(self.errors / count, 4) if count else None,
+            'busy_locked': self.busy,
+            'rps': round(count / seconds, 1) if seconds else None,
+            'p50_ms': round(statistics.median(self.timings), 2) if count else None,
+            'p95_ms': round(percentile(self.timings, 0.95), 2) if count else None,
+            'p99_ms': round(percentile(self.timings, 0.99), 2) if count else None,
+            'max_ms': round(max(self.timings), 2) if count else None,
+            'histogram': histogram,
+            'error_samples': self.error_samples,
+        }
+
+
+class Recorder:
+    """仮想ユーザーのリクエストをエンドポイントごとに記録する"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {endpoint: EndpointStats() for endpoint in ENDPOINTS}
+
+    def record(self, endpoint, elapsed_ms, error=None):
+        with self.lock:
+            stats = self.endpoints[endpoint]
+            stats.timings.append(elapsed_ms)
+            if error is not None:
+                stats.errors += 1
+                if is_busy_error(error):
+                    stats.busy += 1
+                if len(stats.error_samples) < 5 and error not in stats.error_samples:
+                    stats.error_samples.append(error)
+
+
+class VirtualUser(threading.Thread):
+    """キー入力から検索する利用者1人"""
+
+    def __init__(self, base_url, recorder, stop, rng, debounce, speed, status_interval):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.recorder = recorder
+        self.stop = stop
+        self.rng = rng
+        self.debounce = debounce
+        self.speed = speed
+        self.status_interval = status_interval
+        self.session = requests.Session()
+        self.next_status = 0.0
+
+    def wait(self, seconds):
+        """人の操作の待ち時間（止める合図が来たら True）"""
+        return self.stop.wait(max(0.0, seconds) / self.speed)
+
+    def call(self, endpoint, params=None):
+        """GETして応答時間とエラーを記録する"""
+        started = time.perf_counter()
+        error = None
+        try:
+            response = self.session.get(self.base_url + endpoint, params=params, timeout=REQUEST_TIMEOUT)
+            if response.status_code >= 400:
+                error = f'HTTP {response.status_code}'
+            body = response.json()
+            # アプリのエラーはHTTP 200の本文（success=False / error）で返る
+            if body.get('success') is False or body.get('error'):
+                error = str(body.get('error') or 'success=false')
+        except (requests.RequestException, ValueError) as e:
+            error = f'{type(e).__name__}: {e}'
+        self.recorder.record(endpoint, (time.perf_counter() - started) * 1000, error)
+
+    def search(self, text, platform, limit):
+        params = {'q': text, 'limit': limit}
+        if platform:
+            params['platform'] = platform
+        self.call('/api/search', params)
+
+    def poll_status(self):
+        if self.status_interval and time.monotonic() >= self.next_status:
+            self.next_status = time.monotonic() + self.status_interval / self.speed
+            self.call('/api/sync/status')
+
+    def type_query(self, query, platform, limit):
+        """1文字ずつ入力し、入力が止まったらデバウンス後に検索、最後にEnterで検索"""
+        for position in range(1, len(query) + 1):
+            if position == len(query):
+                gap = self.rng.uniform(*ENTER_DELAY)
+            elif self.rng.random() < PAUSE_PROBABILITY:
+                gap = self.rng.uniform(*PAUSE_SECONDS)
+            else:
+                gap = max(0.03, self.rng.gauss(*KEY_INTERVAL))
+
+            text = query[:position].strip()
+            if self.debounce and gap >= self.debounce and text:
+                if self.wait(self.debounce):
+                    return False
+                started = time.perf_counter()
+                self.search(text, platform, limit)
+                gap -= self.debounce + (time.perf_counter() - started) * self.speed
+            if self.wait(gap):
+                return False
+
+        # Enter（入力中の検索と同じ文字列でも、Enterでもう一度検索される）
+        self.search(query, platform, limit)
+        return True
+
+    def run(self):
+        # ページを開いたとき、開始時刻をずらしてから統計情報を読む
+        if self.wait(self.rng.uniform(0, 1)):
+            return
+        self.call('/api/stats')
+        self.next_status = time.monotonic() + self.rng.uniform(0, self.status_interval or 0) / self.speed
+
+        platform, limit = None, LIMITS[0]
+        while not self.stop.is_set():
+            query = self.rng.choice(QUERIES)
+            if not self.type_query(query, platform, limit):
+                return
+            self.poll_status()
+            if self.wait(self.rng.uniform(*READ_SECONDS)):
+                return
+
+            # 絞り込みや件数を変えて同じ検索語で検索し直す
+            if self.rng.random() < REFINE_PROBABILITY:
+                platform, limit = self.rng.choice(PLATFORMS), self.rng.choice(LIMITS)
+                self.search(query, platform, limit)
+                if self.wait(self.rng.uniform(*READ_SECONDS)):
+                    return
+            self.poll_status()
+        self.session.close()
+
+
+class SyncDriver(threading.Thread):
+    """測定中に同期を繰り返して書き込みを起こす"""
+
+    def __init__(self, stop, run_once):
+        super().__init__(daemon=True)
+        self.stop = stop
+        self.run_once = run_once
+        self.runs = 0
+        self.rows = 0
+        self.errors = 0
+        self.busy = 0
+        self.seconds = 0.0
+        self.error_samples = []
+
+    def run(self):
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            try:
+                self.rows += self.run_once() or 0
+                self.runs += 1
+            except Exception as e:
+                self.errors += 1
+                if is_busy_error(str(e)):
+                    self.busy += 1
+                if len(self.error_samples) < 5:
+                    self.error_samples.append(str(e))
+                self.stop.wait(1)
+            self.seconds += time.perf_counter() - started
+
+    def summary(self):
+        return {
+            'runs': self.runs,
+            'rows': self.rows,
+            'rows_per_second': round(self.rows / self.seconds, 1) if self.seconds else None,
+            'errors': self.errors,
+            'busy_locked': self.busy,
+            'error_samples': self.error_samples,
+        }
+
+
+class InProcessApp:
+    """合成コーパスの複製で app_production をこのプロセス内に起動する"""
+
+    def __init__(self, corpus, workdir, with_sync, sync_rooms, sync_batch):
+        self.db_path = os.path.join(workdir, 'integrated_search.db')
+        shutil.copyfile(corpus, self.db_path)
+        self.sync_batch = sync_batch
+        self.mock = None
+
+        os.environ['DATABASE_PATH'] = self.db_path
+        os.environ['SYNC_SCHEDULER'] = 'off'
+        if with_sync:
+            from mock_chatwork import MockChatworkServer
+            # レート制限で同期が止まらないようにして、書き込みの干渉だけを見る
+            self.mock = MockChatworkServer(rooms=sync_rooms, messages_per_room=0, rate_limit=10 ** 9).start()
+            os.environ['CHATWORK_API_TOKEN'] = 'load-test'
+            os.environ['CHATWORK_API_BASE'] = self.mock.base_url
+
+        import app_production
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass  # 負荷試験中はアクセスログを出さない
+
+        self.app = app_production
+        with contextlib.redirect_stdout(io.StringIO()):
+            app_production.init_database()
+        self.server = make_server('127.0.0.1', 0, app_production.app, threaded=True, request_handler=QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def sync_once(self):
+        """全ルームにメッセージを足して、Chatworkの差分同期を1回行う（保存した件数を返す）"""
+        for room in self.mock.rooms:
+            self.mock.add_messages(room['room_id'], self.sync_batch)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.app.sync_chatwork_data()
+
+    def close(self):
+        self.server.shutdown()
+        if self.mock:
+            self.mock.stop()
+        self.app.db_pool.close_all()
+
+
+def remote_sync_once(base_url):
+    """POST /api/sync のジョブを始めて完了まで待つ（保存した件数を返す）"""
+    session = requests.Session()
+    try:
+        job = session.post(f'{base_url}/api/sync', timeout=REQUEST_TIMEOUT).json()
+        while True:
+            time.sleep(0.5)
+            job = session.get(f"{base_url}{job['status_url']}", timeout=REQUEST_TIMEOUT).json()
+            if job['status'] == 'failed':
+                raise RuntimeError(json.dumps(job, ensure_ascii=False))
+            if job['status'] == 'completed':
+                return sum(progress['rows_written'] for progress in job['platforms'].values())
+    finally:
+        session.close()
+
+
+def run_level(base_url, users, duration, args, sync_once=None, seed=0):
+    """同時接続数 users で duration 秒動かして記録を集める"""
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [
+        VirtualUser(base_url, recorder, stop, random.Random(seed * 100003 + index),
+                    args.debounce_ms / 1000, args.speed, args.status_interval)
+        for index in range(users)
+    ]
+    sync = SyncDriver(stop, sync_once) if sync_once else None
+
+    if sync:
+        sync.start()
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join(REQUEST_TIMEOUT)
+    if sync:
+        sync.join(REQUEST_TIMEOUT)
+    seconds = time.perf_counter() - started
+
+    result = {
+        'users': users,
+        'seconds': round(seconds, 2),
+        'endpoints': {endpoint: stats.summary(seconds) for endpoint, stats in recorder.endpoints.items()},
+    }
+    if sync:
+        result['sync'] = sync.summary()
+    return result
+
+
+def print_level(label, result):
+    print("-" * 72)
+    sync = result.get('sync')
+    print(f"👥 同時接続数 {result['users']} / {label}"
+          + (f"  （同期 {sync['runs']}回・{sync['rows']}件・{sync['rows_per_second']}件/秒"
+             f"・エラー {sync['errors']}・busy/locked {sync['busy_locked']}）" if sync else ''))
+    for endpoint, stats in result['endpoints'].items():
+        if not stats['requests']:
+            print(f"   {endpoint:<17} リクエストなし")
+            continue
+        print(f"   {endpoint:<17} {stats['requests']:>6}件 {stats['rps']:>7}件/秒  "
+              f"p50 {stats['p50_ms']:8.2f}ms  p95 {stats['p95_ms']:8.2f}ms  p99 {stats['p99_ms']:8.2f}ms  "
+              f"エラー率 {stats['error_rate']:.2%}  busy/locked {stats['busy_locked']}")
+        for sample in stats['error_samples']:
+            print(f"      ⚠️ {sample}")
+
+
+def print_histograms(results):
+    """/api/search の応答時間ヒストグラム（同時接続数ごと）"""
+    print("-" * 72)
+    print("📊 /api/search の応答時間の分布（件数）")
+    labels = [f'≤{bucket}' for bucket in BUCKETS_MS] + ['>5000']
+    print(f"   {'':<14}" + ''.join(f'{label:>7}' for label in labels))
+    for key, result in results.items():
+        histogram = result['endpoints']['/api/search']['histogram']
+        print(f"   {key:<14}" + ''.join(f'{count:>7}' for count in histogram.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本番版アプリの負荷試験')
+    parser.add_argument('--url', default=None, help='起動済みのアプリのURL（省略するとプロセス内で起動）')
+    parser.add_argument('--concurrency', default='1,4,16,64', help='同時接続数（カンマ区切り）')
+    parser.add_argument('--duration', type=float, default=30, help='同時接続数ごとの測定秒数')
+    parser.add_argument('--debounce-ms', type=float, default=500, help='入力が止まってから検索するまで（0ならEnterのみ）')
+    parser.add_argument('--speed', type=float, default=1.0, help='人の操作の待ち時間を何倍速にするか')
+    parser.add_argument('--status-interval', type=float, default=10, help='/api/sync/status を確認する間隔（秒、0で確認しない）')
+    parser.add_argument('--with-sync', action='store_true', help='同期なし・同期しながらの両方を測る')
+    parser.add_argument('--sync-rooms', type=int, default=20, help='プロセス内の同期で使うルーム数')
+    parser.add_argument('--sync-batch', type=int, default=100, help='同期1回でルームごとに増やすメッセージ数')
+    parser.add_argument('--rows', default='100k', help='プロセス内で使うコーパスの件数（10k / 100k / 1m）')
+    parser.add_argument('--seed', type=int, default=0, help='コーパスと仮想ユーザーの乱数の種')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'search-bench-corpus'),
+                        help='コーパスの置き場所（同じ件数・種なら作り直さない）')
+    parser.add_argument('--output', help='結果のJSONの保存先')
+    args = parser.parse_args()
+
+    levels = [int(value) for value in args.concurrency.split(',') if value.strip()]
+    if not levels or min(levels) < 1:
+        parser.error('同時接続数は1以上で指定してください')
+    if args.speed <= 0:
+        parser.error('--speed は0より大きくしてください')
+
+    workdir = None
+    app = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        sync_once = (lambda: remote_sync_once(base_url)) if args.with_sync else None
+        target = base_url
+    else:
+        rows = parse_rows(args.rows)
+        corpus = ensure_corpus(args.data_dir, rows, 'production', args.seed)
+        workdir = tempfile.mkdtemp(prefix='load-test-')
+        app = InProcessApp(corpus, workdir, args.with_sync, args.sync_rooms, args.sync_batch)
+        base_url = app.base_url
+        sync_once = app.sync_once if args.with_sync else None
+        target = f'プロセス内（{corpus_label(rows)}件）'
+
+    report = {
+        'meta': {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'target': target,
+            'python': host_platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': f'{host_platform.system()} {host_platform.machine()} / {os.cpu_count()} CPU',
+            'duration': args.duration,
+            'debounce_ms': args.debounce_ms,
+            'speed': args.speed,
+            'status_interval': args.status_interval,
+            'with_sync': args.with_sync,
+            'seed': args.seed,
+        },
+        'results': {},
+    }
+    print(f"🚦 負荷試験: {target} / 同時接続数 {levels} / {args.duration:g}秒ずつ"
+          f" / デバウンス {args.debounce_ms:g}ms / {args.speed:g}倍速")
+
+    phases = [('idle', '同期なし', None)]
+    if sync_once:
+        phases.append(('sync', '同期しながら', sync_once))
+    try:
+        for users in levels:
+            for phase, label, sync in phases:
+                result = run_level(base_url, users, args.duration, args, sync, seed=args.seed + users)
+                report['results'][f'{users}/{phase}'] = result
+                print_level(label, result)
+
+            if sync_once:
+                idle = report['results'][f'{users}/idle']['endpoints']['/api/search']
+                busy = report['results'][f'{users}/sync']['endpoints']['/api/search']
+                if idle['p95_ms'] and busy['p95_ms']:
+                    print(f"   🔀 同期による /api/search の p95 の変化: {idle['p95_ms']:.2f}ms → "
+                          f"{busy['p95_ms']:.2f}ms（{busy['p95_ms'] / idle['p95_ms']:.2f}倍）")
+    finally:
+        if app:
+            app.close()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_histograms(report['results'])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"💾 結果を保存しました: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 ローカル用のChatwork APIモックサーバー
+
+本物のAPIトークンなしで、同期処理の動作確認やスループット測定をするためのサーバーです。
+Chatwork APIの次の動きを真似します。
+
+- GET /v2/rooms                      : ルーム一覧
+- GET /v2/rooms/{room_id}/messages   : force=1 で最新100件、force=0 で未取得分のみ（無ければ204）
+- X-RateLimit-Limit / Remaining / Reset ヘッダー、上限を超えたら429
+- 1リクエストごとの応答遅延（latency）
+
+使い方:
+    with MockChatworkServer(rooms=50, messages_per_room=200, latency=0.05) as server:
+        client = ChatworkClient('dummy', base_url=server.base_url)
+
+単体で起動する場合:
+    python benchmarks/mock_chatwork.py --port 8765
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Chatworkの messages API が一度に返す最大件数
+MESSAGES_PAGE_SIZE = 100
+
+SAMPLE_PHRASES = [
+    '本日の会議の議事録を共有します', '見積書を確認お願いします', '了解しました',
+    'デプロイ完了しました', '明日の打ち合わせは15時からです', '資料を更新しました',
+    'Please review the pull request', 'リリースノートを作成しました',
+    '請求書の件、経理に確認中です', 'ありがとうございます！', '障害の原因を調査しています',
+]
+SAMPLE_NAMES = ['井上', '佐藤', '鈴木', '高橋', '田中', 'Smith', '渡辺', '伊藤']
+
+
+class MockChatworkServer:
+    """スレッドで動くChatwork APIモックサーバー"""
+
+    def __init__(self, rooms=20, messages_per_room=150, latency=0.0,
+                 rate_limit=300, rate_window=300, port=0, seed=0):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.rooms = [
+            {'room_id': 1000 + i, 'name': f'テストルーム{i + 1}', 'type': 'group'}
+            for i in range(rooms)
+        ]
+        self.messages = {room['room_id']: [] for room in self.rooms}
+        self.read_position = {room['room_id']: 0 for room in self.rooms}
+        self.next_message_id = 1
+        self.base_time = int(time.time()) - 86400 * 30
+
+        for room in self.rooms:
+            self.add_messages(room['room_id'], messages_per_room)
+
+        # リクエスト数の記録
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self.window_start = time.time()
+        self.window_count = 0
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/v2'
+
+    def add_messages(self, room_id, count):
+        """ルームに新しいメッセージを追加する（差分同期の確認用）"""
+        with self.lock:
+            for _ in range(count):
+                message_id = self.next_message_id
+                self.next_message_id += 1
+                self.messages[room_id].append({
+                    'message_id': str(message_id),
+                    'account': {
+                        'account_id': self.random.randint(1, 50),
+                        'name': self.random.choice(SAMPLE_NAMES),
+                        'avatar_image_url': ''
+                    },
+                    'body': f'{self.random.choice(SAMPLE_PHRASES)} #{message_id}',
+                    'send_time': self.base_time + message_id * 60,
+                    'update_time': 0
+                })
+
+    def room_list(self):
+        """ルーム一覧（last_update_time は最新メッセージの送信時刻）"""
+        with self.lock:
+            return [
+                dict(room, last_update_time=(
+                    self.messages[room['room_id']][-1]['send_time']
+                    if self.messages[room['room_id']] else 0
+                ))
+                for room in self.rooms
+            ]
+
+    def _check_rate_limit(self):
+        """レート制限の判定。(許可するか, 残り回数, リセット時刻)"""
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= self.rate_window:
+                self.window_start = now
+                self.window_count = 0
+            self.request_count += 1
+            self.window_count += 1
+            remaining = max(0, self.rate_limit - self.window_count)
+            reset_at = math.ceil(self.window_start + self.rate_window)
+            allowed = self.window_count <= self.rate_limit
+            if not allowed:
+                self.rate_limited_count += 1
+            return allowed, remaining, reset_at
+
+    def _room_messages(self, room_id, force):
+        with self.lock:
+            messages = self.messages[room_id]
+            if force:
+                result = messages[-MESSAGES_PAGE_SIZE:]
+                self.read_position[room_id] = len(messages)
+            else:
+                # 未取得分のうち古い順に最大100件（取得した分だけ既読位置を進める）
+                start = self.read_position[room_id]
+                result = messages[start:start + MESSAGES_PAGE_SIZE]
+                self.read_position[room_id] = start + len(result)
+            return list(result)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # テスト中にログを出さない
+
+            def _send(self, status, body=None, remaining=0, reset_at=0):
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8') if body is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.send_header('X-RateLimit-Limit', str(server.rate_limit))
+                self.send_header('X-RateLimit-Remaining', str(remaining))
+                self.send_header('X-RateLimit-Reset', str(reset_at))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+
+                allowed, remaining, reset_at = server._check_rate_limit()
+                if not allowed:
+                    self._send(429, {'errors': ['Rate limit exceeded']}, remaining, reset_at)
+                    return
+
+                if not self.headers.get('X-ChatWorkToken'):
+                    self._send(401, {'errors': ['Invalid API token']}, remaining, reset_at)
+                    return
+
+                url = urlparse(self.path)
+                parts = url.path.strip('/').split('/')
+                query = parse_qs(url.query)
+
+                if parts == ['v2', 'rooms']:
+                    self._send(200, server.room_list(), remaining, reset_at)
+                    return
+
+                if len(parts) == 4 and parts[:2] == ['v2', 'rooms'] and parts[3] == 'messages':
+                    room_id = int(parts[2])
+                    if room_id not in server.messages:
+                        self._send(404, {'errors': ['Room not found']}, remaining, reset_at)
+                        return
+                    force = query.get('force', ['0'])[0] == '1'
+                    messages = server._room_messages(room_id, force)
+                    if not messages:
+                        self._send(204, None, remaining, reset_at)
+                    else:
+                        self._send(200, messages, remaining, reset_at)
+                    return
+
+                self._send(404, {'errors': ['Not found']}, remaining, reset_at)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Chatwork APIモックサーバー')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rooms', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=150, help='ルームごとのメッセージ数')
+    parser.add_argument('--latency', type=float, default=0.05, help='応答遅延（秒）')
+    args = parser.parse_args()
+
+    server = MockChatworkServer(args.rooms, args.messages, args.latency, port=args.port)
+    print(f"🧪 Chatworkモックサーバー: {server.base_url}")
+    print(f"   CHATWORK_API_BASE={server.base_url} を設定して同期を実行してください")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 ローカル用のDiscord APIモックサーバー
+
+本物のBotトークンなしで、Discord同期の動作確認やスループット測定をするためのサーバーです。
+Discord REST API（v10）の次の動きを真似します。
+
+- GET /api/v10/guilds/{guild_id}/channels      : チャンネル一覧（last_message_id 付き）
+- GET /api/v10/channels/{channel_id}/messages  : limit / before / after でのページ送り（新しい順）
+- チャンネルごとのレート制限バケット（X-RateLimit-Bucket / Remaining / Reset-After）、超えたら429
+- 1リクエストごとの応答遅延（latency）
+
+使い方:
+    with MockDiscordServer(channels=10, messages_per_channel=500, latency=0.05) as server:
+        client = DiscordClient('dummy', base_url=server.base_url)
+        client.get_text_channels(server.guild_id)
+
+単体で起動する場合:
+    python benchmarks/mock_discord.py --port 8766
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Discordのエポック（2015-01-01）
+DISCORD_EPOCH_MS = 1420070400000
+
+SAMPLE_PHRASES = [
+    'おはようございます', 'PR出しました、レビューお願いします', 'ビルドが落ちています',
+    '本番デプロイ完了', 'この仕様で問題ないですか？', 'ミーティングのリンクはこちら',
+    'Looks good to me', '議事録をNotionにまとめました', '明日休みます', 'ありがとうございます！',
+]
+SAMPLE_USERS = ['sato', 'suzuki', 'takahashi', 'tanaka', 'watanabe', 'alice', 'bob']
+
+
+def make_snowflake(timestamp_ms, sequence):
+    """時刻と連番からSnowflake IDを作る"""
+    return ((timestamp_ms - DISCORD_EPOCH_MS) << 22) | (sequence & 0xFFF)
+
+
+class MockDiscordServer:
+    """スレッドで動くDiscord APIモックサーバー"""
+
+    def __init__(self, channels=10, messages_per_channel=300, latency=0.0,
+                 bucket_limit=5, bucket_window=1.0, port=0, seed=0):
+        self.latency = latency
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.guild_id = '900000000000000001'
+        self.channels = [
+            {'id': str(910000000000000000 + i), 'type': 0, 'guild_id': self.guild_id,
+             'name': f'channel-{i + 1}', 'position': i}
+            for i in range(channels)
+        ]
+        # ボイスチャンネル（メッセージ取得の対象外）
+        self.channels.append({'id': '919999999999999999', 'type': 2, 'guild_id': self.guild_id,
+                              'name': 'voice', 'position': channels})
+        self.messages = {channel['id']: [] for channel in self.channels}
+        self.clock_ms = int(time.time() * 1000) - 86400 * 1000 * 30
+        self.sequence = 0
+
+        for channel in self.channels:
+            if channel['type'] == 0:
+                self.add_messages(channel['id'], messages_per_channel)
+
+        # リクエスト数とレート制限の記録（バケット → (ウィンドウ開始, 回数)）
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self.buckets = {}
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/api/v10'
+
+    def add_messages(self, channel_id, count):
+        """チャンネルに新しいメッセージを追加する（差分同期の確認用）"""
+        with self.lock:
+            for _ in range(count):
+                self.clock_ms += self.random.randint(1000, 600000)
+                self.sequence += 1
+                message_id = str(make_snowflake(self.clock_ms, self.sequence))
+                user = self.random.choice(SAMPLE_USERS)
+                self.messages[channel_id].append({
+                    'id': message_id,
+                    'type': 0,
+                    'channel_id': channel_id,
+                    'author': {'id': str(hash(user) & 0xFFFFFFFF), 'username': user, 'global_name': user.title()},
+                    'content': f'{self.random.choice(SAMPLE_PHRASES)} ({self.sequence})',
+                    'timestamp': datetime.fromtimestamp(self.clock_ms / 1000, timezone.utc).isoformat(),
+                })
+
+    def channel_list(self):
+        with self.lock:
+            return [
+                dict(channel, last_message_id=(
+                    self.messages[channel['id']][-1]['id'] if self.messages[channel['id']] else None
+                ))
+                for channel in self.channels
+            ]
+
+    def _query_messages(self, channel_id, limit, before, after):
+        """Discordと同じページ送り（結果は新しい順）"""
+        with self.lock:
+            messages = self.messages[channel_id]
+            if after is not None:
+                newer = [m for m in messages if int(m['id']) > int(after)]
+                page = newer[:limit]
+            else:
+                older = [m for m in messages if before is None or int(m['id']) < int(before)]
+                page = older[-limit:]
+            return list(reversed(page))
+
+    def _check_rate_limit(self, bucket):
+        """バケットごとのレート制限。(許可するか, 残り回数, リセットまでの秒数)"""
+        with self.lock:
+            now = time.monotonic()
+            window_start, count = self.buckets.get(bucket, (now, 0))
+            if now - window_start >= self.bucket_window:
+                window_start, count = now, 0
+            count += 1
+            self.buckets[bucket] = (window_start, count)
+            self.request_count += 1
+            reset_after = max(0.0, window_start + self.bucket_window - now)
+            allowed = count <= self.bucket_limit
+            if not allowed:
+                self.rate_limited_count += 1
+            return allowed, max(0, self.bucket_limit - count), reset_after
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # テスト中にログを出さない
+
+            def _send(self, status, body, bucket, remaining, reset_after):
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.send_header('X-RateLimit-Limit', str(server.bucket_limit))
+                self.send_header('X-RateLimit-Remaining', str(remaining))
+                self.send_header('X-RateLimit-Reset-After', f'{reset_after:.3f}')
+                self.send_header('X-RateLimit-Bucket', bucket.split(':')[0])
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+
+                url = urlparse(self.path)
+                parts = url.path.strip('/').split('/')
+                query = parse_qs(url.query)
+
+                if parts[:2] != ['api', 'v10'] or len(parts) < 5:
+                    self._send(404, {'message': '404: Not Found', 'code': 0}, 'none:0', 0, 0)
+                    return
+
+                # ルートと主要パラメーターごとのバケット
+                bucket = f'{parts[2]}-{parts[4]}:{parts[3]}'
+                allowed, remaining, reset_after = server._check_rate_limit(bucket)
+                if not allowed:
+                    self._send(429, {'message': 'You are being rate limited.',
+                                     'retry_after': round(reset_after, 3), 'global': False},
+                               bucket, remaining, reset_after)
+                    return
+
+                if not (self.headers.get('Authorization') or '').startswith('Bot '):
+                    self._send(401, {'message': '401: Unauthorized', 'code': 0}, bucket, remaining, reset_after)
+                    return
+
+                if parts[2] == 'guilds' and parts[4] == 'channels' and parts[3] == server.guild_id:
+                    self._send(200, server.channel_list(), bucket, remaining, reset_after)
+                    return
+
+                if parts[2] == 'channels' and parts[4] == 'messages' and parts[3] in server.messages:
+                    limit = min(int(query.get('limit', ['50'])[0]), 100)
+                    before = query.get('before', [None])[0]
+                    after = query.get('after', [None])[0]
+                    messages = server._query_messages(parts[3], limit, before, after)
+                    self._send(200, messages, bucket, remaining, reset_after)
+                    return
+
+                self._send(404, {'message': 'Unknown Channel', 'code': 10003}, bucket, remaining, reset_after)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Discord APIモックサーバー')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--channels', type=int, default=10)
+    parser.add_argument('--messages', type=int, default=300, help='チャンネルごとのメッセージ数')
+    parser.add_argument('--latency', type=float, default=0.05, help='応答遅延（秒）')
+    args = parser.parse_args()
+
+    server = MockDiscordServer(args.channels, args.messages, args.latency, port=args.port)
+    print(f"🧪 Discordモックサーバー: {server.base_url}")
+    print(f"   DISCORD_API_BASE={server.base_url} DISCORD_GUILD_ID={server.guild_id} を設定して同期を実行してください")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 ローカル用のMeiliSearchモックサーバー
+
+MeiliSearchを起動せずに、検索バックエンド（backend/search_backend.py）の
+ドキュメント送信・タスク確認・検索の動作確認をするためのサーバーです。
+MeiliSearch REST APIの次の動きを真似します。
+
+- POST   /indexes                         : インデックス作成（既にあれば409 index_already_exists）
+- PATCH  /indexes/{uid}/settings          : 設定の更新（タスク）
+- POST   /indexes/{uid}/documents         : ドキュメントの追加・置き換え（タスク）
+- DELETE /indexes/{uid}/documents         : 全ドキュメントの削除（タスク）
+- POST   /indexes/{uid}/documents/delete-batch : IDを指定したドキュメントの削除（タスク）
+- GET    /tasks/{task_uid}                : タスクの状態（enqueued → processing → succeeded）
+- POST   /indexes/{uid}/search            : 検索（部分一致。filter / sort / limit / offset）
+- GET    /indexes/{uid}/stats, GET /health
+
+タスクは task_delay 秒たってから順番に処理されるので、呼び出し側のタスク確認（ポーリング）を試せます。
+filter は検索バックエンドが作る形（platform = "..." と timestamp_unix / row_id の比較、AND / OR / 括弧）だけを解釈します。
+
+使い方:
+    with MockMeiliSearchServer(task_delay=0.05) as server:
+        backend = MeiliSearchBackend(pool, host=server.base_url, api_key=server.api_key)
+        backend.reindex()
+        print(server.batch_sizes, server.task_polls)
+
+単体で起動する場合:
+    python benchmarks/mock_meilisearch.py --port 7700
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# filter の字句（文字列 / 数値 / 比較演算子 / 括弧 / 単語）
+FILTER_TOKEN = re.compile(r'\s*("(?:\\.|[^"\\])*"|-?\d+(?:\.\d+)?|<=|>=|!=|=|<|>|\(|\)|[A-Za-z_]+)')
+
+
+def parse_filter(expression):
+    """filter の文字列をドキュメントを受け取る関数にする"""
+    tokens = FILTER_TOKEN.findall(expression)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def value(token):
+        if token.startswith('"'):
+            return json.loads(token)
+        return float(token)
+
+    def comparison():
+        if peek() == '(':
+            take()
+            inner = disjunction()
+            take()  # ')'
+            return inner
+        field, op, raw = take(), take(), value(take())
+        operators = {
+            '=': lambda a, b: a == b, '!=': lambda a, b: a != b,
+            '<': lambda a, b: a < b, '<=': lambda a, b: a <= b,
+            '>': lambda a, b: a > b, '>=': lambda a, b: a >= b,
+        }
+        compare = operators[op]
+        return lambda doc: doc.get(field) is not None and compare(doc.get(field), raw)
+
+    def conjunction():
+        parts = [comparison()]
+        while peek() == 'AND':
+            take()
+            parts.append(comparison())
+        return lambda doc: all(part(doc) for part in parts)
+
+    def disjunction():
+        parts = [conjunction()]
+        while peek() == 'OR':
+            take()
+            parts.append(conjunction())
+        return lambda doc: any(part(doc) for part in parts)
+
+    return disjunction()
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class MockMeiliSearchServer:
+    """スレッドで動くMeiliSearchモックサーバー"""
+
+    def __init__(self, task_delay=0.05, latency=0.0, api_key='mock-master-key', port=0):
+        self.task_delay = task_delay
+        self.latency = latency
+        self.api_key = api_key
+
+        self.lock = threading.Lock()
+        self.indexes = {}   # uid → {'primaryKey', 'settings', 'documents'}
+        self.tasks = {}     # task_uid → タスク
+        self.queue = []     # 未処理のタスク（(実行できる時刻, task_uid, 処理)）
+        self.next_task_uid = 0
+
+        # 呼び出し側の動きの記録
+        self.request_count = 0
+        self.batch_sizes = []   # ドキュメント追加1回ごとの件数
+        self.task_polls = 0     # GET /tasks/{uid} の回数
+        self.search_count = 0
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+        self.worker = None
+        self._stopped = threading.Event()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    # --- タスク ---
+
+    def _enqueue(self, index_uid, task_type, apply):
+        """タスクを積む（task_delay 秒後にワーカーが apply を実行する）"""
+        with self.lock:
+            task_uid = self.next_task_uid
+            self.next_task_uid += 1
+            self.tasks[task_uid] = {
+                'uid': task_uid, 'indexUid': index_uid, 'status': 'enqueued',
+                'type': task_type, 'error': None, 'enqueuedAt': _now(),
+                'startedAt': None, 'finishedAt': None,
+            }
+            self.queue.append((time.monotonic() + self.task_delay, task_uid, apply))
+            return {'taskUid': task_uid, 'indexUid': index_uid, 'status': 'enqueued',
+                    'type': task_type, 'enqueuedAt': self.tasks[task_uid]['enqueuedAt']}
+
+    def _process_tasks(self):
+        """タスクを1つずつ順番に処理する（MeiliSearchと同じく直列）"""
+        while not self._stopped.is_set():
+            with self.lock:
+                ready = self.queue[0] if self.queue and self.queue[0][0] <= time.monotonic() else None
+                if ready:
+                    self.queue.pop(0)
+                    self.tasks[ready[1]].update(status='processing', startedAt=_now())
+            if ready is None:
+                time.sleep(0.005)
+                continue
+
+            _, task_uid, apply = ready
+            with self.lock:
+                try:
+                    apply()
+                    self.tasks[task_uid].update(status='succeeded', finishedAt=_now())
+                except Exception as e:
+                    self.tasks[task_uid].update(
+                        status='failed', finishedAt=_now(),
+                        error={'message': str(e), 'code': 'internal', 'type': 'internal'}
+                    )
+
+    def wait_idle(self, timeout=10):
+        """積まれたタスクがすべて処理されるまで待つ"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if all(t['status'] in ('succeeded', 'failed') for t in self.tasks.values()):
+                    return True
+            time.sleep(0.01)
+        return False
+
+    # --- インデックス ---
+
+    def create_index(self, uid, primary_key):
+        with self.lock:
+            if uid in self.indexes:
+                return None
+            self.indexes[uid] = {'primaryKey': primary_key, 'settings': {}, 'documents': {}}
+        return self._enqueue(uid, 'indexCreation', lambda: None)
+
+    def update_settings(self, uid, settings):
+        def apply():
+            self.indexes[uid]['settings'].update(settings)
+        return self._enqueue(uid, 'settingsUpdate', apply)
+
+    def add_documents(self, uid, documents, primary_key):
+        with self.lock:
+            self.batch_sizes.append(len(documents))
+            index = self.indexes.setdefault(uid, {'primaryKey': primary_key, 'settings': {}, 'documents': {}})
+            key = index['primaryKey'] or primary_key
+
+        def apply():
+            for document in documents:
+                index['documents'][str(document[key])] = document
+        return self._enqueue(uid, 'documentAdditionOrUpdate', apply)
+
+    def delete_documents(self, uid, ids=None):
+        """ids を省略すると全ドキュメントを削除する"""
+        def apply():
+            documents = self.indexes[uid]['documents']
+            if ids is None:
+                documents.clear()
+            for document_id in ids or ():
+                documents.pop(str(document_id), None)
+        return self._enqueue(uid, 'documentDeletion', apply)
+
+    def document_count(self, uid):
+        with self.lock:
+            return len(self.indexes.get(uid, {}).get('documents', {}))
+
+    def search(self, uid, body):
+        """部分一致で検索する（searchableAttributes の順に一致した列を上位に）"""
+        with self.lock:
+            self.search_count += 1
+            index = self.indexes[uid]
+            documents = list(index['documents'].values())
+            settings = dict(index['settings'])
+
+        query = (body.get('q') or '').casefold()
+        attributes = settings.get('searchableAttributes') or ['content']
+        if body.get('attributesToSearchOn'):
+            attributes = [a for a in attributes if a in body['attributesToSearchOn']]
+        matcher = parse_filter(body['filter']) if body.get('filter') else None
+
+        hits = []
+        for document in documents:
+            if matcher and not matcher(document):
+                continue
+            rank = next(
+                (i for i, attribute in enumerate(attributes)
+                 if query in str(document.get(attribute) or '').casefold()),
+                None
+            )
+            if rank is not None:
+                hits.append((rank, document))
+
+        sort = body.get('sort')
+        if sort:
+            for rule in reversed(sort):
+                field, direction = rule.split(':')
+                hits.sort(key=lambda hit: hit[1].get(field) or 0, reverse=direction == 'desc')
+        else:
+            # 一致した列の優先順位 → 新しい順（rankingRules の timestamp_unix:desc）
+            hits.sort(key=lambda hit: (hit[0], -(hit[1].get('timestamp_unix') or 0)))
+
+        offset = int(body.get('offset', 0))
+        limit = int(body.get('limit', 20))
+        return {
+            'hits': [document for _, document in hits[offset:offset + limit]],
+            'query': body.get('q'),
+            'processingTimeMs': 0,
+            'limit': limit,
+            'offset': offset,
+            'estimatedTotalHits': len(hits),
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # テスト中にログを出さない
+
+            def _send(self, status, body):
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _error(self, status, message, code):
+                self._send(status, {'message': message, 'code': code, 'type': 'invalid_request'})
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'null') if length else None
+
+            def _handle(self, method):
+                if server.latency:
+                    time.sleep(server.latency)
+                with server.lock:
+                    server.request_count += 1
+
+                url = urlparse(self.path)
+                parts = url.path.strip('/').split('/')
+                query = parse_qs(url.query)
+
+                if parts == ['health']:
+                    self._send(200, {'status': 'available'})
+                    return
+                if server.api_key and self.headers.get('Authorization') != f'Bearer {server.api_key}':
+                    self._error(403, 'The provided API key is invalid.', 'invalid_api_key')
+                    return
+
+                if parts[0] == 'tasks' and len(parts) == 2 and method == 'GET':
+                    with server.lock:
+                        server.task_polls += 1
+                        task = dict(server.tasks.get(int(parts[1])) or {})
+                    if not task:
+                        self._error(404, f'Task `{parts[1]}` not found.', 'task_not_found')
+                    else:
+                        self._send(200, task)
+                    return
+
+                if parts == ['indexes'] and method == 'POST':
+                    body = self._body()
+                    task = server.create_index(body['uid'], body.get('primaryKey'))
+                    if task is None:
+                        self._error(409, f"Index `{body['uid']}` already exists.", 'index_already_exists')
+                    else:
+                        self._send(202, task)
+                    return
+
+                if parts[0] != 'indexes' or len(parts) < 3:
+                    self._error(404, 'Not Found', 'not_found')
+                    return
+
+                uid, resource = parts[1], parts[2]
+                if resource == 'documents' and method == 'POST' and parts[3:] == ['delete-batch']:
+                    self._send(202, server.delete_documents(uid, self._body()))
+                    return
+                if resource == 'documents' and method == 'POST':
+                    primary_key = query.get('primaryKey', [None])[0]
+                    self._send(202, server.add_documents(uid, self._body(), primary_key))
+                    return
+
+                with server.lock:
+                    exists = uid in server.indexes
+                if not exists:
+                    self._error(404, f'Index `{uid}` not found.', 'index_not_found')
+                    return
+
+                if resource == 'settings' and method == 'PATCH':
+                    self._send(202, server.update_settings(uid, self._body()))
+                elif resource == 'documents' and method == 'DELETE':
+                    self._send(202, server.delete_documents(uid))
+                elif resource == 'search' and method == 'POST':
+                    self._send(200, server.search(uid, self._body() or {}))
+                elif resource == 'stats' and method == 'GET':
+                    self._send(200, {'numberOfDocuments': server.document_count(uid), 'isIndexing': False})
+                else:
+                    self._error(404, 'Not Found', 'not_found')
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def do_PATCH(self):
+                self._handle('PATCH')
+
+            def do_DELETE(self):
+                self._handle('DELETE')
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.worker = threading.Thread(target=self._process_tasks, daemon=True)
+        self.worker.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='MeiliSearchモックサーバー')
+    parser.add_argument('--port', type=int, default=7700)
+    parser.add_argument('--task-delay', type=float, default=0.05, help='タスクを処理するまでの時間（秒）')
+    parser.add_argument('--latency', type=float, default=0.0, help='応答遅延（秒）')
+    args = parser.parse_args()
+
+    server = MockMeiliSearchServer(args.task_delay, args.latency, port=args.port)
+    server.worker = threading.Thread(target=server._process_tasks, daemon=True)
+    server.worker.start()
+    print(f"🧪 MeiliSearchモックサーバー: {server.base_url}")
+    print(f"   SEARCH_BACKEND=meilisearch MEILISEARCH_HOST={server.base_url} "
+          f"MEILISEARCH_MASTER_KEY={server.api_key} を設定して起動してください")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 ローカル用のNotion APIモック（notion_client.Client の代わり）
+
+記録しておいたワークスペース（benchmarks/fixtures/notion_workspace.json）を読み込んで、
+notion_client.Client と同じ呼び出し方で応答します。APIトークンやネットワークは不要です。
+
+- notion.search(...)                    : ページ一覧（page_size / start_cursor でページ送り）
+- notion.blocks.children.list(...)      : 子ブロック（最大100件ずつ、has_more / next_cursor 付き）
+- 1回の呼び出しごとの応答遅延（latency）
+
+使い方:
+    notion = MockNotionClient.from_fixture(latency=0.05)
+    extractor = NotionBlockExtractor(notion)
+
+ワークスペースの記録（本物のNotionから、フィクスチャと同じ形式で保存）:
+    NOTION_API_TOKEN=... python benchmarks/mock_notion.py --record benchmarks/fixtures/notion_workspace.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'notion_workspace.json')
+
+# Notion APIが一度に返す最大件数
+PAGE_SIZE_LIMIT = 100
+
+
+def _rich_text(text):
+    return [{'type': 'text', 'plain_text': text, 'text': {'content': text}}]
+
+
+def _block_object(block_id, block, parent_id):
+    """フィクスチャの簡略形式 → Notion APIのブロックオブジェクト"""
+    block_type = block['type']
+    if block_type == 'table_row':
+        data = {'cells': [_rich_text(cell) for cell in block.get('cells', [])]}
+    elif block_type == 'child_page':
+        data = {'title': block.get('text', '')}
+    else:
+        data = {'rich_text': _rich_text(block['text']) if block.get('text') else []}
+    if 'checked' in block:
+        data['checked'] = block['checked']
+    if 'language' in block:
+        data['language'] = block['language']
+
+    return {
+        'object': 'block',
+        'id': block_id,
+        'parent': {'type': 'block_id', 'block_id': parent_id},
+        'type': block_type,
+        'has_children': bool(block.get('children')),
+        block_type: data,
+    }
+
+
+class _Endpoint:
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
+
+
+class MockNotionClient:
+    """フィクスチャのワークスペースを返すNotionクライアント"""
+
+    def __init__(self, workspace, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.request_count = 0
+
+        self.pages = {}       # page_id → ページオブジェクト
+        self.children = {}    # block_id → 子ブロックのリスト
+        for page in workspace['pages']:
+            self._add_page(page)
+
+        self.blocks = _Endpoint(children=_Endpoint(list=self._list_children))
+
+    @classmethod
+    def from_fixture(cls, path=FIXTURE_PATH, latency=0.0):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f), latency)
+
+    def _add_page(self, page):
+        page_id = page['id']
+        self.pages[page_id] = {
+            'object': 'page',
+            'id': page_id,
+            'created_time': page['created_time'],
+            'last_edited_time': page['last_edited_time'],
+            'created_by': {'object': 'user', 'id': page.get('created_by', '00000000')},
+            'url': f"https://www.notion.so/{page_id.replace('-', '')}",
+            'properties': {
+                'title': {'id': 'title', 'type': 'title', 'title': _rich_text(page['title'])}
+            },
+        }
+        self._add_children(page_id, page['blocks'])
+
+    def _add_children(self, parent_id, blocks):
+        self.children[parent_id] = []
+        for i, block in enumerate(blocks):
+            block_id = f'{parent_id}-{i}'
+            self.children[parent_id].append(_block_object(block_id, block, parent_id))
+            if block.get('children'):
+                self._add_children(block_id, block['children'])
+
+    def edit_page(self, page_id, text, edited_time=None):
+        """ページの末尾に段落を追加して last_edited_time を進める（差分同期の確認用）"""
+        with self.lock:
+            page = self.pages[page_id]
+            page['last_edited_time'] = edited_time or time.strftime('%Y-%m-%dT%H:%M:00.000Z', time.gmtime())
+            children = self.children[page_id]
+            block = {'type': 'paragraph', 'text': text}
+            children.append(_block_object(f'{page_id}-{len(children)}', block, page_id))
+
+    def _request(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.request_count += 1
+
+    @staticmethod
+    def _paginate(items, start_cursor, page_size):
+        start = int(start_cursor) if start_cursor else 0
+        size = min(page_size or PAGE_SIZE_LIMIT, PAGE_SIZE_LIMIT)
+        end = start + size
+        return {
+            'object': 'list',
+            'results': items[start:end],
+            'has_more': end < len(items),
+            'next_cursor': str(end) if end < len(items) else None,
+        }
+
+    def _list_children(self, block_id, start_cursor=None, page_size=None, **kwargs):
+        self._request()
+        return self._paginate(self.children.get(block_id, []), start_cursor, page_size)
+
+    def search(self, query=None, filter=None, sort=None, start_cursor=None, page_size=None, **kwargs):
+        self._request()
+        pages = list(self.pages.values())
+        if query:
+            pages = [
+                p for p in pages
+                if query.lower() in p['properties']['title']['title'][0]['plain_text'].lower()
+            ]
+        if sort and sort.get('timestamp') == 'last_edited_time':
+            pages.sort(key=lambda p: p['last_edited_time'], reverse=sort.get('direction') == 'descending')
+        return self._paginate(pages, start_cursor, page_size)
+
+
+def record_workspace(notion, limit=20):
+    """本物のNotionワークスペースをフィクスチャの簡略形式で記録する"""
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+    from notion_extract import NotionBlockExtractor, rich_text_to_plain
+
+    extractor = NotionBlockExtractor(notion)
+
+    def compact(block):
+        block_type = block['type']
+        data = block.get(block_type) or {}
+        item = {'type': block_type}
+        if block_type == 'table_row':
+            item['cells'] = [rich_text_to_plain(cell) for cell in data.get('cells', [])]
+        elif block_type == 'child_page':
+            item['text'] = data.get('title', '')
+        else:
+            item['text'] = rich_text_to_plain(data.get('rich_text'))
+        for key in ('checked', 'language'):
+            if key in data:
+                item[key] = data[key]
+        return item
+
+    pages = []
+    results = notion.search(filter={'property': 'object', 'value': 'page'}, page_size=limit)
+    for page in results.get('results', [])[:limit]:
+        # iter_blocks は文書順に (深さ, ブロック) を返すので、深さを見てツリーに戻す
+        root = {'children': []}
+        stack = [root]
+        for depth, block in extractor.iter_blocks(page['id']):
+            del stack[depth + 1:]
+            item = compact(block)
+            stack[-1]['children'].append(item)
+            item['children'] = []
+            stack.append(item)
+
+        def prune(item):
+            for child in item['children']:
+                prune(child)
+            if not item['children']:
+                del item['children']
+        for item in root['children']:
+            prune(item)
+
+        title = next(
+            (rich_text_to_plain(prop.get('title')) for prop in page.get('properties', {}).values()
+             if prop.get('type') == 'title'), ''
+        )
+        pages.append({
+            'id': page['id'],
+            'title': title,
+            'created_time': page['created_time'],
+            'last_edited_time': page['last_edited_time'],
+            'blocks': root['children'],
+        })
+
+    extractor.close()
+    return {'pages': pages}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Notion APIモック / ワークスペースの記録')
+    parser.add_argument('--record', metavar='PATH', help='本物のNotionからフィクスチャを記録して保存')
+    parser.add_argument('--limit', type=int, default=20, help='記録するページ数')
+    args = parser.parse_args()
+
+    if args.record:
+        from notion_client import Client
+        workspace = record_workspace(Client(auth=os.environ['NOTION_API_TOKEN']), args.limit)
+        with open(args.record, 'w', encoding='utf-8') as f:
+            json.dump(workspace, f, ensure_ascii=False)
+        print(f"💾 {len(workspace['pages'])}ページを記録しました: {args.record}")
+    else:
+        notion = MockNotionClient.from_fixture()
+        blocks = sum(len(children) for children in notion.children.values())
+        print(f"🧪 フィクスチャ: {len(notion.pages)}ページ / {blocks}ブロック")
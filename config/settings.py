@@ -35,7 +35,7 @@ DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN", "")
 DISCORD_GUILD_ID = os.getenv("DISCORD_GUILD_ID", "")
 
 # ⏰ 同期設定
-SYNC_INTERVAL_MINUTES = 30  # 30分ごとにデータを取得
+SYNC_INTERVAL_MINUTES = int(os.getenv("SYNC_INTERVAL_MINUTES", "30"))  # 30分ごとにデータを取得
 MAX_MESSAGES_PER_SYNC = 100  # 1回の同期で取得する最大メッセージ数
 
 # 📋 ログ設定
@@ -9,8 +9,17 @@
 
 import sqlite3
 import os
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from message_counters import ensure_message_counters
+from pagination import ensure_pagination_indexes
+from search_cache import ensure_data_generation
+from search_index import ensure_fts_index
+from suggest_index import ensure_suggest_changes
+from sync_state import ensure_sync_state
+
 def create_database():
     """データベースとテーブルを作成する関数"""
 
@@ -101,6 +110,25 @@ def create_database():
     # 変更を保存
     conn.commit()
 
+    # 全文検索インデックス（日本語の部分一致検索用）
+    print("🔎 全文検索インデックスを作成しています...")
+    ensure_fts_index(conn)
+
+    # プラットフォーム別の件数集計（統計APIで使用）
+    ensure_message_counters(conn)
+
+    # 検索結果のページ送り用（日時, id）の複合インデックス
+    ensure_pagination_indexes(conn)
+
+    # 差分同期の進捗（ルーム・チャンネルごとの最後に取り込んだ位置）
+    ensure_sync_state(conn)
+
+    # 検索結果キャッシュの無効化に使うデータ世代（同期で書き込むたびに進む）
+    ensure_data_generation(conn)
+
+    # 検索候補の差分取り込みに使う変更ログ（更新・削除されたメッセージの変更前の内容）
+    ensure_suggest_changes(conn)
+
     # テスト用サンプルデータを挿入
     print("🧪 サンプルデータを挿入しています...")
 